@@ -1,11 +1,14 @@
+import io
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.error import TelegramError
+from config import Config
 from supabase_client import db
 from keyboards import Keyboards
 from decorators import handle_errors, admin_required, log_user_action
 from helpers import truncate_text, format_datetime_arabic
+from profiling import live_profiler, ProfilerBusyError
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +32,73 @@ class AdminHandlers:
             reply_markup=Keyboards.admin_menu()
         )
     
+    @handle_errors
+    @admin_required
+    @log_user_action("cpu_profile")
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /profile [seconds] - capture a CPU profile of the live process"""
+        seconds = Config.PROFILE_DEFAULT_SECONDS
+        if context.args:
+            try:
+                seconds = int(context.args[0])
+            except ValueError:
+                await update.message.reply_text("❌ الاستخدام: /profile [عدد الثواني]")
+                return
+        seconds = max(1, min(seconds, Config.PROFILE_MAX_SECONDS))
+        
+        if live_profiler.is_capturing:
+            await update.message.reply_text("⏳ يوجد تحليل أداء قيد التنفيذ بالفعل.")
+            return
+        
+        # Capture in the background: awaiting here would hold up every other update (and the
+        # handlers the profile is meant to measure) for the whole capture
+        context.application.create_task(self.send_cpu_profile(update, seconds), update=update)
+        await update.message.reply_text(f"⏱️ جاري تحليل الأداء لمدة {seconds} ثانية، سيصلك التقرير عند الانتهاء...")
+    
+    async def send_cpu_profile(self, update: Update, seconds: int):
+        """Run a CPU profile capture and send its report and dump to the admin"""
+        try:
+            dump, report = await live_profiler.capture_cpu_profile(seconds)
+        except ProfilerBusyError:
+            await update.message.reply_text("⏳ يوجد تحليل أداء قيد التنفيذ بالفعل.")
+            return
+        
+        try:
+            await update.message.reply_document(
+                document=io.BytesIO(report.encode('utf-8')),
+                filename="cpu_profile.txt",
+                caption=f"📊 تقرير الأداء ({seconds} ثانية)"
+            )
+            await update.message.reply_document(
+                document=io.BytesIO(dump),
+                filename="cpu_profile.prof",
+                caption="ملف pstats قابل للفتح بـ snakeviz"
+            )
+        except TelegramError as e:
+            logger.error(f"Could not send CPU profile to {update.effective_user.id}: {e}")
+    
+    @handle_errors
+    @admin_required
+    @log_user_action("memory_snapshot")
+    async def memory_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /memsnap [stop] - tracemalloc snapshot diff against the previous call"""
+        if context.args and context.args[0].lower() == 'stop':
+            live_profiler.stop_memory_tracing()
+            await update.message.reply_text("✅ تم إيقاف تتبع الذاكرة.")
+            return
+        
+        from user_handlers import user_handlers
+        report = live_profiler.memory_snapshot_diff(tracked={
+            'user_states': user_handlers.user_states,
+            'broadcast_cache': self.broadcast_cache
+        })
+        
+        await update.message.reply_document(
+            document=io.BytesIO(report.encode('utf-8')),
+            filename="memory_diff.txt",
+            caption="🧠 مقارنة لقطات الذاكرة"
+        )
+    
     @handle_errors
     async def show_statistics(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show general statistics"""
@@ -54,6 +124,121 @@ class AdminHandlers:
             reply_markup=Keyboards.admin_menu()
         )
     
+    @handle_errors
+    async def show_send_histogram(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show the projected per-minute send histogram for the next 24 hours"""
+        query = update.callback_query
+        
+        if update.effective_user.id not in Config.ADMIN_USER_IDS:
+            await query.answer("❌ ليس لديك صلاحية للوصول إلى هذه الميزة.", show_alert=True)
+            return
+        
+        from datetime import datetime
+        import pytz
+        from scheduler import project_send_histogram
+        
+        schedules = await db.get_active_schedules()
+        channels = await db.get_channels_by_tg_ids(list({s['channel_tg_id'] for s in schedules}))
+        jitter_by_channel = {c['channel_tg_id']: c.get('jitter_seconds') or 0 for c in channels}
+        
+        per_minute, per_bucket = project_send_histogram(schedules, jitter_by_channel, datetime.now(pytz.UTC))
+        total = sum(per_bucket)
+        
+        if not total:
+            await query.edit_message_text(
+                "📈 لا توجد عمليات إرسال متوقعة خلال 24 ساعة القادمة.",
+                reply_markup=Keyboards.admin_menu()
+            )
+            return
+        
+        def bar(count: int, peak: int) -> str:
+            return "█" * max(1, round(count / peak * 15))
+        
+        busiest = per_minute.most_common(10)
+        peak_minute = busiest[0][1]
+        lines = [
+            "📈 توزيع الإرسال المتوقع (24 ساعة القادمة)",
+            "",
+            f"📤 إجمالي الإرسالات: {total}",
+            f"🕐 دقائق فيها إرسال: {len(per_minute)}",
+            f"🔝 أقصى إرسالات في دقيقة: {peak_minute}",
+            "",
+            "أكثر الدقائق ازدحاماً:"
+        ]
+        for minute, count in sorted(busiest):
+            lines.append(f"{minute.strftime('%H:%M')} {bar(count, peak_minute)} {count}")
+        
+        lines.append("")
+        lines.append("التوزيع داخل الدقيقة (بالثواني):")
+        peak_bucket = max(per_bucket)
+        for i, count in enumerate(per_bucket):
+            lines.append(f"{i * 10:02d}-{i * 10 + 9:02d} {bar(count, peak_bucket) if count else ''} {count}")
+        
+        await query.edit_message_text("\n".join(lines), reply_markup=Keyboards.admin_menu())
+    
+    @handle_errors
+    async def show_execution_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show delivery lag and failure rates from the execution history"""
+        query = update.callback_query
+        
+        if update.effective_user.id not in Config.ADMIN_USER_IDS:
+            await query.answer("❌ ليس لديك صلاحية للوصول إلى هذه الميزة.", show_alert=True)
+            return
+        
+        from datetime import datetime, timedelta
+        import pytz
+        from cron_engine import get_timezone
+        from execution_log import execution_log, summarize_executions
+        
+        # Include records still sitting in the write buffer
+        await execution_log.flush()
+        
+        now = datetime.now(pytz.UTC)
+        hours = Config.ANALYTICS_WINDOW_HOURS
+        rows = await db.get_executions_between(now - timedelta(hours=hours), now, Config.ANALYTICS_MAX_ROWS)
+        
+        if not rows:
+            await query.edit_message_text(
+                f"📉 لا توجد عمليات تنفيذ مسجلة خلال آخر {hours} ساعة.",
+                reply_markup=Keyboards.admin_menu()
+            )
+            return
+        
+        summary = summarize_executions(rows, get_timezone(Config.TIMEZONE))
+        
+        def seconds(value) -> str:
+            return f"{value:.1f}ث" if value is not None else "-"
+        
+        lines = [
+            f"📉 تحليلات التنفيذ (آخر {hours} ساعة)",
+            "",
+            f"📤 عمليات التنفيذ: {summary['total']}",
+            f"❌ الفاشلة: {summary['failed']} ({summary['failed'] / summary['total']:.1%})",
+            f"⏱️ التأخير p50: {seconds(summary['lag_p50'])} | p95: {seconds(summary['lag_p95'])}",
+            f"📨 زمن الإرسال p95: {seconds(summary['send_p95'])}",
+        ]
+        
+        if summary['lag_p95_by_hour']:
+            lines.append("")
+            lines.append("التأخير p95 حسب الساعة:")
+            for hour, lag in summary['lag_p95_by_hour'].items():
+                lines.append(f"{hour:02d}:00  {seconds(lag)}  ({summary['runs_by_hour'][hour]})")
+        
+        failing = sorted(
+            ((tg_id, rate, total) for tg_id, (rate, total) in summary['failure_rate_by_channel'].items() if rate),
+            key=lambda item: (item[1], item[2]),
+            reverse=True
+        )[:10]
+        if failing:
+            channels = await db.get_channels_by_tg_ids([tg_id for tg_id, _, _ in failing])
+            names = {c['channel_tg_id']: c['channel_name'] for c in channels}
+            lines.append("")
+            lines.append("أعلى القنوات في نسبة الفشل:")
+            for tg_id, rate, total in failing:
+                lines.append(f"{names.get(tg_id, tg_id)}: {rate:.0%} من {total}")
+        
+        await query.edit_message_text("\n".join(lines), reply_markup=Keyboards.admin_menu())
+    
     @handle_errors
     async def show_all_channels(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show all channels for admin management"""
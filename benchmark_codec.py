@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-update CPU cost of the default and fast JSON codecs
+Usage: python benchmark_codec.py [iterations]
+"""
+
+import json
+import sys
+import time
+
+from telegram import Bot, Update
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SAMPLE_UPDATE = {
+    "update_id": 912345678,
+    "message": {
+        "message_id": 4821,
+        "from": {"id": 5705054777, "is_bot": False, "first_name": "مستخدم", "username": "sample_user", "language_code": "ar"},
+        "chat": {"id": 5705054777, "first_name": "مستخدم", "username": "sample_user", "type": "private"},
+        "date": 1760000000,
+        "forward_origin": {
+            "type": "channel",
+            "chat": {"id": -1001234567890, "title": "قناة تجريبية", "username": "sample_channel", "type": "channel"},
+            "message_id": 991,
+            "date": 1759990000
+        },
+        "forward_from_chat": {"id": -1001234567890, "title": "قناة تجريبية", "username": "sample_channel", "type": "channel"},
+        "forward_from_message_id": 991,
+        "forward_date": 1759990000,
+        "photo": [
+            {"file_id": "AgACAgQAAxkBAAIBQ2V" + "x" * 40, "file_unique_id": "AQADr7sxG1", "file_size": 1523, "width": 90, "height": 67},
+            {"file_id": "AgACAgQAAxkBAAIBQ2W" + "y" * 40, "file_unique_id": "AQADr7sxG2", "file_size": 21873, "width": 320, "height": 240},
+            {"file_id": "AgACAgQAAxkBAAIBQ2X" + "z" * 40, "file_unique_id": "AQADr7sxG3", "file_size": 98213, "width": 800, "height": 600}
+        ],
+        "caption": "منشور تجريبي مع رابط https://example.com ووسم #اختبار " * 4,
+        "caption_entities": [
+            {"offset": 21, "length": 19, "type": "url"},
+            {"offset": 48, "length": 7, "type": "hashtag"}
+        ]
+    }
+}
+
+# A typical PostgREST page of due schedules
+SAMPLE_ROWS = [
+    {
+        "id": i, "post_id": 1000 + i, "channel_tg_id": -1001234567890 - i, "user_id": 5705054777,
+        "cron_expression": "0 9 * * *", "next_run_at": "2026-10-19T09:00:00+00:00",
+        "is_active": True, "task_type": "post", "created_at": "2026-10-01T12:00:00.000+00:00"
+    }
+    for i in range(100)
+]
+
+def measure(label, fn, iterations):
+    fn()  # warm up
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - started
+    per_call_us = elapsed / iterations * 1e6
+    print(f"{label:<40} {per_call_us:10.2f} µs/op")
+    return per_call_us
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    bot = Bot(token="123456:BENCHMARK")
+    update_body = json.dumps(SAMPLE_UPDATE).encode('utf-8')
+    rows_body = json.dumps(SAMPLE_ROWS).encode('utf-8')
+    
+    print(f"Iterations: {iterations}\n")
+    print("Webhook update (decode + Update.de_json)")
+    stdlib_update = measure("  json.loads", lambda: Update.de_json(json.loads(update_body), bot), iterations)
+    if orjson:
+        fast_update = measure("  orjson.loads", lambda: Update.de_json(orjson.loads(update_body), bot), iterations)
+    
+    print("\nWebhook update (decode only)")
+    stdlib_decode = measure("  json.loads", lambda: json.loads(update_body), iterations)
+    if orjson:
+        fast_decode = measure("  orjson.loads", lambda: orjson.loads(update_body), iterations)
+    
+    print("\nDB payload (100 schedule rows, decode + encode)")
+    stdlib_rows = measure("  json", lambda: json.dumps(json.loads(rows_body)), iterations // 10)
+    if orjson:
+        fast_rows = measure("  orjson", lambda: orjson.dumps(orjson.loads(rows_body)), iterations // 10)
+    
+    if not orjson:
+        print("\norjson is not installed; only the stdlib codec was measured.")
+        return
+    
+    print("\nSavings with PERFORMANCE_PROFILE=fast")
+    print(f"  per update (end to end): {stdlib_update - fast_update:8.2f} µs ({(1 - fast_update / stdlib_update) * 100:.1f}%)")
+    print(f"  per update (decode):     {stdlib_decode - fast_decode:8.2f} µs ({(1 - fast_decode / stdlib_decode) * 100:.1f}%)")
+    print(f"  per 100-row DB payload:  {stdlib_rows - fast_rows:8.2f} µs ({(1 - fast_rows / stdlib_rows) * 100:.1f}%)")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark next-run computation: per-row croniter vs the compiled cron engine
+Usage: python benchmark_cron.py [schedules]
+"""
+
+import random
+import sys
+import time
+from datetime import datetime
+
+from croniter import croniter
+
+from cron_engine import batch_next_runs, compile_cron, get_timezone
+
+TIMEZONE = 'Asia/Riyadh'
+
+def build_schedules(count):
+    """Schedules shaped like the ones the bot creates (daily, weekly, every 2 days)"""
+    rng = random.Random(42)
+    schedules = []
+    for i in range(count):
+        minute, hour = rng.choice([0, 15, 30, 45]), rng.randint(0, 23)
+        kind = rng.random()
+        if kind < 0.6:
+            expression = f"{minute} {hour} * * *"
+        elif kind < 0.9:
+            expression = f"{minute} {hour} * * {rng.randint(0, 6)}"
+        else:
+            expression = f"{minute} {hour} */2 * *"
+        schedules.append({'id': i, 'cron_expression': expression})
+    return schedules
+
+def measure(label, fn, count):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {elapsed * 1000:10.2f} ms  ({elapsed / count * 1e6:8.2f} µs/schedule)")
+    return elapsed, result
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    tz = get_timezone(TIMEZONE)
+    now = datetime.now(tz)
+    schedules = build_schedules(count)
+    distinct = len({s['cron_expression'] for s in schedules})
+    
+    print(f"Schedules: {count} ({distinct} distinct expressions)\n")
+    
+    def per_row_croniter():
+        return {s['id']: croniter(s['cron_expression'], now).get_next(datetime) for s in schedules}
+    
+    def per_row_compiled():
+        return {s['id']: compile_cron(s['cron_expression']).next_after(now, tz) for s in schedules}
+    
+    baseline, expected = measure("croniter, per row", per_row_croniter, count)
+    compiled, per_row = measure("compiled engine, per row", per_row_compiled, count)
+    batched, batch = measure("compiled engine, batch", lambda: batch_next_runs(schedules, now, TIMEZONE), count)
+    
+    mismatches = sum(1 for s in schedules if batch[s['id']] != expected[s['id']] or per_row[s['id']] != expected[s['id']])
+    print(f"\nMismatches against croniter: {mismatches}")
+    print(f"Speedup per row: {baseline / compiled:.1f}x, batch: {baseline / batched:.1f}x")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Simulate the post scheduler on a virtual clock against an in-memory database and a fake bot
+Usage: python benchmark_scheduler.py [--schedules N] [--channels N] [--users N] [--skew S] [--hours H]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import selectors
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Never touch a real database from a benchmark
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = ':memory:'
+# The fake bot only sends; the channel permission sweep is not part of the simulation
+os.environ['CHANNEL_SWEEP_INTERVAL'] = '0'
+
+import pytz
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import cron_engine
+import execution_log as execution_log_module
+import helpers
+import scheduler as scheduler_module
+import supabase_client
+from config import Config
+from cron_engine import batch_next_runs, get_timezone
+from execution_log import execution_log, percentile
+from notifications import notification_digest
+from sqlite_backend import SQLiteQuery
+from supabase_client import db
+
+# Schedule kinds: cron template, or None for one-time schedules
+CRON_MIX = {
+    'daily': "{minute} {hour} * * *",
+    'weekly': "{minute} {hour} * * {weekday}",
+    'every2d': "{minute} {hour} */2 * *",
+    'hourly': "{minute} * * * *",
+    'once': None
+}
+DEFAULT_MIX = "daily:60,weekly:25,every2d:5,hourly:5,once:5"
+
+class VirtualClock:
+    """Real time plus an offset that jumps forward whenever the event loop would sit idle"""
+    def __init__(self):
+        self.offset = 0.0
+        self.start_mono = time.monotonic()
+        self.start_epoch = time.time()
+    
+    def monotonic(self) -> float:
+        return time.monotonic() + self.offset
+    
+    def advance(self, seconds: float):
+        self.offset += seconds
+    
+    def epoch(self) -> float:
+        return self.start_epoch + (self.monotonic() - self.start_mono)
+
+class VirtualSelector:
+    """Selector that skips idle waits instead of sleeping through them"""
+    def __init__(self, selector: selectors.BaseSelector, clock: VirtualClock, loop: 'VirtualEventLoop'):
+        self._selector = selector
+        self._clock = clock
+        self._loop = loop
+    
+    def select(self, timeout=None):
+        # Database work in executor threads takes real time: wait for it like a normal loop
+        if self._loop.executor_jobs:
+            return self._selector.select(timeout)
+        
+        events = self._selector.select(0)
+        if events or (timeout is not None and timeout <= 0):
+            return events
+        if timeout is None:
+            return self._selector.select(None)
+        self._clock.advance(timeout)
+        return []
+    
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """Event loop on a virtual clock: sleeps, timeouts and timers complete without waiting"""
+    def __init__(self, clock: VirtualClock):
+        super().__init__()
+        self.clock = clock
+        self.executor_jobs = 0
+        self._selector = VirtualSelector(self._selector, clock, self)
+    
+    def time(self) -> float:
+        return self.clock.monotonic()
+    
+    def run_in_executor(self, executor, func, *args):
+        self.executor_jobs += 1
+        future = super().run_in_executor(executor, func, *args)
+        
+        def done(_):
+            self.executor_jobs -= 1
+        
+        future.add_done_callback(done)
+        return future
+
+def install_virtual_datetime(clock: VirtualClock):
+    """Make datetime.now() in the scheduling modules follow the virtual clock"""
+    class VirtualDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(clock.epoch(), tz)
+        
+        @classmethod
+        def utcnow(cls):
+            return datetime.utcfromtimestamp(clock.epoch())
+    
+    for module in (scheduler_module, supabase_client, helpers, cron_engine, execution_log_module):
+        module.datetime = VirtualDatetime
+
+class FakeBot:
+    """Counts sends, after a simulated latency, instead of calling Telegram"""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.channel_sends = 0
+        self.notifications = 0
+        self.message_id = 0
+    
+    async def _send(self, chat_id, **kwargs):
+        await asyncio.sleep(self.latency)
+        if chat_id < 0:
+            self.channel_sends += 1
+        else:
+            self.notifications += 1
+        self.message_id += 1
+        return SimpleNamespace(message_id=self.message_id)
+    
+    def __getattr__(self, name):
+        # send_message, send_photo, ... all behave the same here
+        if name.startswith('send_'):
+            return self._send
+        raise AttributeError(name)
+
+class QueryCounter:
+    """Counts database round trips by table and operation"""
+    def __init__(self):
+        self.calls = Counter()
+        self.enabled = False
+        original = SQLiteQuery.execute
+        counter = self
+        
+        def execute(query):
+            if counter.enabled:
+                counter.calls[(query.table, query.operation)] += 1
+            return original(query)
+        
+        SQLiteQuery.execute = execute
+    
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+def parse_mix(text: str):
+    mix = {}
+    for part in text.split(','):
+        label, _, share = part.partition(':')
+        if label.strip() not in CRON_MIX:
+            raise SystemExit(f"Unknown schedule kind '{label}', choose from {', '.join(CRON_MIX)}")
+        mix[label.strip()] = float(share or 1)
+    return mix
+
+def zipf_weights(count: int, skew: float):
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+def build_population(args, start: datetime):
+    """Channels, posts and schedules shaped by the cron mix and the user skew"""
+    rng = random.Random(args.seed)
+    users = [1000 + i for i in range(args.users)]
+    weights = zipf_weights(len(users), args.skew)
+    
+    # Every user gets one channel, the rest follow the skew too
+    owners = users + rng.choices(users, weights, k=max(0, args.channels - len(users)))
+    channels = [
+        {'channel_tg_id': -1001000000000 - i, 'channel_name': f"sim-{i}", 'user_owner_id': owner,
+         'jitter_seconds': args.jitter}
+        for i, owner in enumerate(owners)
+    ]
+    channels_by_user = {}
+    for index, channel in enumerate(channels):
+        channels_by_user.setdefault(channel['user_owner_id'], []).append(index)
+    
+    mix = parse_mix(args.mix)
+    kinds = rng.choices(list(mix), list(mix.values()), k=args.schedules)
+    schedule_users = rng.choices(users, weights, k=args.schedules)
+    schedules = []
+    for i, (kind, user) in enumerate(zip(kinds, schedule_users)):
+        template = CRON_MIX[kind]
+        expression = None
+        if template:
+            expression = template.format(
+                minute=rng.randrange(0, 60, 5), hour=rng.randint(0, 23), weekday=rng.randint(0, 6)
+            )
+        schedules.append({
+            'id': i,
+            'channel': rng.choice(channels_by_user[user]),
+            'user_id': user,
+            'cron_expression': expression,
+            'kind': 'cron' if template else 'once',
+            'run_at': None if template else start + timedelta(seconds=rng.uniform(0, args.hours * 3600))
+        })
+    return channels, schedules
+
+async def load_population(args, start: datetime):
+    """Bulk-insert the population directly, bypassing change events"""
+    channels, schedules = build_population(args, start)
+    client = db.supabase
+    
+    channel_rows = client.table('channels').insert(channels).execute().data
+    posts = client.table('posts').insert([
+        {'user_id': s['user_id'], 'channel_id': channel_rows[s['channel']]['id'], 'post_content': f"post {s['id']}"}
+        for s in schedules
+    ]).execute().data
+    
+    next_runs = batch_next_runs(schedules, start, Config.TIMEZONE)
+    rows = []
+    for schedule, post in zip(schedules, posts):
+        next_run = next_runs.get(schedule['id']) or schedule['run_at']
+        row = {
+            'post_id': post['id'],
+            'channel_tg_id': channel_rows[schedule['channel']]['channel_tg_id'],
+            'user_id': schedule['user_id'],
+            'cron_expression': schedule['cron_expression'],
+            'next_run_at': next_run.astimezone(pytz.UTC).isoformat(),
+            'is_active': True,
+            'task_type': 'post'
+        }
+        if schedule['kind'] == 'once':
+            row['kind'] = 'once'
+        rows.append(row)
+    client.table('schedule').insert(rows).execute()
+    return len(channel_rows)
+
+async def simulate(args, clock: VirtualClock, queries: QueryCounter):
+    start = datetime.fromtimestamp(clock.epoch(), get_timezone(Config.TIMEZONE))
+    
+    loaded = time.perf_counter()
+    channel_count = await load_population(args, start)
+    load_seconds = time.perf_counter() - loaded
+    
+    if args.trace_memory:
+        tracemalloc.start()
+    
+    bot = FakeBot(args.latency)
+    post_scheduler = scheduler_module.PostScheduler(SimpleNamespace(bot=bot))
+    post_scheduler.check_interval = args.check_interval
+    
+    queries.enabled = True
+    wall_started = time.perf_counter()
+    virtual_started = clock.monotonic()
+    execution_log.start()
+    scheduler_task = asyncio.create_task(post_scheduler.start_scheduler())
+    await asyncio.sleep(args.hours * 3600)
+    await post_scheduler.stop_scheduler(timeout=60)
+    await scheduler_task
+    await notification_digest.flush_all()
+    await execution_log.stop()
+    wall_seconds = time.perf_counter() - wall_started
+    virtual_seconds = clock.monotonic() - virtual_started
+    queries.enabled = False
+    
+    traced_peak = None
+    if args.trace_memory:
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    
+    end = datetime.fromtimestamp(clock.epoch(), pytz.UTC)
+    executions = await db.get_executions_between(start - timedelta(days=1), end, max_rows=10 ** 9)
+    
+    return {
+        'channels': channel_count,
+        'load_seconds': load_seconds,
+        'wall_seconds': wall_seconds,
+        'virtual_seconds': virtual_seconds,
+        'executions': executions,
+        'bot': bot,
+        'indexed': len(post_scheduler.index),
+        'traced_peak': traced_peak
+    }
+
+def report(args, result, queries: QueryCounter):
+    executions = result['executions']
+    ok = [row for row in executions if row['outcome'] == 'ok']
+    lags = [row['lag_ms'] / 1000 for row in ok if row.get('lag_ms') is not None]
+    wall = result['wall_seconds']
+    
+    def seconds(value):
+        return f"{value:8.2f} s" if value is not None else "       -"
+    
+    print(f"Population: {args.schedules} schedules, {result['channels']} channels, {args.users} users "
+          f"(skew {args.skew}), mix {args.mix}")
+    print(f"Simulated {result['virtual_seconds'] / 3600:.2f} h in {wall:.2f} s wall "
+          f"({result['virtual_seconds'] / max(wall, 1e-9):.0f}x), population loaded in {result['load_seconds']:.2f} s\n")
+    
+    print(f"Executions:          {len(executions)} ({len(executions) - len(ok)} not ok)")
+    print(f"Channel sends:       {result['bot'].channel_sends}, notifications: {result['bot'].notifications}")
+    print(f"Throughput:          {len(executions) / max(wall, 1e-9):.1f} executions per wall second")
+    print(f"Schedules indexed:   {result['indexed']}\n")
+    
+    print("Delivery lag (sent - planned):")
+    for label, q in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100)):
+        print(f"  {label:<4} {seconds(percentile(lags, q))}")
+    
+    per_execution = queries.total / max(len(executions), 1)
+    print(f"\nDatabase calls:      {queries.total} ({per_execution:.2f} per execution)")
+    for (table, operation), count in queries.calls.most_common(10):
+        print(f"  {table + '.' + operation:<28} {count:8d} ({count / max(len(executions), 1):.2f}/exec)")
+    
+    print("\nMemory:")
+    if result['traced_peak'] is not None:
+        print(f"  traced peak during run   {result['traced_peak'] / 1024 / 1024:8.1f} MB")
+    if resource:
+        # ru_maxrss is KB on Linux, bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        print(f"  max RSS                  {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 / 1024:8.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduler simulation and benchmark (virtual clock, fake bot)")
+    parser.add_argument('--schedules', type=int, default=10000)
+    parser.add_argument('--channels', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of schedules per user (0 = uniform)")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"schedule kinds and shares ({', '.join(CRON_MIX)})")
+    parser.add_argument('--hours', type=float, default=24, help="simulated duration")
+    parser.add_argument('--latency', type=float, default=0.05, help="fake Telegram send latency in seconds")
+    parser.add_argument('--jitter', type=int, default=0, help="jitter_seconds of every channel")
+    parser.add_argument('--check-interval', type=int, default=60)
+    parser.add_argument('--trace-memory', action='store_true', help="tracemalloc peak (slows the run down)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    args.users = max(1, min(args.users, args.channels))
+    
+    logging.basicConfig(level=logging.WARNING)
+    
+    clock = VirtualClock()
+    install_virtual_datetime(clock)
+    queries = QueryCounter()
+    
+    loop = VirtualEventLoop(clock)
+    try:
+        result = loop.run_until_complete(simulate(args, clock, queries))
+    finally:
+        loop.close()
+    report(args, result, queries)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -43,6 +43,16 @@ class CallbackHandlers:
             await self.show_scheduling_options(update, context)
         elif data.startswith("sched_"):
             await self.handle_scheduling_choice(update, context)
+        elif data.startswith("fanout_"):
+            await self.handle_fanout_selection(update, context)
+        elif data.startswith("queue_"):
+            await self.handle_queue_selection(update, context)
+        elif data.startswith("schedule_"):
+            await self.show_channel_schedule_settings(update, context)
+        elif data.startswith("jitter_"):
+            await self.toggle_channel_jitter(update, context)
+        elif data.startswith("notify_success_"):
+            await self.toggle_success_notifications(update, context)
         elif data.startswith("weekday_"):
             await self.handle_weekday_selection(update, context)
         elif data.startswith("delete_channel_"):
@@ -72,6 +82,12 @@ class CallbackHandlers:
         elif data.startswith("admin_posts_"):
             from admin_handlers import admin_handlers
             await admin_handlers.show_channel_posts(update, context)
+        elif data == "admin_send_histogram":
+            from admin_handlers import admin_handlers
+            await admin_handlers.show_send_histogram(update, context)
+        elif data == "admin_exec_stats":
+            from admin_handlers import admin_handlers
+            await admin_handlers.show_execution_stats(update, context)
         elif data == "admin_broadcast":
             from admin_handlers import admin_handlers
             await admin_handlers.start_broadcast(update, context)
@@ -134,6 +150,82 @@ class CallbackHandlers:
             reply_markup=Keyboards.channel_management(channel_id)
         )
     
+    @handle_errors
+    async def show_channel_schedule_settings(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show scheduling settings for a channel"""
+        query = update.callback_query
+        
+        try:
+            channel_id = int(query.data.split('_')[1])
+        except (IndexError, ValueError):
+            await query.answer("❌ خطأ في البيانات.", show_alert=True)
+            return
+        
+        channel = await db.get_channel_by_id(channel_id)
+        if not channel or channel['user_owner_id'] != update.effective_user.id:
+            await query.answer("❌ ليس لديك صلاحية للوصول إلى هذه القناة.", show_alert=True)
+            return
+        
+        jitter_seconds = channel.get('jitter_seconds') or 0
+        jitter_status = f"مفعّل (حتى {jitter_seconds} ثانية)" if jitter_seconds else "غير مفعّل"
+        
+        await query.edit_message_text(
+            f"⏰ إعدادات الجدولة: {channel['channel_name']}\n\n"
+            f"⏱️ توزيع الإرسال: {jitter_status}\n\n"
+            "عند التفعيل يتم تأخير كل منشور مجدول بعدد ثابت من الثواني "
+            "لتخفيف الضغط في الأوقات المزدحمة مثل 12:00.",
+            reply_markup=Keyboards.channel_schedule_settings(channel_id, bool(jitter_seconds))
+        )
+    
+    @handle_errors
+    async def toggle_channel_jitter(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Enable or disable send spreading for a channel"""
+        query = update.callback_query
+        
+        try:
+            parts = query.data.split('_')
+            channel_id = int(parts[1])
+            enable = parts[2].lower() == 'true'
+        except (IndexError, ValueError):
+            await query.answer("❌ خطأ في البيانات.", show_alert=True)
+            return
+        
+        channel = await db.get_channel_by_id(channel_id)
+        if not channel or channel['user_owner_id'] != update.effective_user.id:
+            await query.answer("❌ ليس لديك صلاحية للوصول إلى هذه القناة.", show_alert=True)
+            return
+        
+        from config import Config
+        jitter_seconds = Config.SCHEDULE_JITTER_SECONDS if enable else 0
+        if not await db.update_channel_jitter(channel_id, jitter_seconds):
+            await query.answer("❌ حدث خطأ أثناء التحديث.", show_alert=True)
+            return
+        
+        # Refresh the settings view ("jitter_<id>_..." parses like "schedule_<id>")
+        await self.show_channel_schedule_settings(update, context)
+    
+    @handle_errors
+    async def toggle_success_notifications(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Mute or unmute success notifications for the user"""
+        query = update.callback_query
+        user_id = update.effective_user.id
+        
+        # callback data carries the current state: notify_success_<muted>
+        mute_success = query.data.split('_')[-1].lower() != 'true'
+        
+        if not await db.update_user_settings(user_id, {'mute_success': mute_success}):
+            await query.answer("❌ حدث خطأ أثناء التحديث.", show_alert=True)
+            return
+        
+        from helpers import format_notification_settings
+        from notifications import notification_digest
+        notification_digest.set_success_muted(user_id, mute_success)
+        
+        await query.edit_message_text(
+            format_notification_settings(mute_success),
+            reply_markup=Keyboards.notification_settings(mute_success)
+        )
+    
     @handle_errors
     async def show_channel_posts(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show posts for a channel"""
@@ -373,12 +465,69 @@ class CallbackHandlers:
             await query.answer("❌ لم يتم العثور على المنشور.", show_alert=True)
             return
         
+        # Plain scheduling targets the post's own channel with just this post
+        from user_handlers import user_handlers
+        user_handlers.fanout_targets.pop(update.effective_user.id, None)
+        user_handlers.queue_pools.pop(update.effective_user.id, None)
+        
         await query.edit_message_text(
             "⏰ جدولة المنشور\n\n"
             "اختر نوع الجدولة:",
             reply_markup=Keyboards.schedule_options(post_id)
         )
     
+    @handle_errors
+    async def handle_fanout_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Choose several channels for one post; the schedule is then created in all of them at once"""
+        query = update.callback_query
+        user_id = update.effective_user.id
+        
+        try:
+            parts = query.data.split('_')
+            action = parts[1] if len(parts) > 2 else "open"
+            post_id = int(parts[2] if len(parts) > 2 else parts[1])
+        except (IndexError, ValueError):
+            await query.answer("❌ خطأ في البيانات.", show_alert=True)
+            return
+        
+        post = await db.get_post_by_id(post_id)
+        if not post or post['user_id'] != user_id:
+            await query.answer("❌ لم يتم العثور على المنشور.", show_alert=True)
+            return
+        
+        from user_handlers import user_handlers
+        channels = await db.get_user_channels(user_id)
+        selected_post, selected = user_handlers.fanout_targets.get(user_id, (None, set()))
+        if selected_post != post_id:
+            selected = {post['channel_id']}
+        
+        if action == "toggle":
+            channel_id = int(parts[3])
+            selected ^= {channel_id}
+        elif action == "all":
+            selected = {channel['id'] for channel in channels} if parts[3] == "True" else set()
+        elif action == "done":
+            if not selected:
+                await query.answer("❌ اختر قناة واحدة على الأقل.", show_alert=True)
+                return
+            user_handlers.fanout_targets[user_id] = (post_id, selected)
+            is_queue = user_handlers.get_queue_pool(user_id, post_id) is not None
+            await query.edit_message_text(
+                f"⏰ جدولة المنشور في {len(selected)} قناة\n\n"
+                "اختر نوع الجدولة:",
+                reply_markup=Keyboards.schedule_options(post_id, recurring_only=is_queue)
+            )
+            return
+        
+        # Only channels the user still owns can be picked
+        selected &= {channel['id'] for channel in channels}
+        user_handlers.fanout_targets[user_id] = (post_id, selected)
+        await query.edit_message_text(
+            "📢 النشر في عدة قنوات\n\n"
+            "اختر القنوات التي تريد جدولة هذا المنشور فيها:",
+            reply_markup=Keyboards.fanout_channels(post_id, channels, selected)
+        )
+    
     @handle_errors
     async def handle_scheduling_choice(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle scheduling type choice"""
@@ -424,10 +573,11 @@ class CallbackHandlers:
         elif schedule_type == "once":
             await query.edit_message_text(
                 "📅 جدولة لمرة واحدة\n\n"
-                "⚠️ هذه الميزة قيد التطوير.\n"
-                "يرجى استخدام الجدولة اليومية أو الأسبوعية حالياً.",
-                reply_markup=Keyboards.schedule_options(post_id)
+                "أدخل التاريخ والوقت الذي تريد النشر فيه:\n"
+                "(مثال: 25/12/2025 14:30)",
+                reply_markup=Keyboards.cancel_action()
             )
+            user_handlers.user_states[user_id] = f"scheduling_once_{post_id}"
         
         elif schedule_type == "custom":
             await query.edit_message_text(
@@ -442,6 +592,62 @@ class CallbackHandlers:
             )
             user_handlers.user_states[user_id] = f"scheduling_custom_{post_id}"
     
+    @handle_errors
+    async def handle_queue_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Build an ordered pool of posts that one recurring schedule sends in turn"""
+        query = update.callback_query
+        user_id = update.effective_user.id
+        
+        try:
+            parts = query.data.split('_')
+            action = parts[1] if len(parts) > 2 else "open"
+            channel_id = int(parts[2] if len(parts) > 2 else parts[1])
+        except (IndexError, ValueError):
+            await query.answer("❌ خطأ في البيانات.", show_alert=True)
+            return
+        
+        channel = await db.get_channel_by_id(channel_id)
+        if not channel or channel['user_owner_id'] != user_id:
+            await query.answer("❌ ليس لديك صلاحية للوصول إلى هذه القناة.", show_alert=True)
+            return
+        
+        from user_handlers import user_handlers
+        posts = await db.get_channel_posts(channel_id, user_id)
+        if not posts:
+            await query.answer("📭 لا توجد منشورات في هذه القناة بعد.", show_alert=True)
+            return
+        
+        pool_channel, pool = user_handlers.queue_pools.get(user_id, (None, []))
+        if pool_channel != channel_id or action == "open":
+            pool = []
+        
+        if action == "toggle":
+            post_id = int(parts[3])
+            if post_id in pool:
+                pool.remove(post_id)
+            elif any(post['id'] == post_id for post in posts):
+                pool.append(post_id)
+        elif action == "done":
+            if len(pool) < 2:
+                await query.answer("❌ اختر منشورين على الأقل لإنشاء طابور.", show_alert=True)
+                return
+            user_handlers.fanout_targets.pop(user_id, None)
+            await query.edit_message_text(
+                f"🔁 جدولة طابور من {len(pool)} منشور\n\n"
+                "في كل موعد يُنشر المنشور التالي بالترتيب، ثم يعود الطابور إلى البداية.\n\n"
+                "اختر نوع الجدولة:",
+                reply_markup=Keyboards.schedule_options(pool[0], recurring_only=True)
+            )
+            return
+        
+        user_handlers.queue_pools[user_id] = (channel_id, pool)
+        await query.edit_message_text(
+            f"🔁 طابور منشورات دوري - {channel['channel_name']}\n\n"
+            "جدولة واحدة تنشر منشوراً واحداً في كل موعد بالتناوب.\n"
+            "اختر المنشورات بترتيب النشر:",
+            reply_markup=Keyboards.queue_posts(channel_id, posts, pool)
+        )
+    
     @handle_errors
     async def handle_weekday_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle weekday selection for weekly scheduling"""
@@ -482,6 +688,8 @@ class CallbackHandlers:
         
         from user_handlers import user_handlers
         user_handlers.user_states.pop(update.effective_user.id, None)
+        user_handlers.fanout_targets.pop(update.effective_user.id, None)
+        user_handlers.queue_pools.pop(update.effective_user.id, None)
         
         await query.edit_message_text(
             "❌ تم إلغاء العملية الحالية.",
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+import pytz
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from config import Config
+from delivery import CHANNEL_LOST_MARKERS
+from metrics import metrics
+from notifications import notification_digest, NOTIFY_FAILURE, NOTIFY_SUCCESS
+
+logger = logging.getLogger(__name__)
+
+class ChannelAccess(NamedTuple):
+    """Result of one check of the bot's rights in a channel"""
+    can_post: Optional[bool]    # None when the check itself failed (nothing is changed then)
+    status: str
+    checked_at: datetime
+
+def member_can_post(member) -> bool:
+    """Same rule as when a channel is added: admin, and allowed to post where that right exists"""
+    if member.status == 'creator':
+        return True
+    # can_post_messages is only set in channels, group admins can always post
+    return member.status == 'administrator' and getattr(member, 'can_post_messages', None) is not False
+
+class ChannelMonitor:
+    """Background sweeper that revalidates the bot's posting rights and pauses schedules where they were lost"""
+    def __init__(self):
+        self.access: Dict[int, ChannelAccess] = {}
+        self.bot = None
+        self.owns: Optional[Callable[[int], bool]] = None
+        self._retry_after = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    def is_lost(self, channel_tg_id: int) -> bool:
+        """Whether the last check (or send) showed the bot can't post in the channel"""
+        access = self.access.get(channel_tg_id)
+        return access is not None and access.can_post is False
+    
+    def mark_lost(self, channel_tg_id: int, status: str = 'send_failed'):
+        """Record a lost channel found by a failed send, so the next sweep can resume it"""
+        self.access[channel_tg_id] = ChannelAccess(False, status, datetime.now(pytz.UTC))
+    
+    def forget(self, channel_tg_id: int):
+        """Drop a cached result found to be stale, the next check or send decides again"""
+        self.access.pop(channel_tg_id, None)
+    
+    def start(self, bot, owns: Callable[[int], bool] = None):
+        """Sweep every CHANNEL_SWEEP_INTERVAL seconds (only the channels `owns` accepts, when given)"""
+        self.bot = bot
+        self.owns = owns
+        if Config.CHANNEL_SWEEP_INTERVAL <= 0 or self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Channel permission sweep failed: {e}", exc_info=True)
+            await asyncio.sleep(Config.CHANNEL_SWEEP_INTERVAL)
+    
+    async def check_channel(self, channel_tg_id: int) -> ChannelAccess:
+        """Ask Telegram for the bot's membership in a channel"""
+        now = datetime.now(pytz.UTC)
+        try:
+            member = await self.bot.get_chat_member(channel_tg_id, self.bot.id)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if hasattr(retry_after, 'total_seconds'):
+                retry_after = retry_after.total_seconds()
+            self._retry_after = max(self._retry_after, float(retry_after))
+            return ChannelAccess(None, 'rate_limited', now)
+        except Forbidden:
+            return ChannelAccess(False, 'forbidden', now)
+        except BadRequest as e:
+            if any(marker in str(e).lower() for marker in CHANNEL_LOST_MARKERS):
+                return ChannelAccess(False, 'not_member', now)
+            logger.warning(f"Could not check channel {channel_tg_id}: {e}")
+            return ChannelAccess(None, 'error', now)
+        except TelegramError as e:
+            logger.warning(f"Could not check channel {channel_tg_id}: {e}")
+            return ChannelAccess(None, 'error', now)
+        
+        return ChannelAccess(member_can_post(member), member.status, now)
+    
+    async def sweep(self) -> Dict[str, int]:
+        """Check all channels in concurrent batches, rate limited; returns counts per outcome"""
+        from supabase_client import db
+        
+        channels = [
+            channel for channel in await db.get_all_channels()
+            if not channel['is_banned'] and (self.owns is None or self.owns(channel['channel_tg_id']))
+        ]
+        loop = asyncio.get_running_loop()
+        batch_size = max(1, Config.CHANNEL_SWEEP_CONCURRENCY)
+        outcomes = Counter()
+        
+        for start in range(0, len(channels), batch_size):
+            batch = channels[start:start + batch_size]
+            started = loop.time()
+            self._retry_after = 0.0
+            results = await asyncio.gather(*(self.check_channel(channel['channel_tg_id']) for channel in batch))
+            for channel, access in zip(batch, results):
+                outcome = await self.apply(channel, access)
+                outcomes[outcome] += 1
+                metrics.inc('channel_checks_total', outcome=outcome)
+            
+            # Stay under CHANNEL_SWEEP_RATE checks per second, or longer if Telegram asked us to slow down
+            delay = max(len(batch) / Config.CHANNEL_SWEEP_RATE - (loop.time() - started), self._retry_after)
+            if delay > 0 and start + batch_size < len(channels):
+                await asyncio.sleep(delay)
+        
+        logger.info(f"Channel permission sweep: {len(channels)} channels, {dict(outcomes)}")
+        return dict(outcomes)
+    
+    async def apply(self, channel: Dict[str, Any], access: ChannelAccess) -> str:
+        """Cache a check result and pause or resume the channel's schedules when it changed"""
+        from supabase_client import db
+        
+        channel_tg_id = channel['channel_tg_id']
+        if access.can_post is None:
+            # Unknown: keep whatever we knew before
+            return 'unknown'
+        
+        previous = self.access.get(channel_tg_id)
+        self.access[channel_tg_id] = access
+        
+        if not access.can_post:
+            if previous and previous.can_post is False:
+                return 'lost'
+            paused = await db.pause_channel_schedules(channel_tg_id)
+            if not paused:
+                return 'lost'
+            logger.warning(f"Bot can no longer post in channel {channel_tg_id} ({access.status}), paused {paused} schedules")
+            await notification_digest.add(
+                channel['user_owner_id'],
+                NOTIFY_FAILURE,
+                f"⚠️ لم يعد البوت قادراً على النشر في قناة '{channel['channel_name']}'. "
+                f"تم إيقاف {paused} جدولة مؤقتاً، وستُستأنف تلقائياً عند إعادة صلاحيات البوت.",
+                f"{channel['channel_name']}: فقد البوت صلاحية النشر، أُوقفت {paused} جدولة"
+            )
+            return 'paused'
+        
+        if previous and previous.can_post:
+            return 'ok'
+        # First check since startup, or the rights came back: resume what was paused
+        resumed = await db.resume_channel_schedules(channel_tg_id)
+        if not resumed:
+            return 'ok'
+        logger.info(f"Bot can post in channel {channel_tg_id} again, resumed {resumed} schedules")
+        await notification_digest.add(
+            channel['user_owner_id'],
+            NOTIFY_SUCCESS,
+            f"✅ استعاد البوت صلاحية النشر في قناة '{channel['channel_name']}'، تم استئناف {resumed} جدولة.",
+            f"{channel['channel_name']}: استؤنفت {resumed} جدولة"
+        )
+        return 'resumed'
+    
+    def lost_channels(self) -> int:
+        return sum(1 for access in self.access.values() if access.can_post is False)
+
+# Global instance
+channel_monitor = ChannelMonitor()
\ No newline at end of file
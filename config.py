@@ -14,6 +14,99 @@ class Config:
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_KEY = os.getenv('SUPABASE_KEY')
     
+    # Database Backend Settings ('supabase' or 'sqlite' for offline runs)
+    DB_BACKEND = os.getenv('DB_BACKEND', 'supabase').lower()
+    SQLITE_PATH = os.getenv('SQLITE_PATH', ':memory:')
+    
+    # HTTP Connection Pool Settings
+    TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', 32))
+    TELEGRAM_UPDATES_POOL_SIZE = int(os.getenv('TELEGRAM_UPDATES_POOL_SIZE', 1))
+    SUPABASE_POOL_SIZE = int(os.getenv('SUPABASE_POOL_SIZE', 10))
+    SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', 10.0))
+    HTTP_POOL_TIMEOUT = float(os.getenv('HTTP_POOL_TIMEOUT', 5.0))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 60.0))
+    HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', 'true').lower() == 'true'
+    
+    # Performance profile: 'default' or 'fast' (uvloop + orjson when installed)
+    PERFORMANCE_PROFILE = os.getenv('PERFORMANCE_PROFILE', 'default').lower()
+    
+    # Profiling Settings (admin /profile and /memsnap commands)
+    PROFILE_DEFAULT_SECONDS = int(os.getenv('PROFILE_DEFAULT_SECONDS', 30))
+    PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', 300))
+    
+    # Misfire Settings (schedules found overdue, e.g. after downtime)
+    # Policies: fire_once (run once, late), skip (jump to next run), fire_all (replay runs within the grace window)
+    MISFIRE_POLICIES = ('fire_once', 'skip', 'fire_all')
+    MISFIRE_POLICY = os.getenv('MISFIRE_POLICY', 'fire_once').lower()
+    MISFIRE_GRACE_SECONDS = int(os.getenv('MISFIRE_GRACE_SECONDS', 300))
+    MISFIRE_MAX_CATCHUP = int(os.getenv('MISFIRE_MAX_CATCHUP', 5))
+    CATCHUP_BATCH_SIZE = int(os.getenv('CATCHUP_BATCH_SIZE', 20))
+    CATCHUP_BATCH_INTERVAL = float(os.getenv('CATCHUP_BATCH_INTERVAL', 2.0))
+    
+    # Load spreading: window (seconds) applied to channels that opt in to send jitter
+    SCHEDULE_JITTER_SECONDS = int(os.getenv('SCHEDULE_JITTER_SECONDS', 60))
+    
+    # Dispatch Fairness Settings (due runs are queued fairly per user; a VIP run costs 1/weight)
+    VIP_PRIORITY_WEIGHT = float(os.getenv('VIP_PRIORITY_WEIGHT', 4.0))
+    
+    # Retry Settings (transient send failures; exhausted items go to dead_letters)
+    RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', 5))
+    RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', 30.0))
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', 3600.0))
+    RETRY_BATCH_SIZE = int(os.getenv('RETRY_BATCH_SIZE', 20))
+    
+    # Outbox Settings (schedule_runs execution log)
+    OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', 300))
+    OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', 7))
+    
+    # Execution History Settings (buffered schedule_executions writer and admin analytics)
+    EXECUTION_LOG_BATCH_SIZE = int(os.getenv('EXECUTION_LOG_BATCH_SIZE', 50))
+    EXECUTION_LOG_FLUSH_INTERVAL = float(os.getenv('EXECUTION_LOG_FLUSH_INTERVAL', 5.0))
+    EXECUTION_LOG_MAX_BUFFER = int(os.getenv('EXECUTION_LOG_MAX_BUFFER', 5000))
+    ANALYTICS_WINDOW_HOURS = int(os.getenv('ANALYTICS_WINDOW_HOURS', 24))
+    ANALYTICS_MAX_ROWS = int(os.getenv('ANALYTICS_MAX_ROWS', 20000))
+    
+    # Notification Digest Settings (0 sends every notification immediately)
+    NOTIFICATION_DIGEST_WINDOW = float(os.getenv('NOTIFICATION_DIGEST_WINDOW', 60))
+    NOTIFICATION_DIGEST_MAX_LINES = int(os.getenv('NOTIFICATION_DIGEST_MAX_LINES', 15))
+    # Seconds a user's notification preferences are cached (workers see changes made in the bot after this)
+    NOTIFICATION_PREFERENCES_TTL = float(os.getenv('NOTIFICATION_PREFERENCES_TTL', 60))
+    
+    # Schedule Change Feed: how other replicas' writes reach the scheduler's in-memory index
+    # ('auto' = Supabase Realtime on the supabase backend, none on sqlite; 'local' is for tests)
+    SCHEDULE_CHANGE_FEEDS = ('auto', 'realtime', 'local', 'none')
+    SCHEDULE_CHANGE_FEED = os.getenv('SCHEDULE_CHANGE_FEED', 'auto').lower()
+    
+    # Albums: seconds to wait for more items of a media group before saving the post
+    MEDIA_GROUP_WAIT = float(os.getenv('MEDIA_GROUP_WAIT', 1.5))
+    
+    # Channel Permission Sweep: recheck the bot's rights in every channel (0 disables)
+    CHANNEL_SWEEP_INTERVAL = float(os.getenv('CHANNEL_SWEEP_INTERVAL', 1800))
+    CHANNEL_SWEEP_CONCURRENCY = int(os.getenv('CHANNEL_SWEEP_CONCURRENCY', 10))
+    CHANNEL_SWEEP_RATE = float(os.getenv('CHANNEL_SWEEP_RATE', 20))
+    
+    # Anti-flood: per-user token bucket in front of all handlers (0 disables, admins are exempt)
+    THROTTLE_RATE = float(os.getenv('THROTTLE_RATE', 1.0))
+    THROTTLE_BURST = float(os.getenv('THROTTLE_BURST', 10))
+    THROTTLE_MAX_TRACKED_USERS = int(os.getenv('THROTTLE_MAX_TRACKED_USERS', 10000))
+    
+    # Post Sending: 'send' re-sends stored file ids, 'copy' copies the message the post was made from
+    # (falls back to 'send' for edited posts or when the source message was deleted)
+    POST_SEND_MODES = ('send', 'copy')
+    POST_SEND_MODE = os.getenv('POST_SEND_MODE', 'send').lower()
+    
+    # Scheduler Placement: 'embedded' runs it inside the bot process, 'off' leaves it to worker.py processes
+    SCHEDULER_MODES = ('embedded', 'off')
+    SCHEDULER_MODE = os.getenv('SCHEDULER_MODE', 'embedded').lower()
+    
+    # Sharded Workers (worker.py): channels are split across live workers by consistent hashing
+    WORKER_HEARTBEAT_INTERVAL = float(os.getenv('WORKER_HEARTBEAT_INTERVAL', 10))
+    WORKER_TIMEOUT = float(os.getenv('WORKER_TIMEOUT', 30))
+    SHARD_VNODES = int(os.getenv('SHARD_VNODES', 128))
+    
+    # Shutdown Settings (seconds to finish queued and in-flight sends before exiting)
+    SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv('SHUTDOWN_DRAIN_TIMEOUT', 25))
+    
     # Server Settings
     ALIVE_URL = os.getenv('ALIVE_URL')
     PORT = int(os.getenv('PORT', 8080))
@@ -27,10 +120,26 @@ class Config:
         """Validate that all required environment variables are set"""
         required_vars = {
             'BOT_TOKEN': cls.BOT_TOKEN,
-            'SUPABASE_URL': cls.SUPABASE_URL,
-            'SUPABASE_KEY': cls.SUPABASE_KEY,
         }
         
+        if cls.DB_BACKEND == 'supabase':
+            required_vars['SUPABASE_URL'] = cls.SUPABASE_URL
+            required_vars['SUPABASE_KEY'] = cls.SUPABASE_KEY
+        elif cls.DB_BACKEND != 'sqlite':
+            raise ValueError(f"Unsupported DB_BACKEND: {cls.DB_BACKEND}")
+        
+        if cls.MISFIRE_POLICY not in cls.MISFIRE_POLICIES:
+            raise ValueError(f"Unsupported MISFIRE_POLICY: {cls.MISFIRE_POLICY}")
+        
+        if cls.SCHEDULER_MODE not in cls.SCHEDULER_MODES:
+            raise ValueError(f"Unsupported SCHEDULER_MODE: {cls.SCHEDULER_MODE}")
+        
+        if cls.POST_SEND_MODE not in cls.POST_SEND_MODES:
+            raise ValueError(f"Unsupported POST_SEND_MODE: {cls.POST_SEND_MODE}")
+        
+        if cls.SCHEDULE_CHANGE_FEED not in cls.SCHEDULE_CHANGE_FEEDS:
+            raise ValueError(f"Unsupported SCHEDULE_CHANGE_FEED: {cls.SCHEDULE_CHANGE_FEED}")
+        
         missing_vars = [var for var, value in required_vars.items() if not value]
         
         if missing_vars:
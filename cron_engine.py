@@ -0,0 +1,263 @@
+import logging
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Any
+
+import pytz
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Search horizon for expressions that can never match (e.g. "0 0 31 2 *")
+MAX_YEARS_AHEAD = 8
+
+MONTH_NAMES = {name: i for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1
+)}
+WEEKDAY_NAMES = {name: i for i, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+
+# (min, max, names) for minute, hour, day of month, month, day of week
+FIELD_SPECS = [
+    (0, 59, {}),
+    (0, 23, {}),
+    (1, 31, {}),
+    (1, 12, MONTH_NAMES),
+    (0, 7, WEEKDAY_NAMES),
+]
+
+ALL_DAYS = sum(1 << d for d in range(1, 32))
+ALL_WEEKDAYS = sum(1 << d for d in range(7))
+
+@lru_cache(maxsize=64)
+def get_timezone(timezone_str: str = None):
+    """Resolve a pytz timezone once per name"""
+    return pytz.timezone(timezone_str or Config.TIMEZONE)
+
+def _next_bit(mask: int, start: int) -> Optional[int]:
+    """Smallest set bit index >= start, or None"""
+    shifted = mask >> start
+    if not shifted:
+        return None
+    return start + (shifted & -shifted).bit_length() - 1
+
+def _parse_value(token: str, names: Dict[str, int]) -> int:
+    token = token.lower()
+    if token in names:
+        return names[token]
+    if not token.isdigit():
+        raise ValueError(f"Invalid cron value: {token}")
+    return int(token)
+
+def _parse_field(field: str, low: int, high: int, names: Dict[str, int]) -> int:
+    """Parse one cron field into a bitset"""
+    mask = 0
+    for part in field.split(','):
+        if not part:
+            raise ValueError(f"Empty cron list item in '{field}'")
+        
+        step = 1
+        if '/' in part:
+            part, step_str = part.split('/', 1)
+            if not step_str.isdigit() or int(step_str) == 0:
+                raise ValueError(f"Invalid cron step: {step_str}")
+            step = int(step_str)
+        
+        if part in ('*', '?'):
+            start, end = low, high
+        elif '-' in part:
+            start_str, end_str = part.split('-', 1)
+            start, end = _parse_value(start_str, names), _parse_value(end_str, names)
+        else:
+            start = _parse_value(part, names)
+            # "5/15" means from 5 to the end of the range every 15
+            end = high if step > 1 else start
+        
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron value out of range in '{field}'")
+        
+        for value in range(start, end + 1, step):
+            mask |= 1 << value
+    return mask
+
+class CompiledCron:
+    """Cron expression precompiled into minute/hour/day/month/weekday bitsets"""
+    __slots__ = ('expression', 'minutes', 'hours', 'days', 'months', 'weekdays', 'day_or', 'repeats_in_fold')
+    
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expected 5 cron fields, got {len(fields)}")
+        
+        masks = [_parse_field(f, low, high, names) for f, (low, high, names) in zip(fields, FIELD_SPECS)]
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = masks
+        # 7 is an alias for Sunday
+        if weekdays & (1 << 7):
+            weekdays = (weekdays | 1) & ~(1 << 7)
+        self.weekdays = weekdays
+        # Vixie cron: when both day fields are restricted a day matches either of them. A field
+        # starting with '*' (including steps like "*/6") or covering its whole range (e.g. "0-6")
+        # counts as unrestricted, and then a day has to match both
+        dom_star = fields[2].startswith(('*', '?')) or self.days == ALL_DAYS
+        dow_star = fields[4].startswith(('*', '?')) or self.weekdays == ALL_WEEKDAYS
+        self.day_or = not dom_star and not dow_star
+        # When clocks go back, wall times in the repeated hour occur twice: like Vixie cron, jobs
+        # with a wildcard minute or hour run in both passes, fixed-time jobs only in the first
+        self.repeats_in_fold = fields[0].startswith('*') or fields[1].startswith('*')
+    
+    def day_matches(self, day: datetime) -> bool:
+        dom_ok = bool(self.days >> day.day & 1)
+        dow_ok = bool(self.weekdays >> ((day.weekday() + 1) % 7) & 1)
+        if self.day_or:
+            return dom_ok or dow_ok
+        return dom_ok and dow_ok
+    
+    def next_naive(self, after: datetime) -> datetime:
+        """First matching wall-clock minute strictly after a naive datetime"""
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        horizon = after.year + MAX_YEARS_AHEAD
+        
+        while t.year <= horizon:
+            if not self.months >> t.month & 1:
+                month = _next_bit(self.months, t.month + 1)
+                if month is None:
+                    t = t.replace(year=t.year + 1, month=_next_bit(self.months, 1), day=1, hour=0, minute=0)
+                else:
+                    t = t.replace(month=month, day=1, hour=0, minute=0)
+                continue
+            
+            if not self.day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            
+            hour = _next_bit(self.hours, t.hour)
+            if hour is None:
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if hour != t.hour:
+                t = t.replace(hour=hour, minute=0)
+            
+            minute = _next_bit(self.minutes, t.minute)
+            if minute is None:
+                t = t.replace(minute=0) + timedelta(hours=1)
+                continue
+            return t.replace(minute=minute)
+        
+        raise ValueError(f"Cron expression '{self.expression}' has no occurrence within {MAX_YEARS_AHEAD} years")
+    
+    def instants(self, naive: datetime, tz) -> List[datetime]:
+        """The moments a matching wall-clock time occurs at in tz, in order"""
+        try:
+            return [tz.localize(naive, is_dst=None)]
+        except pytz.NonExistentTimeError:
+            # Skipped hour when clocks go forward: shifted forward by normalize()
+            return [tz.normalize(tz.localize(naive, is_dst=False))]
+        except pytz.AmbiguousTimeError:
+            first = tz.localize(naive, is_dst=True)
+            if not self.repeats_in_fold:
+                return [first]
+            return [first, tz.localize(naive, is_dst=False)]
+    
+    def next_after(self, now: datetime, tz) -> datetime:
+        """Next occurrence after an aware datetime, localized to tz"""
+        local_now = now.astimezone(tz)
+        candidate = local_now.replace(tzinfo=None)
+        shift = local_now.dst()
+        if shift and (local_now + shift).astimezone(tz).utcoffset() < local_now.utcoffset():
+            # First pass of the repeated hour: wall times before now are due again in the second pass
+            candidate -= shift
+        
+        best = None
+        while True:
+            candidate = self.next_naive(candidate)
+            instants = self.instants(candidate, tz)
+            for result in instants:
+                if result > local_now and (best is None or result < best):
+                    best = result
+            # Instants only come out of wall-clock order inside the repeated hour, so once past
+            # it the earliest one found is the answer
+            if best is not None and len(instants) == 1:
+                return best
+    
+    def iter_after(self, now: datetime, tz) -> Iterator[datetime]:
+        """Yield successive occurrences after now"""
+        current = now
+        while True:
+            current = self.next_after(current, tz)
+            yield current
+
+class CroniterFallback:
+    """Wraps croniter for syntax the compiler does not handle (L, #, seconds, aliases)"""
+    __slots__ = ('expression',)
+    
+    def __init__(self, expression: str):
+        from croniter import croniter
+        if not croniter.is_valid(expression):
+            raise ValueError(f"Invalid cron expression: {expression}")
+        self.expression = expression
+    
+    def next_after(self, now: datetime, tz) -> datetime:
+        from croniter import croniter
+        next_run = croniter(self.expression, now.astimezone(tz)).get_next(datetime)
+        if next_run.tzinfo is None:
+            next_run = tz.localize(next_run)
+        return next_run
+    
+    def iter_after(self, now: datetime, tz) -> Iterator[datetime]:
+        current = now
+        while True:
+            current = self.next_after(current, tz)
+            yield current
+
+@lru_cache(maxsize=4096)
+def _compile(expression: str):
+    try:
+        return CompiledCron(expression)
+    except ValueError:
+        return CroniterFallback(expression)
+
+def compile_cron(expression: str):
+    """Compile (and memoise) a cron expression; raises ValueError if invalid"""
+    return _compile(' '.join(expression.split()))
+
+def is_valid_cron(expression: str) -> bool:
+    """Whether the expression parses and ever fires ("0 0 31 2 *" does not)"""
+    try:
+        tz = get_timezone(Config.TIMEZONE)
+        compile_cron(expression).next_after(datetime.now(tz), tz)
+        return True
+    except Exception:
+        return False
+
+def next_occurrence(expression: str, now: datetime = None, timezone_str: str = None) -> Optional[datetime]:
+    """Next run of a cron expression after now, in the given timezone"""
+    try:
+        tz = get_timezone(timezone_str or Config.TIMEZONE)
+        now = now or datetime.now(tz)
+        return compile_cron(expression).next_after(now, tz)
+    except Exception as e:
+        logger.error(f"Error calculating next occurrence for cron '{expression}': {e}")
+        return None
+
+def batch_next_runs(schedules: Iterable[Dict[str, Any]], now: datetime = None,
+                    timezone_str: str = None) -> Dict[Any, Optional[datetime]]:
+    """Next run per schedule id, evaluating each distinct expression only once"""
+    tz = get_timezone(timezone_str or Config.TIMEZONE)
+    now = now or datetime.now(tz)
+    
+    by_expression: Dict[str, List[Any]] = {}
+    for schedule in schedules:
+        expression = schedule.get('cron_expression')
+        if expression:
+            by_expression.setdefault(' '.join(expression.split()), []).append(schedule['id'])
+    
+    results: Dict[Any, Optional[datetime]] = {}
+    for expression, schedule_ids in by_expression.items():
+        try:
+            next_run = compile_cron(expression).next_after(now, tz)
+        except Exception as e:
+            logger.error(f"Error calculating next run for cron '{expression}': {e}")
+            next_run = None
+        for schedule_id in schedule_ids:
+            results[schedule_id] = next_run
+    return results
\ No newline at end of file
@@ -1,9 +1,11 @@
 import logging
+import time
 from functools import wraps
 from telegram import Update
 from telegram.ext import ContextTypes
 from config import Config
 from supabase_client import db
+from metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -71,4 +73,20 @@ def handle_errors(func):
                 await update.message.reply_text(error_message)
             elif update.callback_query:
                 await update.callback_query.answer(error_message, show_alert=True)
+    return wrapper
+
+def timed_handler(func, name: str = None):
+    """Decorator that records wall time and failures of a handler in the metrics registry"""
+    handler_name = name or f"{func.__module__}.{getattr(func, '__qualname__', func.__name__)}"
+    
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            metrics.inc('handler_errors_total', handler=handler_name)
+            raise
+        finally:
+            metrics.observe('handler_duration_seconds', time.perf_counter() - started, handler=handler_name)
     return wrapper
\ No newline at end of file
@@ -0,0 +1,92 @@
+import logging
+import random
+from typing import NamedTuple, Optional
+
+from telegram.error import (
+    TelegramError, Forbidden, BadRequest, TimedOut, NetworkError,
+    RetryAfter, ChatMigrated, InvalidToken
+)
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Send outcomes
+SEND_OK = 'ok'
+SEND_TRANSIENT = 'transient'          # timeouts, network errors, Telegram 5xx: retry later
+SEND_RATE_LIMITED = 'rate_limited'    # RetryAfter: retry after the requested delay
+SEND_PERMANENT = 'permanent'          # this post can never be sent as is (bad file id, too long...)
+SEND_CHANNEL_LOST = 'channel_lost'    # bot removed, blocked or lacks rights in the channel
+
+RETRYABLE_OUTCOMES = (SEND_TRANSIENT, SEND_RATE_LIMITED)
+
+# BadRequest messages that mean the channel itself is unusable
+CHANNEL_LOST_MARKERS = (
+    'chat not found',
+    'bot is not a member',
+    'bot was kicked',
+    'bot was blocked',
+    'not enough rights',
+    'have no rights to send',
+    'need administrator rights',
+    'chat_write_forbidden',
+    'chat_admin_required',
+)
+
+# BadRequest messages that mean the source message of a copied post is gone
+SOURCE_GONE_MARKERS = (
+    'message to copy not found',
+    'message_id_invalid',
+    'message not found',
+)
+
+class SendResult(NamedTuple):
+    """Outcome of one send attempt"""
+    outcome: str
+    error: Optional[str] = None
+    retry_after: Optional[float] = None
+    message_id: Optional[int] = None
+    
+    @property
+    def ok(self) -> bool:
+        return self.outcome == SEND_OK
+    
+    @property
+    def retryable(self) -> bool:
+        return self.outcome in RETRYABLE_OUTCOMES
+
+def classify_send_error(error: Exception) -> SendResult:
+    """Map an exception raised while sending into a typed send outcome"""
+    message = str(error)
+    lowered = message.lower()
+    
+    if isinstance(error, RetryAfter):
+        retry_after = error.retry_after
+        if hasattr(retry_after, 'total_seconds'):
+            retry_after = retry_after.total_seconds()
+        return SendResult(SEND_RATE_LIMITED, message, float(retry_after))
+    if isinstance(error, (Forbidden, ChatMigrated)):
+        return SendResult(SEND_CHANNEL_LOST, message)
+    if isinstance(error, BadRequest):
+        # BadRequest subclasses NetworkError, so it has to be checked first
+        if any(marker in lowered for marker in CHANNEL_LOST_MARKERS):
+            return SendResult(SEND_CHANNEL_LOST, message)
+        return SendResult(SEND_PERMANENT, message)
+    if isinstance(error, InvalidToken):
+        return SendResult(SEND_PERMANENT, message)
+    if isinstance(error, (TimedOut, NetworkError)):
+        return SendResult(SEND_TRANSIENT, message)
+    if isinstance(error, TelegramError):
+        # Unknown API errors are retried a bounded number of times before dead-lettering
+        return SendResult(SEND_TRANSIENT, message)
+    return SendResult(SEND_TRANSIENT, message)
+
+def backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """Seconds to wait before retry number `attempt` (1-based): exponential backoff with jitter"""
+    if retry_after is not None:
+        # Telegram told us exactly how long to wait; add a little jitter so retries don't align
+        return retry_after + random.uniform(0, max(1.0, retry_after * 0.1))
+    
+    ceiling = min(Config.RETRY_MAX_DELAY, Config.RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+    # "Equal jitter": keep half the delay, randomise the other half
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
\ No newline at end of file
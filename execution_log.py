@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import math
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Dict, Optional, Any
+
+import pytz
+
+from config import Config
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class ExecutionLogWriter:
+    """Buffers schedule execution records and writes them to the database in batches"""
+    def __init__(self):
+        self.buffer: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flushing = False
+    
+    def record(self, schedule: Dict[str, Any], outcome: str, planned_at: datetime = None,
+               claimed_at: datetime = None, sent_at: datetime = None, send_seconds: float = None,
+               message_id: int = None, run_id: int = None, attempt: int = 0, error: str = None):
+        """Queue one execution record for a schedule or retry row; never blocks or touches the database"""
+        from helpers import parse_timestamp
+        
+        if planned_at is None and schedule.get('next_run_at'):
+            planned_at = parse_timestamp(schedule['next_run_at'])
+        finished_at = sent_at or datetime.now(pytz.UTC)
+        
+        self.buffer.append({
+            # Retry rows carry the schedule id separately from their own id
+            'schedule_id': schedule['schedule_id'] if 'schedule_id' in schedule else schedule.get('id'),
+            'run_id': run_id,
+            'post_id': schedule['post_id'],
+            'channel_tg_id': schedule['channel_tg_id'],
+            'user_id': schedule['user_id'],
+            'planned_at': planned_at.isoformat() if planned_at else None,
+            'claimed_at': claimed_at.isoformat() if claimed_at else None,
+            'sent_at': finished_at.isoformat(),
+            'lag_ms': int((finished_at - planned_at).total_seconds() * 1000) if planned_at else None,
+            'send_ms': int(send_seconds * 1000) if send_seconds is not None else None,
+            'message_id': message_id,
+            'outcome': outcome,
+            'attempt': attempt,
+            'error': error[:500] if error else None
+        })
+        metrics.inc('schedule_executions_total', outcome=outcome)
+        
+        # Bounded memory if the database is unreachable for a long time
+        overflow = len(self.buffer) - Config.EXECUTION_LOG_MAX_BUFFER
+        if overflow > 0:
+            del self.buffer[:overflow]
+            metrics.inc('execution_log_dropped_total', overflow)
+        
+        if len(self.buffer) >= Config.EXECUTION_LOG_BATCH_SIZE and self._wakeup:
+            self._wakeup.set()
+    
+    def start(self):
+        """Start the background flush loop"""
+        if self._flush_task and not self._flush_task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still buffered"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=Config.EXECUTION_LOG_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+    
+    async def flush(self) -> int:
+        """Write buffered records in batches; failed batches are put back for the next flush"""
+        if self._flushing or not self.buffer:
+            return 0
+        
+        from supabase_client import db
+        
+        self._flushing = True
+        written = 0
+        try:
+            while self.buffer:
+                batch = self.buffer[:Config.EXECUTION_LOG_BATCH_SIZE]
+                del self.buffer[:len(batch)]
+                try:
+                    added = await db.add_executions(batch)
+                except asyncio.CancelledError:
+                    # stop() cancelled the writer mid-insert: keep the batch for its final flush
+                    self.buffer[:0] = batch
+                    raise
+                if not added:
+                    self.buffer[:0] = batch
+                    break
+                written += len(batch)
+        finally:
+            self._flushing = False
+        
+        if written:
+            logger.debug(f"Execution log: wrote {written} records")
+        return written
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..100) of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def summarize_executions(rows: List[Dict[str, Any]], timezone) -> Dict[str, Any]:
+    """Aggregate execution rows into lag-by-hour and failure-rate-by-channel views"""
+    from helpers import parse_timestamp
+    
+    lags_by_hour: Dict[int, List[float]] = defaultdict(list)
+    by_channel: Dict[int, Dict[str, int]] = defaultdict(lambda: {'total': 0, 'failed': 0})
+    all_lags = []
+    send_times = []
+    failed = 0
+    
+    for row in rows:
+        channel = by_channel[row['channel_tg_id']]
+        channel['total'] += 1
+        if row['outcome'] != 'ok':
+            channel['failed'] += 1
+            failed += 1
+            continue
+        
+        if row.get('lag_ms') is not None and row.get('planned_at'):
+            hour = parse_timestamp(row['planned_at']).astimezone(timezone).hour
+            lag = row['lag_ms'] / 1000
+            lags_by_hour[hour].append(lag)
+            all_lags.append(lag)
+        if row.get('send_ms') is not None:
+            send_times.append(row['send_ms'] / 1000)
+    
+    return {
+        'total': len(rows),
+        'failed': failed,
+        'lag_p50': percentile(all_lags, 50),
+        'lag_p95': percentile(all_lags, 95),
+        'send_p95': percentile(send_times, 95),
+        'lag_p95_by_hour': {hour: percentile(lags, 95) for hour, lags in sorted(lags_by_hour.items())},
+        'runs_by_hour': {hour: len(lags) for hour, lags in sorted(lags_by_hour.items())},
+        'failure_rate_by_channel': {
+            channel_tg_id: (counts['failed'] / counts['total'], counts['total'])
+            for channel_tg_id, counts in by_channel.items()
+        }
+    }
+
+# Global instance
+execution_log = ExecutionLogWriter()
\ No newline at end of file
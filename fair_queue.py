@@ -0,0 +1,69 @@
+import asyncio
+import heapq
+import itertools
+from typing import Any, Dict, Hashable, List, Tuple
+
+class FairQueue:
+    """Weighted fair queue (self-clocked): each flow gets service in proportion to its weight"""
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Hashable, Any]] = []
+        self._last_finish: Dict[Hashable, float] = {}
+        self._sizes: Dict[Hashable, int] = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self._not_empty = asyncio.Event()
+    
+    def __len__(self) -> int:
+        return len(self._heap)
+    
+    def put(self, flow: Hashable, item: Any, weight: float = 1.0, cost: float = 1.0):
+        """Queue an item for a flow; heavier weights and cheaper items are served sooner"""
+        # A flow that has been idle restarts at the current virtual time instead of
+        # spending credit it did not use, so a burst can't starve the other flows later
+        start = max(self._virtual_time, self._last_finish.get(flow, 0.0))
+        finish = start + cost / max(weight, 1e-9)
+        self._last_finish[flow] = finish
+        self._sizes[flow] = self._sizes.get(flow, 0) + 1
+        heapq.heappush(self._heap, (finish, next(self._seq), flow, item))
+        self._not_empty.set()
+    
+    def get_nowait(self) -> Tuple[Hashable, Any]:
+        """Pop the item with the smallest finish tag; raises IndexError when empty"""
+        finish, _, flow, item = heapq.heappop(self._heap)
+        self._virtual_time = finish
+        
+        self._sizes[flow] -= 1
+        if not self._sizes[flow]:
+            del self._sizes[flow]
+            del self._last_finish[flow]
+        if not self._heap:
+            self._not_empty.clear()
+        return flow, item
+    
+    async def get(self) -> Tuple[Hashable, Any]:
+        """Wait for and pop the next item in fair order"""
+        while not self._heap:
+            await self._not_empty.wait()
+        return self.get_nowait()
+    
+    async def wait(self):
+        """Wait until the queue has items or wake() is called"""
+        await self._not_empty.wait()
+    
+    def wake(self):
+        """Release wait() even though nothing was queued (used on shutdown)"""
+        self._not_empty.set()
+    
+    def flow_sizes(self) -> Dict[Hashable, int]:
+        """Queued items per flow"""
+        return dict(self._sizes)
+    
+    def clear(self) -> List[Any]:
+        """Drop everything queued and return the dropped items"""
+        items = [item for _, _, _, item in self._heap]
+        self._heap.clear()
+        self._last_finish.clear()
+        self._sizes.clear()
+        self._virtual_time = 0.0
+        self._not_empty.clear()
+        return items
\ No newline at end of file
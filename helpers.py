@@ -1,9 +1,10 @@
 import re
 import pytz
 from datetime import datetime, time, timedelta
-from croniter import croniter
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from config import Config
+from cron_engine import get_timezone, is_valid_cron, next_occurrence
+from media_types import MEDIA_TYPES
 
 def is_valid_time_format(time_str: str) -> bool:
     """Check if time string is in valid HH:MM format"""
@@ -23,17 +24,14 @@ def parse_time_string(time_str: str) -> Optional[time]:
 
 def get_next_occurrence(cron_expression: str, timezone_str: str = None) -> Optional[datetime]:
     """Get the next occurrence of a cron expression"""
-    try:
-        tz = pytz.timezone(timezone_str or Config.TIMEZONE)
-        now = datetime.now(tz)
-        
-        # Create croniter instance
-        cron = croniter(cron_expression, now)
-        next_run = cron.get_next(datetime)
-        
-        return next_run
-    except Exception:
-        return None
+    return next_occurrence(cron_expression, timezone_str=timezone_str)
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO timestamp from the database into an aware UTC datetime"""
+    dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = pytz.UTC.localize(dt)
+    return dt.astimezone(pytz.UTC)
 
 def create_cron_expression(schedule_type: str, time_obj: time = None, weekday: int = None) -> Optional[str]:
     """Create cron expression based on schedule type"""
@@ -54,22 +52,15 @@ def create_cron_expression(schedule_type: str, time_obj: time = None, weekday: i
 
 def validate_cron_expression(cron_expr: str) -> bool:
     """Validate cron expression"""
-    try:
-        # Test if croniter can parse it
-        cron = croniter(cron_expr)
-        # Try to get next occurrence
-        cron.get_next()
-        return True
-    except Exception:
-        return False
+    return is_valid_cron(cron_expr)
 
 def format_datetime_arabic(dt: datetime) -> str:
     """Format datetime in Arabic-friendly format"""
     if dt.tzinfo is None:
-        tz = pytz.timezone(Config.TIMEZONE)
+        tz = get_timezone(Config.TIMEZONE)
         dt = tz.localize(dt)
     else:
-        tz = pytz.timezone(Config.TIMEZONE)
+        tz = get_timezone(Config.TIMEZONE)
         dt = dt.astimezone(tz)
     
     weekdays_ar = ['الأحد', 'الإثنين', 'الثلاثاء', 'الأربعاء', 'الخميس', 'الجمعة', 'السبت']
@@ -102,24 +93,14 @@ def escape_markdown(text: str) -> str:
 def is_media_message(message) -> Tuple[bool, Optional[str], Optional[str]]:
     """Check if message contains media and return type and file_id - enhanced version"""
     try:
-        if hasattr(message, 'photo') and message.photo:
-            return True, "photo", message.photo[-1].file_id
-        elif hasattr(message, 'video') and message.video:
-            return True, "video", message.video.file_id
-        elif hasattr(message, 'document') and message.document:
-            return True, "document", message.document.file_id
-        elif hasattr(message, 'audio') and message.audio:
-            return True, "audio", message.audio.file_id
-        elif hasattr(message, 'voice') and message.voice:
-            return True, "voice", message.voice.file_id
-        elif hasattr(message, 'video_note') and message.video_note:
-            return True, "video_note", message.video_note.file_id
-        elif hasattr(message, 'sticker') and message.sticker:
-            return True, "sticker", message.sticker.file_id
-        elif hasattr(message, 'animation') and message.animation:
-            return True, "animation", message.animation.file_id
-        else:
-            return False, None, None
+        for media_type, spec in MEDIA_TYPES.items():
+            media = getattr(message, spec.file_param, None)
+            if media:
+                # Photos come as a list of sizes, the last one is the largest
+                if isinstance(media, (list, tuple)):
+                    media = media[-1]
+                return True, media_type, media.file_id
+        return False, None, None
     except AttributeError as e:
         # Log the error but don't crash
         import logging
@@ -230,6 +211,30 @@ def format_schedule_info(cron_expr: str, next_run: datetime) -> str:
     
     return f"📅 النوع: {schedule_desc}\n⏰ الموعد القادم: {next_run_formatted}"
 
+def format_channel_list(channels: List[Dict[str, Any]], limit: int = 10) -> str:
+    """Channel line(s) for a scheduling confirmation"""
+    if len(channels) == 1:
+        return f"📺 القناة: {channels[0]['channel_name']}"
+    
+    names = "، ".join(channel['channel_name'] for channel in channels[:limit])
+    if len(channels) > limit:
+        names += f" و {len(channels) - limit} أخرى"
+    return f"📺 القنوات ({len(channels)}): {names}"
+
+def format_queue_line(pool: Optional[List[int]]) -> str:
+    """Confirmation line for a rotating queue schedule (empty for a single post)"""
+    return f"🔁 طابور من {len(pool)} منشور، يُنشر واحد منها في كل موعد\n" if pool else ""
+
+def format_notification_settings(mute_success: bool) -> str:
+    """Format the user's notification preferences for display"""
+    success_status = "مكتومة" if mute_success else "مفعّلة"
+    return (
+        "🔔 إعدادات الإشعارات\n\n"
+        f"✅ إشعارات النشر الناجح: {success_status}\n\n"
+        "يتم تجميع إشعارات النشر في رسالة ملخص واحدة كل دقيقة. "
+        "إشعارات الفشل والتخطي تصلك دائماً."
+    )
+
 def sanitize_channel_name(name: str) -> str:
     """Sanitize channel name for display"""
     if not name:
@@ -260,17 +265,20 @@ def get_media_caption(message) -> Optional[str]:
     except AttributeError:
         return None
 
-def create_once_schedule(target_datetime: datetime) -> Tuple[str, datetime]:
-    """Create a one-time schedule cron expression"""
-    # For one-time schedules, we'll use a specific cron that matches the exact time
-    # But since cron doesn't support year/date, we'll handle this differently in the scheduler
-    cron_expr = f"{target_datetime.minute} {target_datetime.hour} {target_datetime.day} {target_datetime.month} *"
-    return cron_expr, target_datetime
+def create_once_schedule(target_datetime: datetime) -> Optional[datetime]:
+    """Normalise a one-time schedule target to UTC; None if it is not in the future"""
+    if target_datetime.tzinfo is None:
+        target_datetime = get_timezone(Config.TIMEZONE).localize(target_datetime)
+    
+    target_utc = target_datetime.astimezone(pytz.UTC)
+    if target_utc <= datetime.now(pytz.UTC):
+        return None
+    return target_utc
 
 def parse_datetime_input(date_str: str, time_str: str, timezone_str: str = None) -> Optional[datetime]:
     """Parse date and time input strings into datetime object"""
     try:
-        tz = pytz.timezone(timezone_str or Config.TIMEZONE)
+        tz = get_timezone(timezone_str or Config.TIMEZONE)
         
         # Parse date (DD/MM/YYYY or DD-MM-YYYY)
         date_str = date_str.replace('-', '/').replace('.', '/')
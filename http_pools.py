@@ -0,0 +1,152 @@
+import logging
+import time
+from typing import Any, Dict
+
+import httpx
+from telegram.request import HTTPXRequest
+
+from config import Config
+from metrics import metrics
+from performance import JSON_BACKEND, json_loads
+
+logger = logging.getLogger(__name__)
+
+POOL_WAIT_METRIC = 'http_pool_wait_seconds'
+REQUEST_METRIC = 'http_request_seconds'
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def use_http2() -> bool:
+    return Config.HTTP2_ENABLED and http2_available()
+
+def build_limits(pool_size: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY
+    )
+
+# httpcore only emits trace events once a connection has been handed out by the
+# pool, so the delay until the first event is the time spent waiting for one.
+class PoolTimingTransport(httpx.AsyncHTTPTransport):
+    """Async transport that exports connection pool wait time per pool"""
+    def __init__(self, pool_name: str, **kwargs):
+        super().__init__(**kwargs)
+        self.pool_name = pool_name
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        state = {'acquired': False}
+        
+        async def trace(event_name: str, info: Dict[str, Any]):
+            if not state['acquired']:
+                state['acquired'] = True
+                metrics.observe(POOL_WAIT_METRIC, time.perf_counter() - started, pool=self.pool_name)
+        
+        request.extensions = {**request.extensions, 'trace': trace}
+        try:
+            return await super().handle_async_request(request)
+        except httpx.PoolTimeout:
+            metrics.inc('http_pool_timeouts_total', pool=self.pool_name)
+            raise
+        finally:
+            metrics.observe(REQUEST_METRIC, time.perf_counter() - started, pool=self.pool_name)
+
+class SyncPoolTimingTransport(httpx.HTTPTransport):
+    """Sync counterpart of PoolTimingTransport for the Supabase client"""
+    def __init__(self, pool_name: str, **kwargs):
+        super().__init__(**kwargs)
+        self.pool_name = pool_name
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        state = {'acquired': False}
+        
+        def trace(event_name: str, info: Dict[str, Any]):
+            if not state['acquired']:
+                state['acquired'] = True
+                metrics.observe(POOL_WAIT_METRIC, time.perf_counter() - started, pool=self.pool_name)
+        
+        request.extensions = {**request.extensions, 'trace': trace}
+        try:
+            return super().handle_request(request)
+        except httpx.PoolTimeout:
+            metrics.inc('http_pool_timeouts_total', pool=self.pool_name)
+            raise
+        finally:
+            metrics.observe(REQUEST_METRIC, time.perf_counter() - started, pool=self.pool_name)
+
+class PooledHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest with keep-alive tuning and pool wait instrumentation"""
+    def __init__(self, pool_name: str, connection_pool_size: int, **kwargs):
+        # Set before super().__init__ because it calls _build_client()
+        self.pool_name = pool_name
+        self.pool_limits = build_limits(connection_pool_size)
+        super().__init__(connection_pool_size=connection_pool_size, **kwargs)
+    
+    def _build_client(self) -> httpx.AsyncClient:
+        # A fresh transport per client so initialize() after shutdown() works
+        client_kwargs = dict(self._client_kwargs)
+        client_kwargs['limits'] = self.pool_limits
+        client_kwargs['transport'] = PoolTimingTransport(
+            self.pool_name,
+            limits=self.pool_limits,
+            http1=True,
+            http2=client_kwargs.get('http2', False)
+        )
+        return httpx.AsyncClient(**client_kwargs)
+    
+    @staticmethod
+    def parse_json_payload(payload: bytes) -> Dict[str, Any]:
+        """Decode Telegram responses (including get_updates) with the profile's codec"""
+        if JSON_BACKEND != 'json':
+            try:
+                return json_loads(payload)
+            except ValueError:
+                # Let the stdlib path handle invalid UTF-8 and log the payload
+                pass
+        return HTTPXRequest.parse_json_payload(payload)
+
+def build_telegram_requests():
+    """Build separate request pools for send traffic and get_updates long polling"""
+    http_version = '2' if use_http2() else '1.1'
+    
+    send_request = PooledHTTPXRequest(
+        'telegram_send',
+        connection_pool_size=Config.TELEGRAM_POOL_SIZE,
+        pool_timeout=Config.HTTP_POOL_TIMEOUT,
+        http_version=http_version
+    )
+    
+    # Long polling holds its connection for the whole timeout, keep it on its own pool
+    updates_request = PooledHTTPXRequest(
+        'telegram_updates',
+        connection_pool_size=Config.TELEGRAM_UPDATES_POOL_SIZE,
+        pool_timeout=Config.HTTP_POOL_TIMEOUT,
+        http_version='1.1'
+    )
+    
+    logger.info(
+        f"Telegram pools: send={Config.TELEGRAM_POOL_SIZE} ({http_version}), "
+        f"updates={Config.TELEGRAM_UPDATES_POOL_SIZE}"
+    )
+    return send_request, updates_request
+
+def build_supabase_http_client() -> httpx.Client:
+    """Shared, instrumented connection pool for the Supabase REST clients"""
+    limits = build_limits(Config.SUPABASE_POOL_SIZE)
+    http2 = use_http2()
+    transport = SyncPoolTimingTransport('supabase', limits=limits, http1=True, http2=http2)
+    return httpx.Client(
+        transport=transport,
+        limits=limits,
+        http2=http2,
+        timeout=httpx.Timeout(Config.SUPABASE_TIMEOUT, pool=Config.HTTP_POOL_TIMEOUT),
+        follow_redirects=True
+    )
\ No newline at end of file
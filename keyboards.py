@@ -7,7 +7,8 @@ class Keyboards:
         """Main menu keyboard for regular users"""
         keyboard = [
             [KeyboardButton("➕ إضافة قناة جديدة")],
-            [KeyboardButton("📁 قنواتي ومنشوراتي")]
+            [KeyboardButton("📁 قنواتي ومنشوراتي")],
+            [KeyboardButton("🔔 إعدادات الإشعارات")]
         ]
         return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
     
@@ -17,7 +18,9 @@ class Keyboards:
         keyboard = [
             [InlineKeyboardButton("📊 إحصائيات عامة", callback_data="admin_stats")],
             [InlineKeyboardButton("👁️ عرض جميع القنوات", callback_data="admin_channels")],
-            [InlineKeyboardButton("📣 إرسال رسالة عامة", callback_data="admin_broadcast")]
+            [InlineKeyboardButton("📣 إرسال رسالة عامة", callback_data="admin_broadcast")],
+            [InlineKeyboardButton("📈 توزيع الإرسال المتوقع", callback_data="admin_send_histogram")],
+            [InlineKeyboardButton("📉 تحليلات التنفيذ", callback_data="admin_exec_stats")]
         ]
         return InlineKeyboardMarkup(keyboard)
     
@@ -41,22 +44,39 @@ class Keyboards:
             [InlineKeyboardButton("📝 عرض/تعديل المنشورات", callback_data=f"posts_{channel_id}")],
             [InlineKeyboardButton("➕ إنشاء منشور جديد", callback_data=f"new_post_{channel_id}")],
             [InlineKeyboardButton("⏰ إعدادات الجدولة", callback_data=f"schedule_{channel_id}")],
+            [InlineKeyboardButton("🔁 طابور منشورات دوري", callback_data=f"queue_{channel_id}")],
             [InlineKeyboardButton("🗑️ حذف القناة من البوت", callback_data=f"delete_channel_{channel_id}")],
             [InlineKeyboardButton("🔙 رجوع للقنوات", callback_data="my_channels")]
         ]
         return InlineKeyboardMarkup(keyboard)
     
+    @staticmethod
+    def notification_settings(mute_success: bool):
+        """User notification preferences"""
+        success_text = "🔔 تفعيل إشعارات النجاح" if mute_success else "🔕 كتم إشعارات النجاح"
+        keyboard = [
+            [InlineKeyboardButton(success_text, callback_data=f"notify_success_{mute_success}")],
+            [InlineKeyboardButton("🔙 القائمة الرئيسية", callback_data="main_menu")]
+        ]
+        return InlineKeyboardMarkup(keyboard)
+    
+    @staticmethod
+    def channel_schedule_settings(channel_id: int, jitter_enabled: bool):
+        """Channel scheduling settings"""
+        jitter_text = "⏱️ إيقاف توزيع الإرسال" if jitter_enabled else "⏱️ تفعيل توزيع الإرسال"
+        keyboard = [
+            [InlineKeyboardButton(jitter_text, callback_data=f"jitter_{channel_id}_{not jitter_enabled}")],
+            [InlineKeyboardButton("🔙 رجوع لإدارة القناة", callback_data=f"channel_{channel_id}")]
+        ]
+        return InlineKeyboardMarkup(keyboard)
+    
     @staticmethod
     def channel_posts(posts: List[Dict[str, Any]], channel_id: int):
         """Display channel posts with actions"""
         keyboard = []
         for post in posts:
-            content_preview = post['post_content'][:30] + "..." if post['post_content'] and len(post['post_content']) > 30 else post['post_content']
-            if not content_preview:
-                content_preview = f"[{post['media_type']}]" if post['media_type'] else "[منشور فارغ]"
-            
             keyboard.append([InlineKeyboardButton(
-                f"📄 {content_preview}",
+                f"📄 {Keyboards.post_preview(post)}",
                 callback_data=f"post_{post['id']}"
             )])
         
@@ -64,6 +84,29 @@ class Keyboards:
         keyboard.append([InlineKeyboardButton("🔙 رجوع لإدارة القناة", callback_data=f"channel_{channel_id}")])
         return InlineKeyboardMarkup(keyboard)
     
+    @staticmethod
+    def post_preview(post: Dict[str, Any]) -> str:
+        """Short label for a post button"""
+        content_preview = post['post_content'][:30] + "..." if post['post_content'] and len(post['post_content']) > 30 else post['post_content']
+        if not content_preview:
+            content_preview = f"[{post['media_type']}]" if post['media_type'] else "[منشور فارغ]"
+        return content_preview
+    
+    @staticmethod
+    def queue_posts(channel_id: int, posts: List[Dict[str, Any]], pool: List[int]):
+        """Pick the posts of a rotating queue, numbered in sending order"""
+        keyboard = []
+        for post in posts:
+            mark = f"{pool.index(post['id']) + 1}." if post['id'] in pool else "⬜"
+            keyboard.append([InlineKeyboardButton(
+                f"{mark} {Keyboards.post_preview(post)}",
+                callback_data=f"queue_toggle_{channel_id}_{post['id']}"
+            )])
+        
+        keyboard.append([InlineKeyboardButton(f"➡️ متابعة ({len(pool)} منشور)", callback_data=f"queue_done_{channel_id}")])
+        keyboard.append([InlineKeyboardButton("🔙 رجوع لإدارة القناة", callback_data=f"channel_{channel_id}")])
+        return InlineKeyboardMarkup(keyboard)
+    
     @staticmethod
     def post_actions(post_id: int, channel_id: int):
         """Post action menu"""
@@ -76,18 +119,41 @@ class Keyboards:
         return InlineKeyboardMarkup(keyboard)
     
     @staticmethod
-    def schedule_options(post_id: int):
+    def schedule_options(post_id: int, recurring_only: bool = False):
         """Schedule timing options"""
-        keyboard = [
-            [InlineKeyboardButton("مرة واحدة", callback_data=f"sched_once_{post_id}")],
+        keyboard = [] if recurring_only else [
+            [InlineKeyboardButton("مرة واحدة", callback_data=f"sched_once_{post_id}")]
+        ]
+        keyboard += [
             [InlineKeyboardButton("يومياً", callback_data=f"sched_daily_{post_id}")],
             [InlineKeyboardButton("أسبوعياً", callback_data=f"sched_weekly_{post_id}")],
             [InlineKeyboardButton("كل يومين", callback_data=f"sched_2days_{post_id}")],
             [InlineKeyboardButton("مخصص (Cron)", callback_data=f"sched_custom_{post_id}")],
+            [InlineKeyboardButton("📢 النشر في عدة قنوات", callback_data=f"fanout_{post_id}")],
             [InlineKeyboardButton("🔙 رجوع", callback_data=f"post_{post_id}")]
         ]
         return InlineKeyboardMarkup(keyboard)
     
+    @staticmethod
+    def fanout_channels(post_id: int, channels: List[Dict[str, Any]], selected: set):
+        """Pick the channels a post is scheduled in"""
+        keyboard = []
+        for channel in channels:
+            mark = "✅" if channel['id'] in selected else "⬜"
+            keyboard.append([InlineKeyboardButton(
+                f"{mark} {channel['channel_name']}",
+                callback_data=f"fanout_toggle_{post_id}_{channel['id']}"
+            )])
+        
+        all_selected = len(selected) == len(channels)
+        keyboard.append([InlineKeyboardButton(
+            "⬜ إلغاء تحديد الكل" if all_selected else "☑️ تحديد الكل",
+            callback_data=f"fanout_all_{post_id}_{not all_selected}"
+        )])
+        keyboard.append([InlineKeyboardButton(f"➡️ متابعة ({len(selected)} قناة)", callback_data=f"fanout_done_{post_id}")])
+        keyboard.append([InlineKeyboardButton("🔙 رجوع", callback_data=f"schedule_post_{post_id}")])
+        return InlineKeyboardMarkup(keyboard)
+    
     @staticmethod
     def confirm_delete(item_type: str, item_id: int):
         """Confirmation for delete actions"""
@@ -15,7 +15,7 @@ import os
 from telegram import Update
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, CallbackQueryHandler,
-    filters, ContextTypes
+    ChatMemberHandler, TypeHandler, filters, ContextTypes
 )
 from telegram.error import TelegramError
 
@@ -26,6 +26,14 @@ from user_handlers import user_handlers
 from admin_handlers import admin_handlers
 from callback_handlers import callback_handlers
 from scheduler import PostScheduler
+from http_pools import build_telegram_requests
+from metrics import metrics
+from execution_log import execution_log
+from notifications import notification_digest
+from schedule_events import schedule_events, build_change_feed
+from decorators import timed_handler
+from throttle import user_throttle
+from performance import install_event_loop_policy, describe_profile, json_loads
 
 # Setup logging
 logger = setup_logging()
@@ -35,6 +43,10 @@ class ChannelBot:
         self.app = None
         self.scheduler = None
         self.web_app = None
+        self.web_runner = None
+        self.scheduler_task = None
+        self.shutdown_event = asyncio.Event()
+        self.is_shutting_down = False
     
     async def initialize(self):
         """Initialize the bot and all components"""
@@ -42,12 +54,23 @@ class ChannelBot:
             # Validate configuration
             Config.validate()
             logger.info("Configuration validated successfully")
+            logger.info(f"Performance profile: {describe_profile()}")
             
-            # Test bot connection first
-            await self.test_bot_connection()
+            # Create bot application (no network I/O happens here)
+            send_request, updates_request = build_telegram_requests()
+            self.app = (
+                Application.builder()
+                .token(Config.BOT_TOKEN)
+                .request(send_request)
+                .get_updates_request(updates_request)
+                .build()
+            )
             
-            # Create bot application
-            self.app = Application.builder().token(Config.BOT_TOKEN).build()
+            # Run startup checks concurrently on the application's own bot session
+            await asyncio.gather(
+                self.test_bot_connection(),
+                self.test_database_connection()
+            )
             
             # Initialize scheduler
             self.scheduler = PostScheduler(self.app)
@@ -64,13 +87,13 @@ class ChannelBot:
     async def test_bot_connection(self):
         """Test bot connection before starting"""
         try:
-            from telegram import Bot
-            test_bot = Bot(token=Config.BOT_TOKEN)
-            bot_info = await test_bot.get_me()
+            # Bot.initialize() caches get_me(), so Application.initialize() won't repeat it
+            bot = self.app.bot
+            _, webhook_info = await asyncio.gather(bot.initialize(), bot.get_webhook_info())
+            bot_info = bot.bot
             logger.info(f"Bot connected: @{bot_info.username} (ID: {bot_info.id})")
             
             # Check current webhook status
-            webhook_info = await test_bot.get_webhook_info()
             if webhook_info.url:
                 logger.info(f"Current webhook: {webhook_info.url}")
                 if webhook_info.pending_update_count > 0:
@@ -84,12 +107,29 @@ class ChannelBot:
             logger.error(f"Bot connection test failed: {e}")
             raise
     
+    async def test_database_connection(self):
+        """Build the database client off the event loop and verify it responds"""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, db.get_client)
+        except Exception as e:
+            # Not fatal: database calls fail gracefully and the client is retried on next use
+            logger.error(f"Database client initialization failed: {e}")
+            return
+        
+        if await db.ping():
+            logger.info(f"Database connected ({Config.DB_BACKEND})")
+        else:
+            logger.warning("Database ping failed; continuing startup")
+    
     async def register_handlers(self):
         """Register all command and message handlers"""
         
         # Command handlers
         self.app.add_handler(CommandHandler("start", user_handlers.start_command))
         self.app.add_handler(CommandHandler("admin", admin_handlers.admin_command))
+        self.app.add_handler(CommandHandler("profile", admin_handlers.profile_command))
+        self.app.add_handler(CommandHandler("memsnap", admin_handlers.memory_command))
         
         # Test command for debugging
         self.app.add_handler(CommandHandler("test", self.test_command))
@@ -108,14 +148,30 @@ class ChannelBot:
         
         # Media message handlers (photos, videos, documents, etc.)
         self.app.add_handler(MessageHandler(
-            (filters.PHOTO | filters.VIDEO | filters.Document.ALL |
-             filters.AUDIO | filters.VOICE | filters.Sticker.ALL) & (~filters.COMMAND),
+            (filters.PHOTO | filters.VIDEO | filters.ANIMATION | filters.Document.ALL |
+             filters.AUDIO | filters.VOICE | filters.VIDEO_NOTE | filters.Sticker.ALL) & (~filters.COMMAND),
             self.handle_message
         ), group=2)
         
         # Callback query handler
         self.app.add_handler(CallbackQueryHandler(callback_handlers.handle_callback))
         
+        # The bot's own membership changes in channels (promoted, demoted, removed, re-added)
+        self.app.add_handler(ChatMemberHandler(user_handlers.handle_my_chat_member, ChatMemberHandler.MY_CHAT_MEMBER))
+        
+        # Time every registered handler, labelled by the handler module that does the work: the
+        # forwarded/text/media callbacks above only route to user_handlers or admin_handlers
+        routers = {self.handle_forwarded_message, self.handle_text_message, self.handle_message}
+        for handlers in self.app.handlers.values():
+            for handler in handlers:
+                if handler.callback not in routers:
+                    handler.callback = timed_handler(handler.callback)
+        user_handlers.handle_text_message = timed_handler(user_handlers.handle_text_message)
+        admin_handlers.handle_broadcast_message = timed_handler(admin_handlers.handle_broadcast_message)
+        
+        # Anti-flood runs first and stops throttled updates (not timed: stopping isn't a handler error)
+        self.app.add_handler(TypeHandler(Update, user_throttle.check_update), group=-1)
+        
         logger.info("Handlers registered successfully")
     
     async def test_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -209,15 +265,33 @@ class ChannelBot:
     
     async def start_scheduler(self):
         """Start the post scheduler"""
+        if Config.SCHEDULER_MODE == 'off':
+            logger.info("Scheduler disabled in this process (SCHEDULER_MODE=off), run worker.py")
+            return
+        
         if self.scheduler:
+            # Changes written by other replicas reach the scheduler's index through the feed
+            feed = build_change_feed()
+            if feed:
+                try:
+                    await schedule_events.connect(feed)
+                except Exception as e:
+                    logger.error(f"Could not subscribe to schedule changes, other replicas' edits "
+                                 f"will only be seen after a restart: {e}")
+            
             # Start scheduler in background
-            asyncio.create_task(self.scheduler.start_scheduler())
+            self.scheduler_task = asyncio.create_task(self.scheduler.start_scheduler())
+            execution_log.start()
             logger.info("Scheduler started in background")
     
     async def setup_web_server(self):
         """Setup web server for health checks and webhook"""
         async def health_check(request):
             """Health check endpoint"""
+            if self.is_shutting_down:
+                # Take this instance out of rotation while it drains
+                return web.json_response({"status": "draining"}, status=503)
+            
             try:
                 scheduler_status = await self.scheduler.get_scheduler_status() if self.scheduler else {"status": "not_initialized"}
                 
@@ -225,6 +299,7 @@ class ChannelBot:
                     "status": "healthy",
                     "bot": "running",
                     "scheduler": scheduler_status,
+                    "performance": describe_profile(),
                     "timestamp": asyncio.get_event_loop().time(),
                     "bot_token_set": bool(Config.BOT_TOKEN),
                     "admin_ids": len(Config.ADMIN_USER_IDS)
@@ -233,14 +308,22 @@ class ChannelBot:
                 logger.error(f"Health check error: {e}")
                 return web.json_response({"status": "error", "message": str(e)}, status=500)
         
+        async def metrics_handler(request):
+            """Prometheus metrics endpoint"""
+            return web.Response(text=metrics.render_prometheus(), content_type='text/plain')
+        
         async def root_handler(request):
             """Root endpoint - bot is alive"""
             return web.Response(text="🤖 Channel Management Bot is running!")
         
         async def webhook_handler(request):
             """Handle incoming webhooks from Telegram"""
+            if self.is_shutting_down:
+                # Telegram redelivers on errors, so a new instance picks this update up
+                return web.Response(status=503)
+            
             try:
-                data = await request.json()
+                data = json_loads(await request.read())
                 logger.info(f"Webhook received: {data.get('update_id', 'unknown')}")
                 
                 if self.app:
@@ -256,12 +339,13 @@ class ChannelBot:
         self.web_app = web.Application()
         self.web_app.router.add_get('/', root_handler)
         self.web_app.router.add_get('/health', health_check)
+        self.web_app.router.add_get('/metrics', metrics_handler)
         self.web_app.router.add_post('/webhook', webhook_handler)
         
         # Start web server
-        runner = web.AppRunner(self.web_app)
-        await runner.setup()
-        site = web.TCPSite(runner, '0.0.0.0', Config.PORT)
+        self.web_runner = web.AppRunner(self.web_app)
+        await self.web_runner.setup()
+        site = web.TCPSite(self.web_runner, '0.0.0.0', Config.PORT)
         await site.start()
         
         logger.info(f"Web server started on port {Config.PORT}")
@@ -295,24 +379,27 @@ class ChannelBot:
                 webhook_url = f"{Config.ALIVE_URL.rstrip('/')}/webhook"
                 await self.app.bot.set_webhook(
                     url=webhook_url,
+                    allowed_updates=Update.ALL_TYPES,
                     drop_pending_updates=True
                 )
                 logger.info(f"Webhook set to: {webhook_url}")
                 
-                # Keep the application running
-                while True:
-                    await asyncio.sleep(60)  # Keep alive
-                    
             else:
                 # Development - use polling
+                # (run_polling() would start its own event loop, so drive the updater directly)
                 logger.info("Using polling mode")
-                await self.app.run_polling(
+                await self.app.initialize()
+                await self.app.start()
+                await self.app.updater.start_polling(
                     allowed_updates=Update.ALL_TYPES,
                     drop_pending_updates=True,
                     timeout=20,
                     read_timeout=20,
                     connect_timeout=20
                 )
+            
+            # Keep the application running until a shutdown signal arrives
+            await self.shutdown_event.wait()
                 
         except Exception as e:
             logger.error(f"Error running bot: {e}")
@@ -321,26 +408,53 @@ class ChannelBot:
             await self.cleanup()
     
     async def cleanup(self):
-        """Cleanup resources"""
+        """Stop taking work, drain the scheduler, flush buffered writers, then close connections"""
+        if self.is_shutting_down:
+            return
+        self.is_shutting_down = True
         logger.info("Shutting down bot...")
         
+        # 1. Stop receiving new updates
+        if self.app and self.app.updater and self.app.updater.running:
+            await self.app.updater.stop()
+        
+        # 2. Stop claiming schedules; finish queued and in-flight sends until the deadline
         if self.scheduler:
-            self.scheduler.stop_scheduler()
+            await self.scheduler.stop_scheduler(Config.SHUTDOWN_DRAIN_TIMEOUT)
+        
+        await schedule_events.disconnect()
+        
+        # 3. Deliver queued digests while the bot can still send
+        await notification_digest.flush_all()
         
+        # 4. Write out buffered execution history before the process exits
+        await execution_log.stop()
+        
+        # 5. Let in-progress handlers finish, then close the bot's HTTP pools
         if self.app:
+            if self.app.running:
+                await self.app.stop()
             await self.app.shutdown()
         
+        if self.web_runner:
+            await self.web_runner.cleanup()
+        
         logger.info("Bot shutdown complete")
     
+    def request_shutdown(self, signum: int = None):
+        """Ask run() to return so cleanup() runs on the event loop"""
+        logger.info(f"Received signal {signum}, shutting down...")
+        self.shutdown_event.set()
+    
     def setup_signal_handlers(self):
         """Setup signal handlers for graceful shutdown"""
-        def signal_handler(signum, frame):
-            logger.info(f"Received signal {signum}, shutting down...")
-            asyncio.create_task(self.cleanup())
-            sys.exit(0)
-        
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.request_shutdown, signum)
+            except NotImplementedError:
+                # Windows: no loop signal handlers, fall back to a thread-safe wakeup
+                signal.signal(signum, lambda s, f: loop.call_soon_threadsafe(self.request_shutdown, s))
 
 async def main():
     """Main entry point"""
@@ -361,6 +475,9 @@ if __name__ == "__main__":
         print("Error: Python 3.8 or higher is required")
         sys.exit(1)
     
+    # Install uvloop before the event loop is created (opt-in fast profile)
+    install_event_loop_policy()
+    
     # Run the bot
     try:
         asyncio.run(main())
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telegram import InputMediaDocument, Message, Update
+from telegram.ext import ContextTypes
+
+from config import Config
+from helpers import is_media_message
+from media_types import MEDIA_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Telegram albums hold 2-10 items of these types
+MAX_ALBUM_ITEMS = 10
+ALBUM_MEDIA = {name: spec.input_media for name, spec in MEDIA_TYPES.items() if spec.input_media}
+MAX_CAPTION_LENGTH = 1024
+
+AlbumCallback = Callable[[Update, ContextTypes.DEFAULT_TYPE, List[Message]], Awaitable[None]]
+
+def album_item(message: Message) -> Optional[Dict[str, str]]:
+    """{'type', 'file_id'} of a message that can be part of an album"""
+    has_media, media_type, file_id = is_media_message(message)
+    if not has_media or media_type not in ALBUM_MEDIA:
+        return None
+    return {'type': media_type, 'file_id': file_id}
+
+def build_input_media(items: List[Dict[str, str]], caption: str = None) -> list:
+    """InputMedia list for send_media_group; the caption goes on the first item, which shows it for the album"""
+    media = []
+    for index, item in enumerate(items[:MAX_ALBUM_ITEMS]):
+        media_class = ALBUM_MEDIA.get(item['type'], InputMediaDocument)
+        item_caption = caption[:MAX_CAPTION_LENGTH] if caption and index == 0 else None
+        media.append(media_class(media=item['file_id'], caption=item_caption))
+    return media
+
+class MediaGroupBuffer:
+    """Collects the separate updates of one album and hands them over together once they stop arriving"""
+    def __init__(self):
+        self.pending: Dict[Tuple[int, str], List[Message]] = {}
+        self.timers: Dict[Tuple[int, str], asyncio.Task] = {}
+    
+    def add(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback: AlbumCallback):
+        """Buffer one album message; the callback runs once, MEDIA_GROUP_WAIT after the last one"""
+        key = (update.effective_user.id, update.message.media_group_id)
+        self.pending.setdefault(key, []).append(update.message)
+        
+        # Every new item restarts the wait, Telegram delivers an album as a quick burst
+        timer = self.timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        self.timers[key] = asyncio.create_task(self._flush_later(key, update, context, callback))
+    
+    async def _flush_later(self, key: Tuple[int, str], update: Update,
+                           context: ContextTypes.DEFAULT_TYPE, callback: AlbumCallback):
+        try:
+            await asyncio.sleep(Config.MEDIA_GROUP_WAIT)
+        except asyncio.CancelledError:
+            return
+        self.timers.pop(key, None)
+        messages = sorted(self.pending.pop(key, []), key=lambda message: message.message_id)
+        if not messages:
+            return
+        
+        logger.info(f"Album {key[1]} from user {key[0]}: {len(messages)} items")
+        try:
+            await callback(update, context, messages)
+        except Exception as e:
+            logger.error(f"Error handling album {key[1]} from user {key[0]}: {e}", exc_info=True)
+
+# Global instance
+media_group_buffer = MediaGroupBuffer()
\ No newline at end of file
@@ -0,0 +1,37 @@
+from typing import Any, Dict, NamedTuple, Optional
+
+from telegram import InputMediaAudio, InputMediaDocument, InputMediaPhoto, InputMediaVideo
+
+class MediaType(NamedTuple):
+    """How one kind of media is detected on a message and sent through the Bot API"""
+    method: str                 # Bot method that sends it
+    file_param: str             # argument of that method (and attribute on Message) holding the file
+    caption: bool = True        # whether the method takes a caption
+    input_media: Optional[type] = None   # InputMedia class when it can be part of an album
+
+# Detection order matters: GIFs carry both `animation` and `document`, so animation comes first
+MEDIA_TYPES: Dict[str, MediaType] = {
+    'photo': MediaType('send_photo', 'photo', input_media=InputMediaPhoto),
+    'video': MediaType('send_video', 'video', input_media=InputMediaVideo),
+    'animation': MediaType('send_animation', 'animation'),
+    'document': MediaType('send_document', 'document', input_media=InputMediaDocument),
+    'audio': MediaType('send_audio', 'audio', input_media=InputMediaAudio),
+    'voice': MediaType('send_voice', 'voice'),
+    'video_note': MediaType('send_video_note', 'video_note', caption=False),
+    'sticker': MediaType('send_sticker', 'sticker', caption=False)
+}
+
+# Unknown types stored by older versions are sent as files
+FALLBACK_MEDIA_TYPE = 'document'
+
+def get_media_type(name: str) -> MediaType:
+    """Registry entry for a stored media_type"""
+    return MEDIA_TYPES.get(name) or MEDIA_TYPES[FALLBACK_MEDIA_TYPE]
+
+def media_send_kwargs(name: str, file_id: str, caption: str = None) -> Dict[str, Any]:
+    """Keyword arguments for the media type's send method (chat_id excluded)"""
+    media_type = get_media_type(name)
+    kwargs = {media_type.file_param: file_id}
+    if media_type.caption and caption:
+        kwargs['caption'] = caption
+    return kwargs
\ No newline at end of file
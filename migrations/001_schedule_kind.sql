@@ -0,0 +1,5 @@
+-- One-time schedules: absolute UTC timestamp in next_run_at, no cron expression
+ALTER TABLE schedule ADD COLUMN IF NOT EXISTS kind TEXT NOT NULL DEFAULT 'cron';
+ALTER TABLE schedule ALTER COLUMN cron_expression DROP NOT NULL;
+ALTER TABLE schedule ADD CONSTRAINT schedule_kind_check
+    CHECK (kind IN ('cron', 'once') AND (kind = 'once' OR cron_expression IS NOT NULL));
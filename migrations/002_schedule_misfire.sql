@@ -0,0 +1,5 @@
+-- Per-schedule misfire handling; NULL falls back to MISFIRE_POLICY / MISFIRE_GRACE_SECONDS
+ALTER TABLE schedule ADD COLUMN IF NOT EXISTS misfire_policy TEXT
+    CHECK (misfire_policy IN ('fire_once', 'skip', 'fire_all'));
+ALTER TABLE schedule ADD COLUMN IF NOT EXISTS misfire_grace_seconds INTEGER
+    CHECK (misfire_grace_seconds >= 0);
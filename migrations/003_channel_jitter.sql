@@ -0,0 +1,3 @@
+-- Per-channel send spreading window in seconds (0 = send exactly on the minute)
+ALTER TABLE channels ADD COLUMN IF NOT EXISTS jitter_seconds INTEGER NOT NULL DEFAULT 0
+    CHECK (jitter_seconds >= 0);
@@ -0,0 +1,27 @@
+-- Delayed retries for transient send failures
+CREATE TABLE IF NOT EXISTS retry_queue (
+    id BIGSERIAL PRIMARY KEY,
+    schedule_id BIGINT,
+    post_id BIGINT NOT NULL REFERENCES posts (id) ON DELETE CASCADE,
+    channel_tg_id BIGINT NOT NULL REFERENCES channels (channel_tg_id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_retry_queue_next_attempt_at ON retry_queue (next_attempt_at);
+
+-- Sends that failed permanently or ran out of retries
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id BIGSERIAL PRIMARY KEY,
+    schedule_id BIGINT,
+    post_id BIGINT NOT NULL,
+    channel_tg_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    outcome TEXT NOT NULL,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_dead_letters_user_id ON dead_letters (user_id);
@@ -0,0 +1,20 @@
+-- Outbox / execution log: one row per (schedule, planned run), written before the send
+CREATE TABLE IF NOT EXISTS schedule_runs (
+    id BIGSERIAL PRIMARY KEY,
+    schedule_id BIGINT NOT NULL,
+    planned_run_at TIMESTAMPTZ NOT NULL,
+    post_id BIGINT NOT NULL,
+    channel_tg_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'sending', 'sent', 'failed', 'retrying', 'skipped', 'unknown')),
+    sent_count INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    claimed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    completed_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE (schedule_id, planned_run_at)
+);
+CREATE INDEX IF NOT EXISTS idx_schedule_runs_status ON schedule_runs (status, created_at);
+
+ALTER TABLE retry_queue ADD COLUMN IF NOT EXISTS run_id BIGINT REFERENCES schedule_runs (id) ON DELETE SET NULL;
@@ -0,0 +1,22 @@
+-- Execution history written in batches by the scheduler
+CREATE TABLE IF NOT EXISTS schedule_executions (
+    id BIGSERIAL PRIMARY KEY,
+    schedule_id BIGINT,
+    run_id BIGINT,
+    post_id BIGINT NOT NULL,
+    channel_tg_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    planned_at TIMESTAMPTZ,
+    claimed_at TIMESTAMPTZ,
+    sent_at TIMESTAMPTZ NOT NULL,
+    lag_ms INTEGER,
+    send_ms INTEGER,
+    message_id BIGINT,
+    outcome TEXT NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+-- Range scans for the admin analytics (time window, optionally per channel)
+CREATE INDEX IF NOT EXISTS idx_schedule_executions_planned_at ON schedule_executions (planned_at);
+CREATE INDEX IF NOT EXISTS idx_schedule_executions_channel ON schedule_executions (channel_tg_id, planned_at);
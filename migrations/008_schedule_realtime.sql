@@ -0,0 +1,3 @@
+-- Publish schedule changes so every replica can keep its in-memory index current
+-- (Supabase Realtime postgres_changes; the bot subscribes when SCHEDULE_CHANGE_FEED=auto/realtime)
+ALTER PUBLICATION supabase_realtime ADD TABLE schedule;
@@ -0,0 +1,9 @@
+-- Scheduler worker membership (worker.py): live workers split channels by consistent hashing
+CREATE TABLE IF NOT EXISTS scheduler_workers (
+    worker_id TEXT PRIMARY KEY,
+    hostname TEXT,
+    pid INTEGER,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    heartbeat_at TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scheduler_workers_heartbeat ON scheduler_workers (heartbeat_at);
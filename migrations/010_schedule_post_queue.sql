@@ -0,0 +1,5 @@
+-- Queue mode: one schedule rotates through an ordered pool of posts.
+-- post_id is the pool item sent on the next run (post_ids[queue_position]).
+ALTER TABLE schedule ADD COLUMN IF NOT EXISTS post_ids JSONB;
+ALTER TABLE schedule ADD COLUMN IF NOT EXISTS queue_position INTEGER NOT NULL DEFAULT 0
+    CHECK (queue_position >= 0);
@@ -0,0 +1,2 @@
+-- Albums: up to 10 {"type", "file_id"} items sent with one sendMediaGroup (media_type = 'album')
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS media_items JSONB;
@@ -0,0 +1,3 @@
+-- Message(s) a post was created from, re-sent with copyMessage(s) when POST_SEND_MODE=copy
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS source_chat_id BIGINT;
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS source_message_ids JSONB;
@@ -0,0 +1,4 @@
+-- Schedules deactivated because the bot lost its posting rights in the channel;
+-- the permission sweep reactivates them when the rights come back.
+ALTER TABLE schedule ADD COLUMN IF NOT EXISTS paused BOOLEAN NOT NULL DEFAULT FALSE;
+CREATE INDEX IF NOT EXISTS idx_schedule_paused ON schedule (channel_tg_id) WHERE paused;
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Notification kinds, each gets its own section in the digest
+NOTIFY_SUCCESS = 'success'
+NOTIFY_SKIPPED = 'skipped'
+NOTIFY_FAILURE = 'failure'
+
+# Telegram rejects messages above 4096 characters
+MAX_MESSAGE_LENGTH = 4000
+
+# (kind, full message, one-line summary)
+Entry = Tuple[str, str, str]
+
+def _section(title: str, lines: List[str], limit: int, count: int = None) -> List[str]:
+    section = ["", f"{title} ({count or len(lines)}):"]
+    section.extend(f"• {line}" for line in lines[:limit])
+    if len(lines) > limit:
+        section.append(f"… و {len(lines) - limit} أخرى")
+    return section
+
+def format_digest(entries: List[Entry], limit: int = None) -> str:
+    """Render several notifications as a single message"""
+    limit = limit or Config.NOTIFICATION_DIGEST_MAX_LINES
+    
+    successes = Counter(line for kind, _, line in entries if kind == NOTIFY_SUCCESS)
+    skipped = [line for kind, _, line in entries if kind == NOTIFY_SKIPPED]
+    failures = [line for kind, _, line in entries if kind == NOTIFY_FAILURE]
+    
+    lines = [f"📬 ملخص النشر ({len(entries)} إشعار)"]
+    if successes:
+        success_lines = [f"{name} ×{count}" if count > 1 else name for name, count in successes.most_common()]
+        lines.extend(_section("✅ تم النشر بنجاح", success_lines, limit, sum(successes.values())))
+    if skipped:
+        lines.extend(_section("⏭️ تم التخطي", skipped, limit))
+    if failures:
+        lines.extend(_section("⚠️ لم يتم الإرسال", failures, limit))
+    
+    text = "\n".join(lines)
+    if len(text) > MAX_MESSAGE_LENGTH:
+        text = text[:MAX_MESSAGE_LENGTH - 1] + "…"
+    return text
+
+class NotificationDigest:
+    """Coalesces scheduler notifications per user into one message per time window"""
+    def __init__(self):
+        self.sender: Optional[Callable[[int, str], Awaitable[None]]] = None
+        self.pending: Dict[int, List[Entry]] = defaultdict(list)
+        self.timers: Dict[int, asyncio.Task] = {}
+        # user_id -> (mute_success, read at), re-read after NOTIFICATION_PREFERENCES_TTL since
+        # the setting is changed in the bot process while worker processes send the notifications
+        self.preferences: Dict[int, Tuple[bool, float]] = {}
+    
+    def attach(self, sender: Callable[[int, str], Awaitable[None]]):
+        """Set the coroutine that actually delivers a message to a user"""
+        self.sender = sender
+    
+    async def add(self, user_id: int, kind: str, message: str, line: str = None):
+        """Queue a notification; it is sent on its own or as part of a digest after the window"""
+        if kind == NOTIFY_SUCCESS and await self.is_success_muted(user_id):
+            metrics.inc('notifications_suppressed_total', kind=kind)
+            return
+        
+        if Config.NOTIFICATION_DIGEST_WINDOW <= 0:
+            await self._deliver(user_id, message, 1)
+            return
+        
+        self.pending[user_id].append((kind, message, line or message))
+        if user_id not in self.timers:
+            self.timers[user_id] = asyncio.create_task(self._flush_later(user_id))
+    
+    async def _flush_later(self, user_id: int):
+        try:
+            await asyncio.sleep(Config.NOTIFICATION_DIGEST_WINDOW)
+        except asyncio.CancelledError:
+            return
+        self.timers.pop(user_id, None)
+        await self.flush_user(user_id)
+    
+    async def flush_user(self, user_id: int):
+        """Send whatever is queued for one user"""
+        entries = self.pending.pop(user_id, [])
+        if not entries:
+            return
+        
+        text = entries[0][1] if len(entries) == 1 else format_digest(entries)
+        await self._deliver(user_id, text, len(entries))
+    
+    async def flush_all(self):
+        """Send all queued digests now (used on shutdown)"""
+        for task in self.timers.values():
+            task.cancel()
+        self.timers.clear()
+        for user_id in list(self.pending):
+            await self.flush_user(user_id)
+    
+    async def _deliver(self, user_id: int, text: str, count: int):
+        metrics.inc('notifications_queued_total', count)
+        metrics.inc('notifications_sent_total')
+        if not self.sender:
+            logger.warning(f"No notification sender attached, dropping {count} notifications for {user_id}")
+            return
+        await self.sender(user_id, text)
+    
+    async def is_success_muted(self, user_id: int) -> bool:
+        cached = self.preferences.get(user_id)
+        now = time.monotonic()
+        if cached is None or now - cached[1] >= Config.NOTIFICATION_PREFERENCES_TTL:
+            from supabase_client import db
+            settings = await db.get_user_settings(user_id)
+            cached = self.preferences[user_id] = (bool(settings.get('mute_success')), now)
+        return cached[0]
+    
+    def set_success_muted(self, user_id: int, muted: bool):
+        """Update the cached preference after the user changed it (other processes catch up within the TTL)"""
+        self.preferences[user_id] = (muted, time.monotonic())
+
+# Global instance
+notification_digest = NotificationDigest()
\ No newline at end of file
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import logging
+from typing import Any, Union
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def fast_profile_enabled() -> bool:
+    """Check if the opt-in 'fast' performance profile is selected"""
+    return Config.PERFORMANCE_PROFILE == 'fast'
+
+def _stdlib_loads(data: Union[bytes, bytearray, str]) -> Any:
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+def _stdlib_dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False)
+
+def _orjson_dumps(obj: Any) -> str:
+    return orjson.dumps(obj).decode('utf-8')
+
+# Codec used for webhook bodies, Telegram responses and JSON columns
+if fast_profile_enabled() and orjson is not None:
+    json_loads = orjson.loads
+    json_dumps = _orjson_dumps
+    JSON_BACKEND = 'orjson'
+else:
+    json_loads = _stdlib_loads
+    json_dumps = _stdlib_dumps
+    JSON_BACKEND = 'json'
+
+def install_event_loop_policy() -> str:
+    """Install uvloop as the event loop policy when the fast profile asks for it"""
+    if not fast_profile_enabled():
+        return 'asyncio'
+    
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("PERFORMANCE_PROFILE=fast but uvloop is not installed; using asyncio")
+        return 'asyncio'
+    
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return 'uvloop'
+
+def describe_profile() -> dict:
+    """Summary of the active performance profile for logs and health checks"""
+    policy = type(asyncio.get_event_loop_policy()).__module__.split('.')[0]
+    return {
+        'profile': Config.PERFORMANCE_PROFILE,
+        'json': JSON_BACKEND,
+        'event_loop': 'uvloop' if policy == 'uvloop' else 'asyncio'
+    }
\ No newline at end of file
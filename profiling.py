@@ -0,0 +1,117 @@
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import sys
+import tracemalloc
+from datetime import datetime
+from typing import Optional, Tuple, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a CPU profile is already being captured"""
+
+class LiveProfiler:
+    """On-demand cProfile captures and tracemalloc snapshot diffs of the running bot"""
+    def __init__(self):
+        self._capturing = False
+        self._last_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._last_snapshot_at: Optional[datetime] = None
+    
+    @property
+    def is_capturing(self) -> bool:
+        return self._capturing
+    
+    async def capture_cpu_profile(self, seconds: float, limit: int = 40) -> Tuple[bytes, str]:
+        """Profile the event loop thread for `seconds`; returns (.prof dump, text report)"""
+        if self._capturing:
+            raise ProfilerBusyError("A CPU profile is already running")
+        
+        self._capturing = True
+        profiler = cProfile.Profile()
+        logger.info(f"Starting CPU profile for {seconds}s")
+        try:
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+        finally:
+            self._capturing = False
+        
+        stats = pstats.Stats(profiler)
+        # Same binary format as Stats.dump_stats(), loadable by pstats/snakeviz
+        dump = marshal.dumps(stats.stats)
+        
+        report = io.StringIO()
+        report.write(f"CPU profile, {seconds}s, captured {datetime.utcnow().isoformat()}Z\n\n")
+        stats.stream = report
+        report.write("=== Sorted by cumulative time ===\n")
+        stats.sort_stats('cumulative').print_stats(limit)
+        report.write("\n=== Sorted by internal time ===\n")
+        stats.sort_stats('tottime').print_stats(limit)
+        
+        logger.info("CPU profile captured")
+        return dump, report.getvalue()
+    
+    def memory_snapshot_diff(self, tracked: Dict[str, Any] = None, limit: int = 30) -> str:
+        """Take a tracemalloc snapshot and diff it against the previous one"""
+        lines = []
+        
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._last_snapshot = tracemalloc.take_snapshot()
+            self._last_snapshot_at = datetime.utcnow()
+            lines.append("tracemalloc started; baseline snapshot taken.")
+            lines.append("Run the command again later to see what grew.")
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            snapshot = snapshot.filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            current, peak = tracemalloc.get_traced_memory()
+            lines.append(f"Diff since {self._last_snapshot_at.isoformat()}Z")
+            lines.append(f"Traced memory: current={current / 1024:.1f} KiB, peak={peak / 1024:.1f} KiB\n")
+            
+            stats = snapshot.compare_to(self._last_snapshot, 'lineno')
+            lines.append(f"=== Top {limit} allocation changes ===")
+            for stat in stats[:limit]:
+                lines.append(str(stat))
+            
+            self._last_snapshot = snapshot
+            self._last_snapshot_at = datetime.utcnow()
+        
+        if tracked:
+            lines.append("\n=== Tracked containers ===")
+            for name, container in tracked.items():
+                lines.append(f"{name}: {len(container)} entries, ~{deep_sizeof(container) / 1024:.1f} KiB")
+        
+        return "\n".join(lines)
+    
+    def stop_memory_tracing(self):
+        """Stop tracemalloc and drop the stored snapshot"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._last_snapshot = None
+        self._last_snapshot_at = None
+
+def deep_sizeof(obj: Any, _seen: set = None) -> int:
+    """Approximate recursive size of plain containers"""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+# Global instance
+live_profiler = LiveProfiler()
\ No newline at end of file
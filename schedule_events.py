@@ -0,0 +1,224 @@
+import heapq
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from config import Config
+from helpers import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Event operations
+OP_UPSERT = 'upsert'    # row inserted or changed (may be partial, always has 'id')
+OP_DELETE = 'delete'    # row(s) gone: {'id': ...}, or a filter such as {'post_id': ...} for cascades
+OP_RESYNC = 'resync'    # the feed may have missed events; reload from the database
+
+class ScheduleEvent(NamedTuple):
+    """One change to the schedule table"""
+    op: str
+    row: Dict[str, Any] = {}
+
+class ScheduleEventBus:
+    """In-process fan-out of schedule changes, optionally bridged to other replicas by a feed"""
+    def __init__(self):
+        self.subscribers: List[Callable[[ScheduleEvent], None]] = []
+        self.feed = None
+    
+    def subscribe(self, callback: Callable[[ScheduleEvent], None]):
+        if callback not in self.subscribers:
+            self.subscribers.append(callback)
+    
+    def unsubscribe(self, callback: Callable[[ScheduleEvent], None]):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+    
+    def publish(self, event: ScheduleEvent, local: bool = True):
+        """Deliver an event to subscribers; local writes are also forwarded to the feed"""
+        for callback in list(self.subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Schedule event subscriber failed on {event.op}: {e}", exc_info=True)
+        
+        if local and self.feed:
+            self.feed.broadcast(event, self)
+    
+    def upserted(self, rows: List[Dict[str, Any]]):
+        for row in rows or []:
+            self.publish(ScheduleEvent(OP_UPSERT, row))
+    
+    def deleted(self, rows: List[Dict[str, Any]]):
+        for row in rows or []:
+            self.publish(ScheduleEvent(OP_DELETE, row))
+    
+    async def connect(self, feed):
+        """Receive changes made by other replicas through a change feed"""
+        self.feed = feed
+        await feed.start(self)
+    
+    async def disconnect(self):
+        if self.feed:
+            await self.feed.stop(self)
+            self.feed = None
+
+class LocalChangeFeed:
+    """Stand-in for LISTEN/NOTIFY: relays events between buses in the same process (tests, simulation)"""
+    def __init__(self):
+        self.buses: List[ScheduleEventBus] = []
+    
+    async def start(self, bus: ScheduleEventBus):
+        self.buses.append(bus)
+    
+    async def stop(self, bus: ScheduleEventBus):
+        if bus in self.buses:
+            self.buses.remove(bus)
+    
+    def broadcast(self, event: ScheduleEvent, origin: ScheduleEventBus):
+        for bus in list(self.buses):
+            if bus is not origin:
+                bus.publish(event, local=False)
+
+class SupabaseRealtimeFeed:
+    """Postgres changes on the schedule table, delivered by Supabase Realtime"""
+    def __init__(self, url: str, key: str):
+        self.endpoint = url.replace('https://', 'wss://').replace('http://', 'ws://').rstrip('/') + '/realtime/v1'
+        self.key = key
+        self.client = None
+        self.channel = None
+        self.subscribed_once = False
+    
+    async def start(self, bus: ScheduleEventBus):
+        from realtime import AsyncRealtimeClient
+        
+        def on_change(payload: Dict[str, Any]):
+            data = payload.get('data', payload)
+            change = data.get('type') or data.get('eventType')
+            if change == 'DELETE':
+                row = data.get('old_record') or data.get('old') or {}
+                bus.publish(ScheduleEvent(OP_DELETE, row), local=False)
+            else:
+                row = data.get('record') or data.get('new') or {}
+                bus.publish(ScheduleEvent(OP_UPSERT, row), local=False)
+        
+        def on_state(state, error: Optional[Exception] = None):
+            if error:
+                logger.warning(f"Schedule change feed error: {error}")
+            if str(getattr(state, 'value', state)).upper() != 'SUBSCRIBED':
+                return
+            # Events may have been missed while disconnected
+            if self.subscribed_once:
+                bus.publish(ScheduleEvent(OP_RESYNC), local=False)
+            self.subscribed_once = True
+            logger.info("Subscribed to schedule changes")
+        
+        self.client = AsyncRealtimeClient(self.endpoint, self.key)
+        await self.client.connect()
+        self.channel = self.client.channel('schedule-changes')
+        self.channel.on_postgres_changes('*', callback=on_change, table='schedule', schema='public')
+        await self.channel.subscribe(on_state)
+    
+    async def stop(self, bus: ScheduleEventBus):
+        if self.client:
+            try:
+                await self.client.close()
+            except Exception as e:
+                logger.warning(f"Error closing schedule change feed: {e}")
+            self.client = None
+            self.channel = None
+    
+    def broadcast(self, event: ScheduleEvent, origin: ScheduleEventBus):
+        # Postgres emits the change itself
+        pass
+
+def build_change_feed():
+    """Feed for changes written by other replicas, per SCHEDULE_CHANGE_FEED (or None)"""
+    mode = Config.SCHEDULE_CHANGE_FEED
+    if mode == 'auto':
+        mode = 'realtime' if Config.DB_BACKEND == 'supabase' else 'none'
+    if mode == 'realtime':
+        return SupabaseRealtimeFeed(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+    if mode == 'local':
+        return local_change_feed
+    return None
+
+class ScheduleIndex:
+    """Active schedules in memory, ordered by next run; kept current by schedule events"""
+    def __init__(self):
+        self.schedules: Dict[int, Dict[str, Any]] = {}
+        self._heap: List[tuple] = []
+    
+    def __len__(self) -> int:
+        return len(self.schedules)
+    
+    def load(self, schedules: List[Dict[str, Any]]):
+        """Replace the index with a full snapshot"""
+        self.schedules = {}
+        self._heap = []
+        for schedule in schedules:
+            self.upsert(schedule)
+    
+    def upsert(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merge a (possibly partial) row; returns the indexed schedule, or None if it is not runnable"""
+        schedule_id = row.get('id')
+        if schedule_id is None:
+            return None
+        
+        schedule = {**self.schedules.get(schedule_id, {}), **row}
+        if not schedule.get('is_active') or not schedule.get('next_run_at') or 'post_id' not in schedule:
+            self.schedules.pop(schedule_id, None)
+            return None
+        
+        self.schedules[schedule_id] = schedule
+        heapq.heappush(self._heap, (parse_timestamp(schedule['next_run_at']), schedule_id))
+        if len(self._heap) > 2 * len(self.schedules) + 1024:
+            self._compact()
+        return schedule
+    
+    def remove(self, row: Dict[str, Any]) -> List[int]:
+        """Remove by id, or every schedule matching the given fields; returns the removed ids"""
+        if row.get('id') is not None:
+            return [row['id']] if self.schedules.pop(row['id'], None) else []
+        if not row:
+            return []
+        
+        matching = [
+            schedule_id for schedule_id, schedule in self.schedules.items()
+            if all(schedule.get(key) == value for key, value in row.items())
+        ]
+        for schedule_id in matching:
+            del self.schedules[schedule_id]
+        return matching
+    
+    def due(self, until: datetime) -> List[Dict[str, Any]]:
+        """Schedules with next_run_at <= until, without removing them"""
+        due = []
+        while self._heap and self._heap[0][0] <= until:
+            next_run, schedule_id = heapq.heappop(self._heap)
+            if self._is_current(next_run, schedule_id):
+                due.append(schedule_id)
+        
+        for schedule_id in due:
+            heapq.heappush(self._heap, (parse_timestamp(self.schedules[schedule_id]['next_run_at']), schedule_id))
+        return [self.schedules[schedule_id] for schedule_id in due]
+    
+    def next_due_at(self) -> Optional[datetime]:
+        """Earliest next run in the index"""
+        while self._heap:
+            next_run, schedule_id = self._heap[0]
+            if self._is_current(next_run, schedule_id):
+                return next_run
+            heapq.heappop(self._heap)
+        return None
+    
+    def _is_current(self, next_run: datetime, schedule_id: int) -> bool:
+        # Heap entries left behind by updates or removals are dropped lazily
+        schedule = self.schedules.get(schedule_id)
+        return bool(schedule) and parse_timestamp(schedule['next_run_at']) == next_run
+    
+    def _compact(self):
+        self._heap = [(parse_timestamp(s['next_run_at']), i) for i, s in self.schedules.items()]
+        heapq.heapify(self._heap)
+
+# Global instances
+schedule_events = ScheduleEventBus()
+local_change_feed = LocalChangeFeed()
\ No newline at end of file
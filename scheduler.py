@@ -1,26 +1,102 @@
 import logging
 import asyncio
+import time
+import zlib
+from collections import Counter
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
-from telegram.ext import ContextTypes
-from telegram.error import TelegramError
-from croniter import croniter
+from typing import List, Dict, Any, Optional, Tuple
 import pytz
+from telegram.ext import ContextTypes
+from telegram.error import BadRequest, TelegramError
 from supabase_client import db
 from config import Config
+from cron_engine import batch_next_runs, compile_cron, get_timezone, next_occurrence
+from metrics import metrics
+from execution_log import execution_log
+from fair_queue import FairQueue
+from channel_monitor import channel_monitor
+from media_groups import build_input_media
+from media_types import get_media_type, media_send_kwargs
+from schedule_events import schedule_events, ScheduleEvent, ScheduleIndex, OP_DELETE, OP_RESYNC
+from notifications import notification_digest, NOTIFY_SUCCESS, NOTIFY_SKIPPED, NOTIFY_FAILURE
+from delivery import (
+    SendResult, SEND_OK, SEND_CHANNEL_LOST, SEND_PERMANENT,
+    SOURCE_GONE_MARKERS, classify_send_error, backoff_delay
+)
 from helpers import (
     get_next_occurrence, format_datetime_arabic, 
-    is_media_message, truncate_text
+    is_media_message, truncate_text, parse_timestamp
 )
 
 logger = logging.getLogger(__name__)
 
+def jitter_offset(schedule_id: int, jitter_seconds: int) -> int:
+    """Stable per-schedule offset in [0, jitter_seconds) used to spread sends"""
+    if not jitter_seconds or jitter_seconds <= 0:
+        return 0
+    return zlib.crc32(str(schedule_id).encode('utf-8')) % jitter_seconds
+
+def project_send_histogram(schedules: List[Dict[str, Any]], jitter_by_channel: Dict[int, int],
+                           start: datetime, hours: int = 24) -> Tuple[Counter, List[int]]:
+    """Project sends per minute, and per 10s bucket within the minute, over the next hours"""
+    tz = get_timezone(Config.TIMEZONE)
+    end = start + timedelta(hours=hours)
+    per_minute = Counter()
+    per_bucket = [0] * 6
+    occurrences_by_expression: Dict[str, List[datetime]] = {}
+    
+    for schedule in schedules:
+        expression = schedule.get('cron_expression')
+        if schedule.get('kind') == 'once' or not expression:
+            run_times = [parse_timestamp(schedule['next_run_at'])]
+        else:
+            if expression not in occurrences_by_expression:
+                occurrences = []
+                try:
+                    for occurrence in compile_cron(expression).iter_after(start, tz):
+                        if occurrence >= end:
+                            break
+                        occurrences.append(occurrence)
+                except ValueError:
+                    pass
+                occurrences_by_expression[expression] = occurrences
+            run_times = occurrences_by_expression[expression]
+        
+        offset = timedelta(seconds=jitter_offset(schedule['id'], jitter_by_channel.get(schedule['channel_tg_id'], 0)))
+        for run_time in run_times:
+            send_time = (run_time + offset).astimezone(tz)
+            if start <= send_time < end:
+                per_minute[send_time.replace(second=0, microsecond=0)] += 1
+                per_bucket[send_time.second // 10] += 1
+    
+    return per_minute, per_bucket
+
 class PostScheduler:
     def __init__(self, bot_context: ContextTypes.DEFAULT_TYPE):
         self.bot_context = bot_context
-        self.timezone = pytz.timezone(Config.TIMEZONE)
+        self.timezone = get_timezone(Config.TIMEZONE)
         self.is_running = False
         self.check_interval = 60  # Check every minute
+        # Schedules fetched ahead of time and waiting for their exact (jittered) send time
+        self.pending_ids = set()
+        self.timer_tasks: Dict[int, asyncio.Task] = {}
+        self.last_outbox_prune = None
+        # Due runs wait here, served fairly across users, until the dispatcher picks them up
+        self.run_queue = FairQueue()
+        self.vip_channels = set()
+        self.dispatcher_task: Optional[asyncio.Task] = None
+        self.loop_task: Optional[asyncio.Task] = None
+        # Active schedules by next run, loaded once and then kept current by schedule events
+        self.index = ScheduleIndex()
+        self.index_loaded = False
+        # Channel shard of this process when running as one of several workers (None = all channels)
+        self.shard = None
+        # Set on shutdown and when a schedule change needs an early check
+        self.wakeup = asyncio.Event()
+        # Outbox rows claimed by this process and not finished yet: run_id -> 'pending' | 'sending'
+        self.active_runs: Dict[int, str] = {}
+        # Result notifications go out as per-user digests
+        notification_digest.attach(self.notify_user)
     
     async def start_scheduler(self):
         """Start the scheduler loop"""
@@ -29,198 +105,764 @@ class PostScheduler:
             return
         
         self.is_running = True
+        self.wakeup.clear()
+        self.loop_task = asyncio.current_task()
+        self.dispatcher_task = asyncio.create_task(self.process_queue())
+        schedule_events.subscribe(self.on_schedule_event)
+        await self.load_index()
+        channel_monitor.start(self.bot_context.bot, owns=self.owns)
         logger.info("Post scheduler started")
         
+        # The first check doubles as catch-up for everything missed while offline
+        logger.info("Evaluating overdue schedules with misfire policies")
+        
         while self.is_running:
             try:
                 await self.check_and_execute_schedules()
-                await asyncio.sleep(self.check_interval)
             except Exception as e:
                 logger.error(f"Error in scheduler loop: {e}", exc_info=True)
-                await asyncio.sleep(self.check_interval)
+            
+            # Sleep until the next check, waking up early on shutdown or when a schedule becomes due soon
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
     
-    def stop_scheduler(self):
-        """Stop the scheduler"""
+    async def stop_scheduler(self, timeout: float = None):
+        """Stop claiming new work, drain queued and in-flight runs until the deadline, release the rest"""
+        timeout = Config.SHUTDOWN_DRAIN_TIMEOUT if timeout is None else timeout
         self.is_running = False
+        self.wakeup.set()
+        self.run_queue.wake()
+        schedule_events.unsubscribe(self.on_schedule_event)
+        await channel_monitor.stop()
+        
+        # Timers hold runs that have not been claimed yet; they stay due in the database
+        for task in list(self.timer_tasks.values()):
+            task.cancel()
+        
+        # The check loop finishes its current pass, the dispatcher empties the queue
+        tasks = [task for task in (self.loop_task, self.dispatcher_task) if task and not task.done()]
+        if tasks:
+            logger.info(f"Draining scheduler: {len(self.run_queue)} queued, {len(self.active_runs)} in flight")
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            if pending:
+                logger.warning(
+                    f"Drain deadline of {timeout}s reached with {len(self.run_queue)} queued "
+                    f"and {len(self.active_runs)} in-flight runs"
+                )
+                # Snapshot before cancelling: the tasks don't run again until they see the cancellation
+                interrupted = dict(self.active_runs)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                await self.release_runs(interrupted)
+        
+        for schedule, _, _, _ in self.run_queue.clear():
+            self.pending_ids.discard(schedule['id'])
+        self.dispatcher_task = None
+        self.loop_task = None
         logger.info("Post scheduler stopped")
     
+    async def release_runs(self, runs: Dict[int, str]):
+        """Give up claims interrupted by shutdown so the next instance doesn't wait for the lease"""
+        for run_id, status in runs.items():
+            if status == 'pending':
+                await db.release_schedule_run(run_id)
+            else:
+                # The send may or may not have reached Telegram; recovery marks it unknown
+                logger.warning(f"Run {run_id} was interrupted while sending")
+        metrics.inc('shutdown_interrupted_runs_total', len(runs))
+    
     async def check_and_execute_schedules(self):
         """Check for due schedules and execute them"""
         try:
-            due_schedules = await db.get_due_schedules()
+            await self.process_retries()
+            await self.prune_outbox()
+            
+            # Look one interval ahead so sends can start at their exact second
+            now = datetime.now(pytz.UTC)
+            horizon = now + timedelta(seconds=self.check_interval)
+            if not self.index_loaded:
+                await self.load_index()
+            due_schedules = self.index.due(horizon)
+            due_schedules = [
+                s for s in due_schedules
+                if s['id'] not in self.pending_ids and self.owns(s['channel_tg_id'])
+            ]
             
+            if not due_schedules:
+                return
+            
+            channels = await db.get_channels_by_tg_ids(list({s['channel_tg_id'] for s in due_schedules}))
+            self.vip_channels = {c['channel_tg_id'] for c in channels if c.get('is_vip')}
+            dispatch_times = self.get_dispatch_times(due_schedules, channels)
+            for schedule in due_schedules:
+                if now < dispatch_times[schedule['id']] <= horizon:
+                    self.dispatch_later(schedule, dispatch_times[schedule['id']])
+            
+            due_schedules = [s for s in due_schedules if dispatch_times[s['id']] <= now]
             if not due_schedules:
                 return
             
             logger.info(f"Found {len(due_schedules)} due schedules")
             
-            for schedule in due_schedules:
-                await self.process_schedule(schedule)
+            runs, skipped = self.apply_misfire_policies(due_schedules, now)
+            
+            if skipped:
+                await self.skip_misfired(skipped)
+            
+            # Work out every next run up front, once per distinct cron expression
+            next_runs = self.calculate_next_runs([schedule for schedule, _ in runs])
+            
+            self.enqueue_runs(runs, next_runs)
                 
         except Exception as e:
             logger.error(f"Error checking schedules: {e}", exc_info=True)
     
-    async def process_schedule(self, schedule: Dict[str, Any]):
+    async def load_index(self):
+        """Full snapshot of active schedules; afterwards only change events are applied"""
+        self.index.load(await db.get_active_schedules())
+        self.index_loaded = True
+        logger.info(f"Schedule index loaded: {len(self.index)} active schedules")
+    
+    def on_schedule_event(self, event: ScheduleEvent):
+        """Apply a schedule change to the index and wake the loop if it is due before the next check"""
+        if event.op == OP_RESYNC:
+            asyncio.create_task(self.load_index())
+            return
+        if event.op == OP_DELETE:
+            for schedule_id in self.index.remove(event.row):
+                self.cancel_pending(schedule_id)
+            return
+        
+        schedule = self.index.upsert(event.row)
+        if not schedule:
+            # Deactivated (or paused): a run waiting for its send time must not go out
+            self.cancel_pending(event.row.get('id'))
+            return
+        if schedule['id'] in self.pending_ids or not self.owns(schedule['channel_tg_id']):
+            return
+        horizon = datetime.now(pytz.UTC) + timedelta(seconds=self.check_interval)
+        if parse_timestamp(schedule['next_run_at']) <= horizon:
+            self.wakeup.set()
+    
+    def cancel_pending(self, schedule_id: int):
+        """Forget a schedule's waiting run: cancel its jitter timer; a queued run is skipped when dequeued"""
+        task = self.timer_tasks.pop(schedule_id, None)
+        if task:
+            task.cancel()
+        self.pending_ids.discard(schedule_id)
+    
+    def is_still_due(self, schedule: Dict[str, Any]) -> bool:
+        """Whether a run picked up earlier still matches the live schedule (not deleted, paused or moved)"""
+        if not self.index_loaded:
+            return True
+        current = self.index.schedules.get(schedule['id'])
+        return current is not None and parse_timestamp(current['next_run_at']) == parse_timestamp(schedule['next_run_at'])
+    
+    def owns(self, channel_tg_id: int) -> bool:
+        """Whether this process sends for a channel (always, unless running sharded)"""
+        return self.shard is None or self.shard.owns(channel_tg_id)
+    
+    def on_rebalance(self, members: List[str]):
+        """Shard ownership changed: re-check right away so taken-over channels aren't late"""
+        self.wakeup.set()
+    
+    def get_dispatch_times(self, schedules: List[Dict[str, Any]],
+                           channels: List[Dict[str, Any]]) -> Dict[Any, datetime]:
+        """Planned run time plus the channel's deterministic jitter offset, per schedule"""
+        jitter_by_channel = {c['channel_tg_id']: c.get('jitter_seconds') or 0 for c in channels}
+        
+        return {
+            schedule['id']: parse_timestamp(schedule['next_run_at']) + timedelta(
+                seconds=jitter_offset(schedule['id'], jitter_by_channel.get(schedule['channel_tg_id'], 0))
+            )
+            for schedule in schedules
+        }
+    
+    def dispatch_later(self, schedule: Dict[str, Any], dispatch_at: datetime):
+        """Run a schedule at its exact send time within the current check interval"""
+        schedule_id = schedule['id']
+        self.pending_ids.add(schedule_id)
+        task = asyncio.create_task(self._dispatch_at(schedule, dispatch_at))
+        self.timer_tasks[schedule_id] = task
+        task.add_done_callback(
+            lambda done: self.timer_tasks.pop(schedule_id, None) if self.timer_tasks.get(schedule_id) is done else None
+        )
+    
+    async def _dispatch_at(self, schedule: Dict[str, Any], dispatch_at: datetime):
+        try:
+            await asyncio.sleep(max(0.0, (dispatch_at - datetime.now(pytz.UTC)).total_seconds()))
+        except asyncio.CancelledError:
+            self.pending_ids.discard(schedule['id'])
+            raise
+        if self.is_running:
+            self.enqueue_runs([(schedule, 1)], {})
+        else:
+            self.pending_ids.discard(schedule['id'])
+    
+    def apply_misfire_policies(self, due_schedules: List[Dict[str, Any]],
+                               now: datetime) -> Tuple[List[Tuple[Dict[str, Any], int]], List[Dict[str, Any]]]:
+        """Split due schedules into (schedule, run count) pairs to execute and schedules to skip"""
+        runs = []
+        skipped = []
+        
+        for schedule in due_schedules:
+            policy = schedule.get('misfire_policy') or Config.MISFIRE_POLICY
+            grace = schedule.get('misfire_grace_seconds')
+            if grace is None:
+                grace = Config.MISFIRE_GRACE_SECONDS
+            
+            planned = parse_timestamp(schedule['next_run_at'])
+            window_start = now - timedelta(seconds=grace)
+            
+            if policy == 'fire_all':
+                run_count = self.count_missed_runs(schedule, planned, window_start, now)
+            elif planned >= window_start or policy == 'fire_once':
+                run_count = 1
+            else:
+                run_count = 0
+            
+            if planned < window_start:
+                metrics.inc('schedule_misfires_total', policy=policy, action='fired' if run_count else 'skipped')
+            
+            if run_count:
+                runs.append((schedule, run_count))
+            else:
+                skipped.append(schedule)
+        
+        if skipped:
+            logger.info(f"Misfire policies: {len(runs)} schedules to run, {len(skipped)} skipped")
+        return runs, skipped
+    
+    def count_missed_runs(self, schedule: Dict[str, Any], planned: datetime,
+                          window_start: datetime, now: datetime) -> int:
+        """Number of planned runs inside the grace window, capped at MISFIRE_MAX_CATCHUP"""
+        run_count = 1 if planned >= window_start else 0
+        if self.is_one_time_schedule(schedule) or not schedule.get('cron_expression'):
+            return run_count
+        
+        try:
+            start = max(planned, window_start - timedelta(microseconds=1))
+            for occurrence in compile_cron(schedule['cron_expression']).iter_after(start, self.timezone):
+                if occurrence > now or run_count >= Config.MISFIRE_MAX_CATCHUP:
+                    break
+                run_count += 1
+        except ValueError as e:
+            logger.error(f"Error counting missed runs for schedule {schedule['id']}: {e}")
+            run_count = max(run_count, 1)
+        
+        return min(run_count, Config.MISFIRE_MAX_CATCHUP)
+    
+    async def skip_misfired(self, schedules: List[Dict[str, Any]]):
+        """Move skipped cron schedules to their next run and drop expired one-time schedules"""
+        next_runs = self.calculate_next_runs(schedules)
+        updates = []
+        expired = []
+        
+        for schedule in schedules:
+            next_run = next_runs.get(schedule['id'])
+            if next_run:
+                # Only if the run being skipped is still the planned one (not rescheduled or already advanced)
+                updates.append((
+                    schedule['id'],
+                    {'next_run_at': next_run.astimezone(pytz.UTC).isoformat()},
+                    {'next_run_at': schedule['next_run_at']}
+                ))
+            else:
+                expired.append(schedule)
+        
+        if updates:
+            await db.update_schedules_bulk(updates)
+            logger.info(f"Skipped {len(updates)} misfired schedules to their next run")
+        
+        if expired:
+            await db.delete_schedules([schedule['id'] for schedule in expired])
+            for schedule in expired:
+                await notification_digest.add(
+                    schedule['user_id'],
+                    NOTIFY_SKIPPED,
+                    f"⚠️ فات موعد نشر المنشور رقم {schedule['post_id']} أثناء توقف البوت، ولم يتم إرساله.",
+                    f"المنشور رقم {schedule['post_id']}: فات موعده أثناء توقف البوت"
+                )
+    
+    def enqueue_runs(self, runs: List[Tuple[Dict[str, Any], int]], next_runs: Dict[Any, datetime]):
+        """Queue runs fairly per user; VIP channels get a larger share of their user's turns"""
+        ordered = self.interleave_by_channel(runs)
+        # Within a user, VIP channels go first (stable, so channel interleaving is kept)
+        ordered.sort(key=lambda run: run[0]['channel_tg_id'] not in self.vip_channels)
+        
+        enqueued_at = time.monotonic()
+        for schedule, run_count in ordered:
+            is_vip = schedule['channel_tg_id'] in self.vip_channels
+            weight = Config.VIP_PRIORITY_WEIGHT if is_vip else 1.0
+            self.pending_ids.add(schedule['id'])
+            self.run_queue.put(
+                schedule['user_id'],
+                (schedule, next_runs.get(schedule['id']), run_count, enqueued_at),
+                weight=weight,
+                cost=run_count
+            )
+        
+        if runs:
+            logger.info(f"Queued {len(runs)} runs, {len(self.run_queue)} waiting "
+                        f"across {len(self.run_queue.flow_sizes())} users")
+    
+    async def process_queue(self):
+        """Dispatcher: run queued schedules in fair order, pausing between batches of a backlog"""
+        batch_size = max(1, Config.CATCHUP_BATCH_SIZE)
+        processed = 0
+        
+        # After stop_scheduler() the queue is still drained, the check loop just stops filling it
+        while self.is_running or len(self.run_queue):
+            if not len(self.run_queue):
+                await self.run_queue.wait()
+                continue
+            
+            user_id, (schedule, next_run, run_count, enqueued_at) = self.run_queue.get_nowait()
+            if not self.owns(schedule['channel_tg_id']):
+                # Moved to another worker by a rebalance while queued
+                self.pending_ids.discard(schedule['id'])
+                continue
+            is_vip = schedule['channel_tg_id'] in self.vip_channels
+            metrics.observe('schedule_queue_wait_seconds', time.monotonic() - enqueued_at, vip=is_vip)
+            
+            try:
+                await self.process_schedule(schedule, next_run, run_count)
+            finally:
+                self.pending_ids.discard(schedule['id'])
+            
+            processed += 1
+            if not len(self.run_queue):
+                processed = 0
+            elif processed >= batch_size and self.is_running:
+                processed = 0
+                logger.info(f"Catch-up: {len(self.run_queue)} schedules left, pausing {Config.CATCHUP_BATCH_INTERVAL}s")
+                await asyncio.sleep(Config.CATCHUP_BATCH_INTERVAL)
+    
+    def interleave_by_channel(self, runs: List[Tuple[Dict[str, Any], int]]) -> List[Tuple[Dict[str, Any], int]]:
+        """Round-robin runs across channels (oldest first) so no channel gets a burst"""
+        by_channel: Dict[int, List[Tuple[Dict[str, Any], int]]] = {}
+        for run in sorted(runs, key=lambda r: r[0]['next_run_at']):
+            by_channel.setdefault(run[0]['channel_tg_id'], []).append(run)
+        
+        ordered = []
+        queues = list(by_channel.values())
+        while queues:
+            ordered.extend(queue.pop(0) for queue in queues)
+            queues = [queue for queue in queues if queue]
+        return ordered
+    
+    async def process_schedule(self, schedule: Dict[str, Any], next_run: datetime = None, run_count: int = 1):
         """Process a single schedule"""
+        run = None
         try:
             schedule_id = schedule['id']
             post_id = schedule['post_id']
             channel_tg_id = schedule['channel_tg_id']
             user_id = schedule['user_id']
-            cron_expression = schedule['cron_expression']
+            
+            if not self.is_still_due(schedule):
+                logger.info(f"Schedule {schedule_id} was deleted, paused or rescheduled while waiting, skipping this run")
+                return
             
             logger.info(f"Processing schedule {schedule_id} for post {post_id}")
             
-            # Immediately deactivate the schedule to prevent double execution
-            await db.deactivate_schedule(schedule_id)
+            # Record intent before doing anything: one outbox row per (schedule, planned run)
+            run = await self.claim_run(schedule)
+            if not run:
+                return
+            claimed_at = datetime.now(pytz.UTC)
+            self.active_runs[run['id']] = run['status']
+            
+            if run['status'] != 'pending':
+                # Recovery: this run was already attempted by a process that died before advancing
+                await self.recover_run(schedule, run, next_run)
+                return
             
             # Get post data
             post = await db.get_post_by_id(post_id)
             if not post:
                 logger.error(f"Post {post_id} not found for schedule {schedule_id}")
+                await db.update_schedule_run(run['id'], 'skipped', error="Post not found")
+                await db.deactivate_schedule(schedule_id)
                 return
             
             # Get channel data
             channel = await db.get_channel_by_tg_id(channel_tg_id)
             if not channel:
                 logger.error(f"Channel {channel_tg_id} not found for schedule {schedule_id}")
+                await db.update_schedule_run(run['id'], 'skipped', error="Channel not found")
+                await db.deactivate_schedule(schedule_id)
                 return
             
             # Check if channel is banned
             if channel['is_banned']:
                 logger.info(f"Skipping banned channel {channel_tg_id}")
-                await self.notify_user(user_id, f"⚠️ تم تخطي النشر في القناة المحظورة '{channel['channel_name']}'.")
+                await db.update_schedule_run(run['id'], 'skipped', error="Channel banned")
+                await db.deactivate_schedule(schedule_id)
+                await notification_digest.add(
+                    user_id,
+                    NOTIFY_SKIPPED,
+                    f"⚠️ تم تخطي النشر في القناة المحظورة '{channel['channel_name']}'.",
+                    f"{channel['channel_name']}: قناة محظورة"
+                )
                 return
             
-            # Execute the post
-            success = await self.send_post_to_channel(post, channel_tg_id)
-            
-            if success:
-                # Notify user of success
-                await self.notify_user(
-                    user_id, 
-                    f"✅ تم إرسال منشورك بنجاح إلى قناة '{channel['channel_name']}'."
-                )
-                
-                # Calculate next run time for recurring schedules
-                next_run = self.calculate_next_run(cron_expression)
-                
-                if next_run:
-                    # Reactivate schedule with new time
-                    new_schedule_id = await db.add_schedule(
-                        post_id, channel_tg_id, user_id, cron_expression, next_run
-                    )
-                    
-                    if new_schedule_id:
-                        logger.info(f"Rescheduled post {post_id} for {next_run}")
-                    else:
-                        logger.error(f"Failed to reschedule post {post_id}")
+            # The permission sweeper already found that the bot can't post here; don't waste the send.
+            # The cache is this process's own, so the database decides: another process (the bot's
+            # my_chat_member handler, another worker's sweep) may have resumed the channel since
+            if channel_monitor.is_lost(channel_tg_id):
+                current = await db.get_schedule(schedule_id)
+                if current and current['is_active'] and not current.get('paused'):
+                    logger.info(f"Channel {channel_tg_id} was resumed elsewhere, sending")
+                    channel_monitor.forget(channel_tg_id)
                 else:
-                    # One-time schedule, delete it
-                    await db.delete_schedule(schedule_id)
-                    logger.info(f"One-time schedule {schedule_id} completed and deleted")
+                    logger.info(f"Skipping channel {channel_tg_id}, the bot can no longer post there")
+                    # Nothing was attempted: release the claim so the run goes through the misfire policy on resume
+                    await db.release_schedule_run(run['id'])
+                    return
             
-            else:
-                # Notify user of failure
-                await self.notify_user(
+            # Execute the post (more than once when replaying missed runs)
+            await db.update_schedule_run(run['id'], 'sending')
+            self.active_runs[run['id']] = 'sending'
+            sent_count = run.get('sent_count') or 0
+            started = time.perf_counter()
+            result = await self.send_post_to_channel(post, channel_tg_id)
+            if result.ok:
+                sent_count += 1
+            self.record_execution(schedule, result, started, claimed_at, run['id'])
+            while result.ok and sent_count < run_count:
+                await db.update_schedule_run(run['id'], 'sending', sent_count=sent_count)
+                await asyncio.sleep(Config.CATCHUP_BATCH_INTERVAL)
+                started = time.perf_counter()
+                result = await self.send_post_to_channel(post, channel_tg_id)
+                if result.ok:
+                    sent_count += 1
+                self.record_execution(schedule, result, started, claimed_at, run['id'])
+            
+            if result.ok:
+                await db.update_schedule_run(run['id'], 'sent', sent_count=sent_count)
+                
+                # Notify user of success
+                await notification_digest.add(
                     user_id,
-                    f"⚠️ فشل إرسال منشورك إلى قناة '{channel['channel_name']}'. "
-                    "ربما تم إزالة البوت أو فقد الصلاحيات."
+                    NOTIFY_SUCCESS,
+                    f"✅ تم إرسال منشورك بنجاح إلى قناة '{channel['channel_name']}'.",
+                    channel['channel_name']
                 )
-                
-                # Deactivate all schedules for this channel
-                await db.deactivate_channel_schedules(channel_tg_id)
+            else:
+                status = 'retrying' if result.retryable and Config.RETRY_MAX_ATTEMPTS > 1 else 'failed'
+                await db.update_schedule_run(run['id'], status, sent_count=sent_count, error=result.error)
+                # The channel's schedules get paused and this schedule is not advanced. Unless part of a
+                # catch-up already went out, the outbox row is dropped so that on resume the planned run is
+                # claimed afresh and goes through the misfire policy (a kept row is only advanced past)
+                replayed = result.outcome == SEND_CHANNEL_LOST and not sent_count
+                await self.handle_send_failure(schedule, channel, result, run_id=run['id'], replayed=replayed)
+                if result.outcome == SEND_CHANNEL_LOST:
+                    if replayed:
+                        await db.delete_schedule_run(run['id'])
+                    return
+            
+            await self.advance_schedule(schedule, next_run)
                 
         except Exception as e:
             logger.error(f"Error processing schedule {schedule.get('id')}: {e}", exc_info=True)
+        finally:
+            if run:
+                self.active_runs.pop(run['id'], None)
     
-    async def send_post_to_channel(self, post: Dict[str, Any], channel_tg_id: int) -> bool:
-        """Send a post to a specific channel"""
+    def record_execution(self, schedule: Dict[str, Any], result: SendResult, started: float,
+                         claimed_at: datetime, run_id: int = None, attempt: int = 0,
+                         planned_at: datetime = None):
+        """Hand one send attempt to the buffered execution log"""
+        execution_log.record(
+            schedule,
+            result.outcome,
+            planned_at=planned_at,
+            claimed_at=claimed_at,
+            send_seconds=time.perf_counter() - started,
+            message_id=result.message_id,
+            run_id=run_id,
+            attempt=attempt,
+            error=result.error
+        )
+    
+    async def prune_outbox(self):
+        """Drop finished outbox rows past their retention, at most once a day"""
+        now = datetime.now(pytz.UTC)
+        if self.last_outbox_prune and now - self.last_outbox_prune < timedelta(days=1):
+            return
+        self.last_outbox_prune = now
+        await db.prune_schedule_runs(now - timedelta(days=Config.OUTBOX_RETENTION_DAYS))
+    
+    async def claim_run(self, schedule: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Claim the schedule's planned run in the outbox; None if someone else holds it"""
+        run, created = await db.claim_schedule_run(schedule)
+        if not run:
+            logger.error(f"Could not record run of schedule {schedule['id']}, skipping this check")
+            return None
+        if created or run['status'] != 'pending':
+            return run
+        
+        # Pending but not ours: either another worker is on it or its owner died before sending
+        claimed_at = parse_timestamp(run['claimed_at'])
+        if datetime.now(pytz.UTC) - claimed_at < timedelta(seconds=Config.OUTBOX_LEASE_SECONDS):
+            logger.info(f"Run of schedule {schedule['id']} is claimed by another worker")
+            return None
+        if not await db.take_over_schedule_run(run):
+            return None
+        
+        logger.info(f"Took over stale claim of schedule {schedule['id']} run {run['planned_run_at']}")
+        return run
+    
+    async def recover_run(self, schedule: Dict[str, Any], run: Dict[str, Any], next_run: datetime = None):
+        """Finish a run left behind by a crash without sending it twice"""
+        if run['status'] == 'sending':
+            # Died mid-send: Telegram may or may not have the message. Never resend blindly.
+            logger.warning(
+                f"Run {run['id']} of schedule {schedule['id']} was interrupted during sending; "
+                "marking it unknown instead of resending"
+            )
+            await db.update_schedule_run(run['id'], 'unknown')
+            metrics.inc('schedule_runs_recovered_total', status='unknown')
+        else:
+            logger.info(f"Run {run['id']} of schedule {schedule['id']} already {run['status']}, advancing schedule")
+            metrics.inc('schedule_runs_recovered_total', status=run['status'])
+        
+        await self.advance_schedule(schedule, next_run)
+    
+    async def advance_schedule(self, schedule: Dict[str, Any], next_run: datetime = None):
+        """Move a schedule past the run just handled in a single write"""
+        schedule_id = schedule['id']
+        
+        if self.is_one_time_schedule(schedule):
+            # Done: removing the row is the only write, no cron evaluation
+            await db.delete_schedule(schedule_id)
+            logger.info(f"One-time schedule {schedule_id} completed and deleted")
+            return
+        
+        # Calculate next run time for recurring schedules
+        if next_run is None:
+            next_run = self.calculate_next_run(schedule['cron_expression'])
+        
+        if next_run:
+            if await db.update_schedule_next_run(schedule_id, next_run, **self.advance_queue(schedule)):
+                logger.info(f"Rescheduled post {schedule['post_id']} for {next_run}")
+            else:
+                logger.error(f"Failed to reschedule post {schedule['post_id']}")
+        else:
+            await db.delete_schedule(schedule_id)
+            logger.info(f"Schedule {schedule_id} has no further runs and was deleted")
+    
+    def advance_queue(self, schedule: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue mode: move the cursor to the next post of the pool, wrapping around"""
+        pool = schedule.get('post_ids')
+        if not pool:
+            return {}
+        position = ((schedule.get('queue_position') or 0) + 1) % len(pool)
+        return {'queue_position': position, 'post_id': pool[position]}
+    
+    async def handle_send_failure(self, schedule: Dict[str, Any], channel: Dict[str, Any], result: SendResult,
+                                  attempts: int = 1, retry_id: int = None, run_id: int = None,
+                                  replayed: bool = False):
+        """Retry transient failures with backoff; dead-letter permanent or exhausted ones (`replayed` runs are sent again later)"""
+        user_id = schedule['user_id']
+        post_id = schedule['post_id']
+        channel_tg_id = schedule['channel_tg_id']
+        # Retry rows carry the originating schedule in schedule_id
+        schedule_id = schedule.get('schedule_id') if retry_id else schedule['id']
+        metrics.inc('schedule_send_failures_total', outcome=result.outcome)
+        
+        if result.retryable and attempts < Config.RETRY_MAX_ATTEMPTS:
+            retry_at = datetime.now(pytz.UTC) + timedelta(seconds=backoff_delay(attempts, result.retry_after))
+            if retry_id:
+                await db.reschedule_retry(retry_id, attempts, retry_at, result.error)
+            else:
+                await db.add_retry(schedule_id, post_id, channel_tg_id, user_id, attempts, retry_at, result.error, run_id)
+            logger.info(f"Send of post {post_id} to {channel_tg_id} failed ({result.outcome}), retry {attempts} at {retry_at}")
+            return
+        
+        # Permanent failure or retries exhausted
+        if not replayed:
+            await db.add_dead_letter(schedule_id, post_id, channel_tg_id, user_id, attempts, result.outcome, result.error)
+        if retry_id:
+            await db.delete_retry(retry_id)
+        
+        if result.outcome == SEND_CHANNEL_LOST:
+            await notification_digest.add(
+                user_id,
+                NOTIFY_FAILURE,
+                f"⚠️ فشل إرسال منشورك إلى قناة '{channel['channel_name']}'. "
+                "ربما تم إزالة البوت أو فقد الصلاحيات. تم إيقاف جدولات القناة مؤقتاً حتى تعود الصلاحيات.",
+                f"{channel['channel_name']}: تمت إزالة البوت أو فقد الصلاحيات"
+            )
+            
+            # Pause all schedules for this channel; the permission sweep resumes them once the bot can post again
+            channel_monitor.mark_lost(channel_tg_id)
+            await db.pause_channel_schedules(channel_tg_id)
+        elif result.outcome == SEND_PERMANENT:
+            await notification_digest.add(
+                user_id,
+                NOTIFY_FAILURE,
+                f"⚠️ تعذر إرسال المنشور رقم {post_id} إلى قناة '{channel['channel_name']}': "
+                f"{truncate_text(result.error or '', 100)}",
+                f"{channel['channel_name']}: المنشور رقم {post_id} ({truncate_text(result.error or '', 60)})"
+            )
+        else:
+            await notification_digest.add(
+                user_id,
+                NOTIFY_FAILURE,
+                f"⚠️ فشل إرسال المنشور رقم {post_id} إلى قناة '{channel['channel_name']}' "
+                f"بعد {attempts} محاولات.",
+                f"{channel['channel_name']}: المنشور رقم {post_id} بعد {attempts} محاولات"
+            )
+    
+    async def process_retries(self):
+        """Re-send queued items whose backoff has elapsed"""
         try:
-            bot = self.bot_context.bot
+            retries = await db.get_due_retries(Config.RETRY_BATCH_SIZE)
             
-            # Check if post has media
-            if post['media_file_id'] and post['media_type']:
-                # Send media with caption
-                caption = post['post_content'] or ""
+            for retry in retries:
+                if not self.is_running:
+                    # Shutting down: leave the rest in the queue for the next instance
+                    break
+                if not self.owns(retry['channel_tg_id']):
+                    continue
                 
-                if post['media_type'] == 'photo':
-                    await bot.send_photo(
-                        chat_id=channel_tg_id,
-                        photo=post['media_file_id'],
-                        caption=caption
-                    )
-                elif post['media_type'] == 'video':
-                    await bot.send_video(
-                        chat_id=channel_tg_id,
-                        video=post['media_file_id'],
-                        caption=caption
-                    )
-                elif post['media_type'] == 'document':
-                    await bot.send_document(
-                        chat_id=channel_tg_id,
-                        document=post['media_file_id'],
-                        caption=caption
-                    )
-                elif post['media_type'] == 'audio':
-                    await bot.send_audio(
-                        chat_id=channel_tg_id,
-                        audio=post['media_file_id'],
-                        caption=caption
-                    )
-                elif post['media_type'] == 'voice':
-                    await bot.send_voice(
-                        chat_id=channel_tg_id,
-                        voice=post['media_file_id']
-                    )
-                elif post['media_type'] == 'video_note':
-                    await bot.send_video_note(
-                        chat_id=channel_tg_id,
-                        video_note=post['media_file_id']
-                    )
-                elif post['media_type'] == 'sticker':
-                    await bot.send_sticker(
-                        chat_id=channel_tg_id,
-                        sticker=post['media_file_id']
+                post = await db.get_post_by_id(retry['post_id'])
+                channel = await db.get_channel_by_tg_id(retry['channel_tg_id'])
+                if not post or not channel or channel['is_banned']:
+                    await db.delete_retry(retry['id'])
+                    continue
+                
+                # The outbox row tells whether a previous attempt got further than the queue knows
+                run_id = retry.get('run_id')
+                run = await db.get_schedule_run(run_id) if run_id else None
+                if run and run['status'] in ('sent', 'sending'):
+                    if run['status'] == 'sending':
+                        logger.warning(f"Retry {retry['id']} was interrupted during sending; not resending")
+                        await db.update_schedule_run(run_id, 'unknown')
+                    await db.delete_retry(retry['id'])
+                    continue
+                
+                attempts = retry['attempts'] + 1
+                if run:
+                    await db.update_schedule_run(run_id, 'sending')
+                claimed_at = datetime.now(pytz.UTC)
+                started = time.perf_counter()
+                result = await self.send_post_to_channel(post, retry['channel_tg_id'])
+                metrics.inc('schedule_retries_total', outcome=result.outcome)
+                self.record_execution(
+                    retry, result, started, claimed_at, run_id, attempts,
+                    planned_at=parse_timestamp(run['planned_run_at']) if run else None
+                )
+                
+                if run:
+                    if result.ok:
+                        status = 'sent'
+                    elif result.retryable and attempts < Config.RETRY_MAX_ATTEMPTS:
+                        status = 'retrying'
+                    else:
+                        status = 'failed'
+                    sent_count = (run.get('sent_count') or 0) + (1 if result.ok else 0)
+                    await db.update_schedule_run(run_id, status, sent_count=sent_count, error=result.error)
+                
+                if result.ok:
+                    await db.delete_retry(retry['id'])
+                    logger.info(f"Retry {retry['id']} for post {retry['post_id']} succeeded on attempt {attempts}")
+                    await notification_digest.add(
+                        retry['user_id'],
+                        NOTIFY_SUCCESS,
+                        f"✅ تم إرسال منشورك بنجاح إلى قناة '{channel['channel_name']}' بعد إعادة المحاولة.",
+                        channel['channel_name']
                     )
                 else:
-                    # Fallback to document
-                    await bot.send_document(
-                        chat_id=channel_tg_id,
-                        document=post['media_file_id'],
-                        caption=caption
-                    )
+                    await self.handle_send_failure(retry, channel, result, attempts, retry['id'])
+        
+        except Exception as e:
+            logger.error(f"Error processing retries: {e}", exc_info=True)
+    
+    async def send_post_to_channel(self, post: Dict[str, Any], channel_tg_id: int) -> SendResult:
+        """Send a post to a specific channel"""
+        try:
+            bot = self.bot_context.bot
             
-            elif post['post_content']:
-                # Send text message
-                await bot.send_message(
-                    chat_id=channel_tg_id,
-                    text=post['post_content']
-                )
+            message = None
+            if Config.POST_SEND_MODE == 'copy' and post.get('source_message_ids'):
+                message = await self.copy_post(bot, post, channel_tg_id)
             
-            else:
-                logger.error(f"Post {post['id']} has no content")
-                return False
+            if message is None:
+                if not (post.get('media_items') or (post['media_file_id'] and post['media_type']) or post['post_content']):
+                    logger.error(f"Post {post['id']} has no content")
+                    return SendResult(SEND_PERMANENT, "Post has no content")
+                message = await self.send_post_content(bot, post, channel_tg_id)
             
             logger.info(f"Successfully sent post {post['id']} to channel {channel_tg_id}")
-            return True
+            return SendResult(SEND_OK, message_id=message.message_id if message else None)
             
         except TelegramError as e:
-            logger.error(f"Telegram error sending post {post['id']} to channel {channel_tg_id}: {e}")
-            
-            # Check if it's a permissions error
-            if "bot was blocked" in str(e).lower() or \
-               "chat not found" in str(e).lower() or \
-               "bot is not a member" in str(e).lower() or \
-               "not enough rights" in str(e).lower():
-                return False
-            
-            # For other errors, might be temporary
-            return False
+            result = classify_send_error(e)
+            logger.error(f"Telegram error sending post {post['id']} to channel {channel_tg_id} ({result.outcome}): {e}")
+            return result
             
         except Exception as e:
             logger.error(f"Unexpected error sending post {post['id']} to channel {channel_tg_id}: {e}")
-            return False
+            return classify_send_error(e)
+    
+    async def send_post_content(self, bot, post: Dict[str, Any], channel_tg_id: int):
+        """Send a post from its stored text and file ids"""
+        # Albums go out in one call and render as a single grouped post
+        if post.get('media_items'):
+            messages = await bot.send_media_group(
+                chat_id=channel_tg_id,
+                media=build_input_media(post['media_items'], post['post_content'])
+            )
+            return messages[0] if messages else None
+        
+        if post['media_file_id'] and post['media_type']:
+            media_type = get_media_type(post['media_type'])
+            message = await getattr(bot, media_type.method)(
+                chat_id=channel_tg_id,
+                **media_send_kwargs(post['media_type'], post['media_file_id'], post['post_content'])
+            )
+            if post['post_content'] and not media_type.caption:
+                # Stickers and video notes can't carry a caption, the text follows as its own message
+                try:
+                    await bot.send_message(chat_id=channel_tg_id, text=post['post_content'])
+                except TelegramError as e:
+                    # The media is already out, retrying the whole post would duplicate it
+                    logger.error(f"Failed to send text of post {post['id']} after its {post['media_type']}: {e}")
+            return message
+        
+        return await bot.send_message(
+            chat_id=channel_tg_id,
+            text=post['post_content']
+        )
+    
+    async def copy_post(self, bot, post: Dict[str, Any], channel_tg_id: int):
+        """Copy the message(s) a post was made from, nothing is re-uploaded; None if the source is gone"""
+        source_ids = post['source_message_ids']
+        try:
+            if len(source_ids) > 1:
+                copies = await bot.copy_messages(
+                    chat_id=channel_tg_id,
+                    from_chat_id=post['source_chat_id'],
+                    message_ids=source_ids
+                )
+                return copies[0] if copies else None
+            return await bot.copy_message(
+                chat_id=channel_tg_id,
+                from_chat_id=post['source_chat_id'],
+                message_id=source_ids[0]
+            )
+        except BadRequest as e:
+            if not any(marker in str(e).lower() for marker in SOURCE_GONE_MARKERS):
+                raise
+            logger.warning(f"Source message of post {post['id']} is gone, sending it from the stored content: {e}")
+            return None
     
     async def notify_user(self, user_id: int, message: str):
         """Send notification to user"""
@@ -236,43 +878,30 @@ class PostScheduler:
     
     def calculate_next_run(self, cron_expression: str) -> datetime:
         """Calculate next run time for a cron expression"""
-        try:
-            now = datetime.now(self.timezone)
-            cron = croniter(cron_expression, now)
-            next_run = cron.get_next(datetime)
-            
-            # Convert to timezone-aware datetime
-            if next_run.tzinfo is None:
-                next_run = self.timezone.localize(next_run)
-            
-            return next_run
-            
-        except Exception as e:
-            logger.error(f"Error calculating next run for cron '{cron_expression}': {e}")
-            return None
+        return next_occurrence(cron_expression, datetime.now(self.timezone), Config.TIMEZONE)
+    
+    def calculate_next_runs(self, schedules: List[Dict[str, Any]]) -> Dict[Any, datetime]:
+        """Calculate next run times for a batch of schedules"""
+        return batch_next_runs(schedules, datetime.now(self.timezone), Config.TIMEZONE)
     
-    def is_one_time_schedule(self, cron_expression: str) -> bool:
-        """Check if a cron expression represents a one-time schedule"""
-        # One-time schedules typically have specific date/month values
-        # For simplicity, we'll check if it has specific date and month
-        parts = cron_expression.split()
-        if len(parts) >= 5:
-            day = parts[2]
-            month = parts[3]
-            # If both day and month are specific numbers (not * or ranges)
-            return day.isdigit() and month.isdigit()
-        return False
+    def is_one_time_schedule(self, schedule: Dict[str, Any]) -> bool:
+        """Check if a schedule is a one-shot run at an absolute time"""
+        return schedule.get('kind') == 'once'
     
     async def get_scheduler_status(self) -> Dict[str, Any]:
         """Get scheduler status and statistics"""
         try:
-            active_schedules = await db.get_due_schedules()
-            all_schedules_count = len(await db.get_user_schedules(0))  # This needs to be fixed
+            due_schedules = self.index.due(datetime.now(pytz.UTC))
             
             return {
                 'is_running': self.is_running,
                 'check_interval': self.check_interval,
-                'due_schedules': len(active_schedules),
+                'indexed_schedules': len(self.index),
+                'due_schedules': len(due_schedules),
+                'queued_runs': len(self.run_queue),
+                'queued_users': len(self.run_queue.flow_sizes()),
+                'lost_channels': channel_monitor.lost_channels(),
+                'shard': {'worker_id': self.shard.worker_id, 'workers': len(self.shard.members)} if self.shard else None,
                 'timezone': Config.TIMEZONE,
                 'last_check': datetime.now(self.timezone).isoformat()
             }
@@ -0,0 +1,116 @@
+import asyncio
+import bisect
+import logging
+import os
+import socket
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pytz
+
+from config import Config
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+def _hash(key: str) -> int:
+    return zlib.crc32(key.encode('utf-8'))
+
+class HashRing:
+    """Consistent hash ring: adding or removing a member only moves the keys next to it"""
+    def __init__(self, members: Iterable[str] = (), vnodes: int = 64):
+        self.vnodes = vnodes
+        self.members = sorted(set(members))
+        points = sorted(
+            (_hash(f"{member}#{i}"), member)
+            for member in self.members
+            for i in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+    
+    def owner(self, key) -> Optional[str]:
+        """Member responsible for a key (None on an empty ring)"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._owners[index]
+
+class ShardCoordinator:
+    """Worker membership through heartbeats in the database, and channel ownership by hash ring"""
+    def __init__(self, worker_id: str = None, on_rebalance: Callable[[List[str]], None] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.on_rebalance = on_rebalance
+        self.ring = HashRing([self.worker_id], Config.SHARD_VNODES)
+        self._owned: Dict[int, bool] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def members(self) -> List[str]:
+        return self.ring.members
+    
+    def owns(self, channel_tg_id: int) -> bool:
+        """Whether this worker is responsible for a channel (cached until the next rebalance)"""
+        owned = self._owned.get(channel_tg_id)
+        if owned is None:
+            owned = self._owned[channel_tg_id] = self.ring.owner(channel_tg_id) == self.worker_id
+        return owned
+    
+    async def start(self):
+        """Join the ring and keep heartbeating"""
+        from supabase_client import db
+        
+        await db.register_worker(self.worker_id, socket.gethostname(), os.getpid())
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Worker {self.worker_id} joined, {len(self.members)} workers in the ring")
+    
+    async def stop(self):
+        """Leave the ring so the remaining workers take over this shard right away"""
+        from supabase_client import db
+        
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await db.remove_worker(self.worker_id)
+        logger.info(f"Worker {self.worker_id} left the ring")
+    
+    async def _run(self):
+        from supabase_client import db
+        
+        while True:
+            await asyncio.sleep(Config.WORKER_HEARTBEAT_INTERVAL)
+            try:
+                await db.register_worker(self.worker_id, socket.gethostname(), os.getpid())
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Worker heartbeat failed: {e}")
+    
+    async def refresh(self):
+        """Rebuild the ring from live workers if membership changed"""
+        from supabase_client import db
+        
+        since = datetime.now(pytz.UTC) - timedelta(seconds=Config.WORKER_TIMEOUT)
+        members = await db.get_live_workers(since)
+        if members is None:
+            # Database unreachable: keep the current ring rather than claiming everything
+            return
+        if self.worker_id not in members:
+            members.append(self.worker_id)
+        
+        if sorted(set(members)) == self.members:
+            return
+        
+        previous = self.members
+        self.ring = HashRing(members, Config.SHARD_VNODES)
+        self._owned = {}
+        metrics.inc('shard_rebalances_total')
+        logger.info(f"Shard ring rebalanced: {len(previous)} -> {len(self.members)} workers")
+        if self.on_rebalance:
+            self.on_rebalance(self.members)
\ No newline at end of file
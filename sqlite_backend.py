@@ -0,0 +1,407 @@
+import logging
+import sqlite3
+import threading
+from typing import List, Dict, Optional, Any
+
+from performance import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+
+# Schema mirrors the Supabase tables (same columns, defaults and indexes)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel_tg_id INTEGER NOT NULL UNIQUE,
+    channel_name TEXT,
+    user_owner_id INTEGER NOT NULL,
+    is_vip BOOLEAN NOT NULL DEFAULT 0,
+    is_banned BOOLEAN NOT NULL DEFAULT 0,
+    jitter_seconds INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_channels_user_owner_id ON channels (user_owner_id);
+CREATE INDEX IF NOT EXISTS idx_channels_broadcast ON channels (is_vip, is_banned);
+
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL REFERENCES channels (id) ON DELETE CASCADE,
+    post_content TEXT,
+    media_file_id TEXT,
+    media_type TEXT,
+    media_items JSON,
+    source_chat_id INTEGER,
+    source_message_ids JSON,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_posts_channel_user ON posts (channel_id, user_id);
+
+CREATE TABLE IF NOT EXISTS schedule (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    post_id INTEGER NOT NULL REFERENCES posts (id) ON DELETE CASCADE,
+    channel_tg_id INTEGER NOT NULL REFERENCES channels (channel_tg_id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    cron_expression TEXT,
+    next_run_at TEXT NOT NULL,
+    is_active BOOLEAN NOT NULL DEFAULT 1,
+    task_type TEXT NOT NULL DEFAULT 'post',
+    kind TEXT NOT NULL DEFAULT 'cron',
+    misfire_policy TEXT,
+    misfire_grace_seconds INTEGER,
+    post_ids JSON,
+    queue_position INTEGER NOT NULL DEFAULT 0,
+    paused BOOLEAN NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_schedule_due ON schedule (is_active, next_run_at);
+CREATE INDEX IF NOT EXISTS idx_schedule_user_id ON schedule (user_id, is_active);
+CREATE INDEX IF NOT EXISTS idx_schedule_channel_tg_id ON schedule (channel_tg_id);
+
+CREATE TABLE IF NOT EXISTS schedule_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    schedule_id INTEGER NOT NULL,
+    planned_run_at TEXT NOT NULL,
+    post_id INTEGER NOT NULL,
+    channel_tg_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    sent_count INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    claimed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    completed_at TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    UNIQUE (schedule_id, planned_run_at)
+);
+CREATE INDEX IF NOT EXISTS idx_schedule_runs_status ON schedule_runs (status, created_at);
+
+CREATE TABLE IF NOT EXISTS schedule_executions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    schedule_id INTEGER,
+    run_id INTEGER,
+    post_id INTEGER NOT NULL,
+    channel_tg_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    planned_at TEXT,
+    claimed_at TEXT,
+    sent_at TEXT NOT NULL,
+    lag_ms INTEGER,
+    send_ms INTEGER,
+    message_id INTEGER,
+    outcome TEXT NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_schedule_executions_planned_at ON schedule_executions (planned_at);
+CREATE INDEX IF NOT EXISTS idx_schedule_executions_channel ON schedule_executions (channel_tg_id, planned_at);
+
+CREATE TABLE IF NOT EXISTS retry_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    schedule_id INTEGER,
+    run_id INTEGER,
+    post_id INTEGER NOT NULL REFERENCES posts (id) ON DELETE CASCADE,
+    channel_tg_id INTEGER NOT NULL REFERENCES channels (channel_tg_id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TEXT NOT NULL,
+    last_error TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_retry_queue_next_attempt_at ON retry_queue (next_attempt_at);
+
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    schedule_id INTEGER,
+    post_id INTEGER NOT NULL,
+    channel_tg_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    outcome TEXT NOT NULL,
+    error TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_dead_letters_user_id ON dead_letters (user_id);
+
+CREATE TABLE IF NOT EXISTS scheduler_workers (
+    worker_id TEXT PRIMARY KEY,
+    hostname TEXT,
+    pid INTEGER,
+    started_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    heartbeat_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scheduler_workers_heartbeat ON scheduler_workers (heartbeat_at);
+
+CREATE TABLE IF NOT EXISTS user_settings (
+    user_id INTEGER PRIMARY KEY,
+    mute_success BOOLEAN NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+"""
+
+class SQLiteResponse:
+    """Response object shaped like postgrest's APIResponse"""
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+class SQLiteQuery:
+    """Minimal PostgREST-style query builder executed against SQLite"""
+    def __init__(self, client: 'SQLiteClient', table: str):
+        self.client = client
+        self.table = table
+        self.operation = 'select'
+        self.columns = '*'
+        self.count_method = None
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.filters = []
+        self.ordering = []
+        self.row_limit = None
+        self.row_offset = None
+    
+    # Operations
+    def select(self, *columns: str, count: Optional[str] = None) -> 'SQLiteQuery':
+        self.operation = 'select'
+        self.columns = ','.join(columns) if columns else '*'
+        self.count_method = count
+        return self
+    
+    def insert(self, json: Any, **kwargs) -> 'SQLiteQuery':
+        self.operation = 'insert'
+        self.payload = json if isinstance(json, list) else [json]
+        return self
+    
+    def upsert(self, json: Any, on_conflict: str = 'id', ignore_duplicates: bool = False, **kwargs) -> 'SQLiteQuery':
+        self.operation = 'upsert'
+        self.payload = json if isinstance(json, list) else [json]
+        self.on_conflict = on_conflict or 'id'
+        self.ignore_duplicates = ignore_duplicates
+        return self
+    
+    def update(self, json: Dict[str, Any], **kwargs) -> 'SQLiteQuery':
+        self.operation = 'update'
+        self.payload = json
+        return self
+    
+    def delete(self, **kwargs) -> 'SQLiteQuery':
+        self.operation = 'delete'
+        return self
+    
+    # Filters
+    def _filter(self, column: str, operator: str, value: Any) -> 'SQLiteQuery':
+        self.filters.append((column, operator, value))
+        return self
+    
+    def eq(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, '=', value)
+    
+    def neq(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, '!=', value)
+    
+    def gt(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, '>', value)
+    
+    def gte(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, '>=', value)
+    
+    def lt(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, '<', value)
+    
+    def lte(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, '<=', value)
+    
+    def in_(self, column: str, values: List[Any]) -> 'SQLiteQuery':
+        return self._filter(column, 'IN', list(values))
+    
+    def is_(self, column: str, value: Any) -> 'SQLiteQuery':
+        return self._filter(column, 'IS', value)
+    
+    def order(self, column: str, desc: bool = False, **kwargs) -> 'SQLiteQuery':
+        self.ordering.append((column, desc))
+        return self
+    
+    def limit(self, size: int, **kwargs) -> 'SQLiteQuery':
+        self.row_limit = size
+        return self
+    
+    def range(self, start: int, end: int, **kwargs) -> 'SQLiteQuery':
+        self.row_offset = start
+        self.row_limit = end - start + 1
+        return self
+    
+    # Execution
+    def _where(self):
+        clauses = []
+        params = []
+        for column, operator, value in self.filters:
+            self.client.check_column(self.table, column)
+            if operator == 'IN':
+                if not value:
+                    clauses.append('0')
+                    continue
+                clauses.append(f"{column} IN ({','.join('?' * len(value))})")
+                params.extend(self.client.encode_value(self.table, column, v) for v in value)
+            elif operator == 'IS':
+                if value in (None, 'null'):
+                    clauses.append(f"{column} IS NULL")
+                else:
+                    clauses.append(f"{column} IS ?")
+                    params.append(self.client.encode_value(self.table, column, value))
+            else:
+                clauses.append(f"{column} {operator} ?")
+                params.append(self.client.encode_value(self.table, column, value))
+        
+        sql = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return sql, params
+    
+    def _select_list(self) -> str:
+        if self.columns.strip() == '*':
+            return '*'
+        columns = [c.strip() for c in self.columns.split(',') if c.strip()]
+        for column in columns:
+            self.client.check_column(self.table, column)
+        return ', '.join(columns)
+    
+    def execute(self) -> SQLiteResponse:
+        self.client.check_table(self.table)
+        with self.client.lock:
+            if self.operation == 'select':
+                return self._execute_select()
+            if self.operation in ('insert', 'upsert'):
+                return self._execute_insert()
+            if self.operation == 'update':
+                return self._execute_update()
+            if self.operation == 'delete':
+                return self._execute_delete()
+        raise ValueError(f"Unsupported operation: {self.operation}")
+    
+    def _execute_select(self) -> SQLiteResponse:
+        where, params = self._where()
+        sql = f"SELECT {self._select_list()} FROM {self.table}{where}"
+        if self.ordering:
+            for column, _ in self.ordering:
+                self.client.check_column(self.table, column)
+            sql += " ORDER BY " + ', '.join(f"{c} {'DESC' if d else 'ASC'}" for c, d in self.ordering)
+        if self.row_limit is not None:
+            sql += f" LIMIT {int(self.row_limit)}"
+            if self.row_offset:
+                sql += f" OFFSET {int(self.row_offset)}"
+        
+        rows = self.client.fetch(sql, params, self.table)
+        
+        count = None
+        if self.count_method:
+            count_sql = f"SELECT COUNT(*) AS n FROM {self.table}{where}"
+            count = self.client.connection.execute(count_sql, params).fetchone()[0]
+        
+        return SQLiteResponse(rows, count)
+    
+    def _execute_insert(self) -> SQLiteResponse:
+        inserted = []
+        for row in self.payload:
+            columns = list(row.keys())
+            for column in columns:
+                self.client.check_column(self.table, column)
+            values = [self.client.encode_value(self.table, c, row[c]) for c in columns]
+            placeholders = ', '.join('?' * len(columns))
+            sql = f"INSERT INTO {self.table} ({', '.join(columns)}) VALUES ({placeholders})"
+            if self.operation == 'upsert':
+                conflict = [c.strip() for c in self.on_conflict.split(',')]
+                updates = [c for c in columns if c not in conflict]
+                if updates and not self.ignore_duplicates:
+                    sql += f" ON CONFLICT ({', '.join(conflict)}) DO UPDATE SET "
+                    sql += ', '.join(f"{c} = excluded.{c}" for c in updates)
+                else:
+                    sql += f" ON CONFLICT ({', '.join(conflict)}) DO NOTHING"
+            sql += " RETURNING *"
+            inserted.extend(self.client.fetch(sql, values, self.table))
+        self.client.connection.commit()
+        return SQLiteResponse(inserted)
+    
+    def _execute_update(self) -> SQLiteResponse:
+        columns = list(self.payload.keys())
+        for column in columns:
+            self.client.check_column(self.table, column)
+        if not columns:
+            return SQLiteResponse([])
+        where, params = self._where()
+        assignments = ', '.join(f"{c} = ?" for c in columns)
+        values = [self.client.encode_value(self.table, c, self.payload[c]) for c in columns]
+        sql = f"UPDATE {self.table} SET {assignments}{where} RETURNING *"
+        rows = self.client.fetch(sql, values + params, self.table)
+        self.client.connection.commit()
+        return SQLiteResponse(rows)
+    
+    def _execute_delete(self) -> SQLiteResponse:
+        where, params = self._where()
+        sql = f"DELETE FROM {self.table}{where} RETURNING *"
+        rows = self.client.fetch(sql, params, self.table)
+        self.client.connection.commit()
+        return SQLiteResponse(rows)
+
+class SQLiteClient:
+    """Offline stand-in for the Supabase client exposing the same table() API"""
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        if path != ':memory:':
+            self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        self.columns: Dict[str, Dict[str, str]] = {}
+        self._load_columns()
+        logger.info(f"SQLite backend ready at {path}")
+    
+    def _load_columns(self):
+        """Cache declared column types so values round-trip like PostgREST JSON"""
+        tables = self.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()
+        for (table,) in tables:
+            info = self.connection.execute(f"PRAGMA table_info({table})").fetchall()
+            self.columns[table] = {row['name']: (row['type'] or '').upper() for row in info}
+    
+    def check_table(self, table: str):
+        if table not in self.columns:
+            raise ValueError(f"Unknown table: {table}")
+    
+    def check_column(self, table: str, column: str):
+        if column not in self.columns.get(table, {}):
+            raise ValueError(f"Unknown column {table}.{column}")
+    
+    def encode_value(self, table: str, column: str, value: Any) -> Any:
+        if isinstance(value, bool):
+            return int(value)
+        column_type = self.columns[table].get(column)
+        if column_type == 'BOOLEAN' and isinstance(value, str):
+            return 1 if value.lower() == 'true' else 0
+        if column_type == 'JSON' and value is not None:
+            return json_dumps(value)
+        return value
+    
+    def decode_row(self, table: str, row: sqlite3.Row) -> Dict[str, Any]:
+        types = self.columns[table]
+        decoded = {}
+        for key in row.keys():
+            value = row[key]
+            if types.get(key) == 'BOOLEAN' and value is not None:
+                value = bool(value)
+            elif types.get(key) == 'JSON' and value is not None:
+                value = json_loads(value)
+            decoded[key] = value
+        return decoded
+    
+    def fetch(self, sql: str, params: List[Any], table: str) -> List[Dict[str, Any]]:
+        cursor = self.connection.execute(sql, params)
+        return [self.decode_row(table, row) for row in cursor.fetchall()]
+    
+    def table(self, table_name: str) -> SQLiteQuery:
+        return SQLiteQuery(self, table_name)
+    
+    def close(self):
+        with self.lock:
+            self.connection.close()
\ No newline at end of file
@@ -1,17 +1,42 @@
+import asyncio
 import logging
-from typing import List, Dict, Optional, Any
-from supabase import create_client, Client
+import threading
+from typing import List, Dict, Optional, Any, Tuple, TYPE_CHECKING
 from datetime import datetime
 import pytz
 from config import Config
+from schedule_events import schedule_events
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
 class SupabaseClient:
-    def __init__(self):
-        self.supabase: Client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+    def __init__(self, client: 'Client' = None):
+        # Any object exposing the supabase table() query API can back the client
+        if client is None:
+            from supabase import create_client, ClientOptions
+            from http_pools import build_supabase_http_client
+            client = create_client(
+                Config.SUPABASE_URL, Config.SUPABASE_KEY,
+                options=ClientOptions(httpx_client=build_supabase_http_client())
+            )
+        self.supabase: 'Client' = client
         self.timezone = pytz.timezone(Config.TIMEZONE)
     
+    async def ping(self) -> bool:
+        """Run a cheap query off the event loop to verify database connectivity"""
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, lambda: self.supabase.table('channels').select('id').limit(1).execute()
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Database ping failed: {e}")
+            return False
+    
     # Channel Management
     async def add_channel(self, channel_tg_id: int, channel_name: str, user_owner_id: int) -> bool:
         """Add a new channel to the database"""
@@ -48,6 +73,17 @@ class SupabaseClient:
             logger.error(f"Error getting channel by TG ID: {e}")
             return None
     
+    async def get_channels_by_tg_ids(self, channel_tg_ids: List[int]) -> List[Dict[str, Any]]:
+        """Get several channels by Telegram ID in one request"""
+        try:
+            if not channel_tg_ids:
+                return []
+            response = self.supabase.table('channels').select('*').in_('channel_tg_id', list(channel_tg_ids)).execute()
+            return response.data
+        except Exception as e:
+            logger.error(f"Error getting channels by TG IDs: {e}")
+            return []
+    
     async def get_channel_by_id(self, channel_id: int) -> Optional[Dict[str, Any]]:
         """Get channel by database ID"""
         try:
@@ -61,6 +97,8 @@ class SupabaseClient:
         """Delete a channel (only by owner)"""
         try:
             response = self.supabase.table('channels').delete().eq('id', channel_id).eq('user_owner_id', user_id).execute()
+            # Its schedules go with it (ON DELETE CASCADE)
+            schedule_events.deleted([{'channel_tg_id': row['channel_tg_id']} for row in response.data])
             logger.info(f"Channel {channel_id} deleted by user {user_id}")
             return True
         except Exception as e:
@@ -92,17 +130,32 @@ class SupabaseClient:
             logger.error(f"Error updating channel status: {e}")
             return False
     
+    async def update_channel_jitter(self, channel_id: int, jitter_seconds: int) -> bool:
+        """Set the send spreading window for a channel (0 disables it)"""
+        try:
+            self.supabase.table('channels').update({'jitter_seconds': jitter_seconds}).eq('id', channel_id).execute()
+            logger.info(f"Channel {channel_id} jitter set to {jitter_seconds}s")
+            return True
+        except Exception as e:
+            logger.error(f"Error updating channel jitter: {e}")
+            return False
+    
     # Post Management
     async def add_post(self, user_id: int, channel_id: int, post_content: str = None, 
-                      media_file_id: str = None, media_type: str = None) -> Optional[int]:
-        """Add a new post template"""
+                      media_file_id: str = None, media_type: str = None,
+                      media_items: List[Dict[str, str]] = None, source_chat_id: int = None,
+                      source_message_ids: List[int] = None) -> Optional[int]:
+        """Add a new post template (media_items holds the files of an album, source_* the message(s) it was made from)"""
         try:
             response = self.supabase.table('posts').insert({
                 'user_id': user_id,
                 'channel_id': channel_id,
                 'post_content': post_content,
                 'media_file_id': media_file_id,
-                'media_type': media_type
+                'media_type': media_type,
+                'media_items': media_items,
+                'source_chat_id': source_chat_id,
+                'source_message_ids': source_message_ids
             }).execute()
             
             post_id = response.data[0]['id']
@@ -131,7 +184,8 @@ class SupabaseClient:
             return None
     
     async def update_post(self, post_id: int, user_id: int, post_content: str = None,
-                         media_file_id: str = None, media_type: str = None) -> bool:
+                         media_file_id: str = None, media_type: str = None,
+                         media_items: List[Dict[str, str]] = None) -> bool:
         """Update a post (only by owner)"""
         try:
             update_data = {}
@@ -141,6 +195,11 @@ class SupabaseClient:
                 update_data['media_file_id'] = media_file_id
             if media_type is not None:
                 update_data['media_type'] = media_type
+                # New media replaces an album too
+                update_data['media_items'] = media_items
+            # The source message no longer matches an edited post, it is sent from the stored fields from now on
+            update_data['source_chat_id'] = None
+            update_data['source_message_ids'] = None
             
             response = self.supabase.table('posts').update(update_data).eq('id', post_id).eq('user_id', user_id).execute()
             logger.info(f"Post {post_id} updated by user {user_id}")
@@ -152,16 +211,50 @@ class SupabaseClient:
     async def delete_post(self, post_id: int, user_id: int) -> bool:
         """Delete a post (only by owner)"""
         try:
+            # Queue schedules keep running with the rest of their pool
+            await self.remove_post_from_queues(post_id, user_id)
             response = self.supabase.table('posts').delete().eq('id', post_id).eq('user_id', user_id).execute()
+            # Its schedules go with it (ON DELETE CASCADE)
+            schedule_events.deleted([{'post_id': row['id']} for row in response.data])
             logger.info(f"Post {post_id} deleted by user {user_id}")
             return True
         except Exception as e:
             logger.error(f"Error deleting post: {e}")
             return False
     
+    async def remove_post_from_queues(self, post_id: int, user_id: int) -> bool:
+        """Drop a post from the user's queue-mode pools, keeping each cursor on the same next item"""
+        try:
+            response = self.supabase.table('schedule').select('*').eq('user_id', user_id).execute()
+            updates = []
+            for schedule in response.data:
+                pool = schedule.get('post_ids') or []
+                if post_id not in pool or len(pool) == 1:
+                    # A pool of just this post goes away with it (ON DELETE CASCADE)
+                    continue
+                
+                removed_at = pool.index(post_id)
+                position = schedule.get('queue_position') or 0
+                pool = pool[:removed_at] + pool[removed_at + 1:]
+                if removed_at < position:
+                    position -= 1
+                position %= len(pool)
+                # Left alone if the scheduler moved the cursor meanwhile
+                updates.append((
+                    schedule['id'],
+                    {'post_ids': pool, 'queue_position': position, 'post_id': pool[position]},
+                    {'queue_position': schedule.get('queue_position') or 0}
+                ))
+            
+            return await self.update_schedules_bulk(updates)
+        except Exception as e:
+            logger.error(f"Error removing post {post_id} from queues: {e}")
+            return False
+    
     # Schedule Management
     async def add_schedule(self, post_id: int, channel_tg_id: int, user_id: int,
-                          cron_expression: str, next_run_at: datetime) -> Optional[int]:
+                          cron_expression: str, next_run_at: datetime,
+                          misfire_policy: str = None, misfire_grace_seconds: int = None) -> Optional[int]:
         """Add a new schedule"""
         try:
             # Convert to UTC for storage
@@ -176,43 +269,133 @@ class SupabaseClient:
                 'cron_expression': cron_expression,
                 'next_run_at': next_run_at_utc.isoformat(),
                 'is_active': True,
-                'task_type': 'post'
+                'task_type': 'post',
+                'misfire_policy': misfire_policy,
+                'misfire_grace_seconds': misfire_grace_seconds
             }).execute()
             
             schedule_id = response.data[0]['id']
+            schedule_events.upserted(response.data)
             logger.info(f"Schedule added: ID {schedule_id} for post {post_id}")
             return schedule_id
         except Exception as e:
             logger.error(f"Error adding schedule: {e}")
             return None
     
-    async def get_due_schedules(self) -> List[Dict[str, Any]]:
-        """Get all schedules that are due for execution"""
-        try:
-            current_time = datetime.now(pytz.UTC).isoformat()
-            response = self.supabase.table('schedule').select('*').eq('is_active', True).lte('next_run_at', current_time).execute()
-            return response.data
-        except Exception as e:
-            logger.error(f"Error getting due schedules: {e}")
-            return []
-    
-    async def update_schedule_next_run(self, schedule_id: int, next_run_at: datetime) -> bool:
-        """Update the next run time for a schedule"""
+    async def update_schedule_next_run(self, schedule_id: int, next_run_at: datetime,
+                                       queue_position: int = None, post_id: int = None) -> bool:
+        """Update the next run time for a schedule (and, in queue mode, move its cursor in the same write)"""
         try:
             # Convert to UTC for storage
             if next_run_at.tzinfo is None:
                 next_run_at = self.timezone.localize(next_run_at)
             next_run_at_utc = next_run_at.astimezone(pytz.UTC)
             
-            response = self.supabase.table('schedule').update({
-                'next_run_at': next_run_at_utc.isoformat()
-            }).eq('id', schedule_id).execute()
+            update_data = {'next_run_at': next_run_at_utc.isoformat()}
+            if queue_position is not None:
+                update_data['queue_position'] = queue_position
+                update_data['post_id'] = post_id
             
+            response = self.supabase.table('schedule').update(update_data).eq('id', schedule_id).execute()
+            
+            schedule_events.upserted(response.data)
             return True
         except Exception as e:
             logger.error(f"Error updating schedule next run: {e}")
             return False
     
+    async def update_schedules_bulk(self, updates: List[Tuple[int, Dict[str, Any], Dict[str, Any]]]) -> bool:
+        """Apply (schedule_id, changed columns, expected columns) updates, one request per distinct change"""
+        try:
+            # Only the changed columns are written, and only to rows that still exist and still hold the
+            # expected values: a schedule deleted or edited meanwhile is neither re-created nor overwritten
+            groups: Dict[str, Tuple[Dict[str, Any], Dict[str, Any], List[int]]] = {}
+            for schedule_id, values, expected in updates:
+                key = repr((sorted(values.items()), sorted(expected.items())))
+                groups.setdefault(key, (values, expected, []))[2].append(schedule_id)
+            
+            for values, expected, schedule_ids in groups.values():
+                query = self.supabase.table('schedule').update(values).in_('id', schedule_ids)
+                for column, value in expected.items():
+                    query = query.eq(column, value)
+                response = query.execute()
+                schedule_events.upserted(response.data)
+            return True
+        except Exception as e:
+            logger.error(f"Error bulk updating {len(updates)} schedules: {e}")
+            return False
+    
+    def _schedule_row(self, schedule: Dict[str, Any]) -> Dict[str, Any]:
+        """Complete schedule row with next_run_at in UTC (a bulk insert needs the same keys in every row)"""
+        next_run_at = schedule['next_run_at']
+        if isinstance(next_run_at, datetime):
+            if next_run_at.tzinfo is None:
+                next_run_at = self.timezone.localize(next_run_at)
+            next_run_at = next_run_at.astimezone(pytz.UTC).isoformat()
+        
+        cron_expression = schedule.get('cron_expression')
+        post_ids = schedule.get('post_ids')
+        return {
+            # Queue mode: post_id is the pool item sent on the next run
+            'post_id': post_ids[0] if post_ids else schedule['post_id'],
+            'channel_tg_id': schedule['channel_tg_id'],
+            'user_id': schedule['user_id'],
+            'cron_expression': cron_expression,
+            'next_run_at': next_run_at,
+            'is_active': schedule.get('is_active', True),
+            'task_type': schedule.get('task_type', 'post'),
+            'kind': schedule.get('kind') or ('cron' if cron_expression else 'once'),
+            'misfire_policy': schedule.get('misfire_policy'),
+            'misfire_grace_seconds': schedule.get('misfire_grace_seconds'),
+            'post_ids': post_ids or None,
+            'queue_position': 0
+        }
+    
+    async def add_schedules(self, schedules: List[Dict[str, Any]]) -> List[int]:
+        """Insert several schedules in one request; returns the new IDs in order (empty on failure)"""
+        try:
+            if not schedules:
+                return []
+            response = self.supabase.table('schedule').insert(
+                [self._schedule_row(schedule) for schedule in schedules]
+            ).execute()
+            
+            schedule_events.upserted(response.data)
+            logger.info(f"Added {len(response.data)} schedules in one request")
+            return [row['id'] for row in response.data]
+        except Exception as e:
+            logger.error(f"Error adding {len(schedules)} schedules: {e}")
+            return []
+    
+    async def update_schedules(self, schedule_ids: List[int], values: Dict[str, Any]) -> bool:
+        """Apply the same change to several schedules in one request"""
+        try:
+            if not schedule_ids:
+                return True
+            response = self.supabase.table('schedule').update(values).in_('id', schedule_ids).execute()
+            schedule_events.upserted(response.data)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating {len(schedule_ids)} schedules: {e}")
+            return False
+    
+    async def deactivate_schedules(self, schedule_ids: List[int]) -> bool:
+        """Deactivate several schedules in one request"""
+        return await self.update_schedules(schedule_ids, {'is_active': False})
+    
+    async def delete_schedules(self, schedule_ids: List[int]) -> bool:
+        """Delete several schedules in one request"""
+        try:
+            if not schedule_ids:
+                return True
+            self.supabase.table('schedule').delete().in_('id', schedule_ids).execute()
+            schedule_events.deleted([{'id': schedule_id} for schedule_id in schedule_ids])
+            logger.info(f"Deleted {len(schedule_ids)} schedules")
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting schedules: {e}")
+            return False
+    
     async def deactivate_schedule(self, schedule_id: int) -> bool:
         """Deactivate a schedule"""
         try:
@@ -220,6 +403,7 @@ class SupabaseClient:
                 'is_active': False
             }).eq('id', schedule_id).execute()
             
+            schedule_events.upserted(response.data)
             return True
         except Exception as e:
             logger.error(f"Error deactivating schedule: {e}")
@@ -229,12 +413,37 @@ class SupabaseClient:
         """Delete a schedule"""
         try:
             response = self.supabase.table('schedule').delete().eq('id', schedule_id).execute()
+            schedule_events.deleted([{'id': schedule_id}])
             logger.info(f"Schedule {schedule_id} deleted")
             return True
         except Exception as e:
             logger.error(f"Error deleting schedule: {e}")
             return False
     
+    async def get_schedule(self, schedule_id: int) -> Optional[Dict[str, Any]]:
+        """Get a schedule by ID"""
+        try:
+            response = self.supabase.table('schedule').select('*').eq('id', schedule_id).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Error getting schedule {schedule_id}: {e}")
+            return None
+    
+    async def get_active_schedules(self, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """Get all active schedules, paged (PostgREST caps a single response)"""
+        try:
+            schedules = []
+            while True:
+                response = self.supabase.table('schedule').select('*').eq('is_active', True).order('id').range(
+                    len(schedules), len(schedules) + page_size - 1
+                ).execute()
+                schedules.extend(response.data)
+                if len(response.data) < page_size:
+                    return schedules
+        except Exception as e:
+            logger.error(f"Error getting active schedules: {e}")
+            return []
+    
     async def get_user_schedules(self, user_id: int) -> List[Dict[str, Any]]:
         """Get all schedules for a user"""
         try:
@@ -251,12 +460,242 @@ class SupabaseClient:
                 'is_active': False
             }).eq('channel_tg_id', channel_tg_id).execute()
             
+            schedule_events.upserted(response.data)
             logger.info(f"All schedules deactivated for channel {channel_tg_id}")
             return True
         except Exception as e:
             logger.error(f"Error deactivating channel schedules: {e}")
             return False
     
+    async def pause_channel_schedules(self, channel_tg_id: int) -> int:
+        """Deactivate a channel's schedules until the bot can post there again; returns how many were paused"""
+        try:
+            response = self.supabase.table('schedule').update({
+                'is_active': False,
+                'paused': True
+            }).eq('channel_tg_id', channel_tg_id).eq('is_active', True).execute()
+            
+            schedule_events.upserted(response.data)
+            logger.info(f"{len(response.data)} schedules paused for channel {channel_tg_id}")
+            return len(response.data)
+        except Exception as e:
+            logger.error(f"Error pausing channel schedules: {e}")
+            return 0
+    
+    async def resume_channel_schedules(self, channel_tg_id: int) -> int:
+        """Reactivate the schedules paused by pause_channel_schedules; returns how many were resumed"""
+        try:
+            response = self.supabase.table('schedule').update({
+                'is_active': True,
+                'paused': False
+            }).eq('channel_tg_id', channel_tg_id).eq('paused', True).execute()
+            
+            # Runs missed while paused (including the one that found the channel lost, whose
+            # outbox row the scheduler dropped) are handled by the misfire policy
+            schedule_events.upserted(response.data)
+            return len(response.data)
+        except Exception as e:
+            logger.error(f"Error resuming channel schedules: {e}")
+            return 0
+    
+    # Outbox (schedule_runs)
+    async def claim_schedule_run(self, schedule: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Record the intent to execute a planned run; returns (run row, created by this call)"""
+        try:
+            response = self.supabase.table('schedule_runs').upsert({
+                'schedule_id': schedule['id'],
+                'planned_run_at': schedule['next_run_at'],
+                'post_id': schedule['post_id'],
+                'channel_tg_id': schedule['channel_tg_id'],
+                'user_id': schedule['user_id'],
+                'status': 'pending'
+            }, on_conflict='schedule_id,planned_run_at', ignore_duplicates=True).execute()
+            
+            if response.data:
+                return response.data[0], True
+            
+            response = self.supabase.table('schedule_runs').select('*').eq(
+                'schedule_id', schedule['id']
+            ).eq('planned_run_at', schedule['next_run_at']).execute()
+            return (response.data[0] if response.data else None), False
+        except Exception as e:
+            logger.error(f"Error claiming run of schedule {schedule['id']}: {e}")
+            return None, False
+    
+    async def take_over_schedule_run(self, run: Dict[str, Any]) -> bool:
+        """Take over a stale pending claim; only succeeds if nobody else did first"""
+        try:
+            response = self.supabase.table('schedule_runs').update({
+                'claimed_at': datetime.now(pytz.UTC).isoformat()
+            }).eq('id', run['id']).eq('status', 'pending').eq('claimed_at', run['claimed_at']).execute()
+            return bool(response.data)
+        except Exception as e:
+            logger.error(f"Error taking over schedule run {run['id']}: {e}")
+            return False
+    
+    async def release_schedule_run(self, run_id: int) -> bool:
+        """Drop a claim that never reached sending so another instance can run it right away"""
+        try:
+            self.supabase.table('schedule_runs').delete().eq('id', run_id).eq('status', 'pending').execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error releasing schedule run {run_id}: {e}")
+            return False
+    
+    async def delete_schedule_run(self, run_id: int) -> bool:
+        """Forget an outbox row so its planned run can be claimed again"""
+        try:
+            self.supabase.table('schedule_runs').delete().eq('id', run_id).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting schedule run {run_id}: {e}")
+            return False
+    
+    async def get_schedule_run(self, run_id: int) -> Optional[Dict[str, Any]]:
+        """Get an outbox row by ID"""
+        try:
+            response = self.supabase.table('schedule_runs').select('*').eq('id', run_id).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Error getting schedule run {run_id}: {e}")
+            return None
+    
+    async def update_schedule_run(self, run_id: int, status: str, sent_count: int = None, error: str = None) -> bool:
+        """Move an outbox row to a new status"""
+        try:
+            update_data = {'status': status}
+            if sent_count is not None:
+                update_data['sent_count'] = sent_count
+            if error is not None:
+                update_data['error'] = error
+            if status not in ('pending', 'sending'):
+                update_data['completed_at'] = datetime.now(pytz.UTC).isoformat()
+            
+            self.supabase.table('schedule_runs').update(update_data).eq('id', run_id).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error updating schedule run {run_id}: {e}")
+            return False
+    
+    async def prune_schedule_runs(self, before: datetime) -> bool:
+        """Delete finished outbox rows older than a cutoff"""
+        try:
+            self.supabase.table('schedule_runs').delete().in_(
+                'status', ['sent', 'failed', 'skipped', 'unknown']
+            ).lt('created_at', before.astimezone(pytz.UTC).isoformat()).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error pruning schedule runs: {e}")
+            return False
+    
+    # Execution History
+    async def add_executions(self, rows: List[Dict[str, Any]]) -> bool:
+        """Insert a batch of execution records off the event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, lambda: self.supabase.table('schedule_executions').insert(rows).execute()
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error writing {len(rows)} execution records: {e}")
+            return False
+    
+    async def get_executions_between(self, start: datetime, end: datetime,
+                                     max_rows: int = 20000, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """Execution records planned in [start, end), fetched page by page over the planned_at index"""
+        try:
+            rows = []
+            columns = 'channel_tg_id,planned_at,lag_ms,send_ms,outcome'
+            while len(rows) < max_rows:
+                response = self.supabase.table('schedule_executions').select(columns).gte(
+                    'planned_at', start.astimezone(pytz.UTC).isoformat()
+                ).lt(
+                    'planned_at', end.astimezone(pytz.UTC).isoformat()
+                ).order('planned_at').range(len(rows), len(rows) + page_size - 1).execute()
+                rows.extend(response.data)
+                if len(response.data) < page_size:
+                    break
+            return rows[:max_rows]
+        except Exception as e:
+            logger.error(f"Error getting execution history: {e}")
+            return []
+    
+    # Retry Queue
+    async def add_retry(self, schedule_id: Optional[int], post_id: int, channel_tg_id: int, user_id: int,
+                        attempts: int, next_attempt_at: datetime, last_error: str = None,
+                        run_id: int = None) -> Optional[int]:
+        """Queue a failed send for a delayed retry"""
+        try:
+            response = self.supabase.table('retry_queue').insert({
+                'schedule_id': schedule_id,
+                'run_id': run_id,
+                'post_id': post_id,
+                'channel_tg_id': channel_tg_id,
+                'user_id': user_id,
+                'attempts': attempts,
+                'next_attempt_at': next_attempt_at.astimezone(pytz.UTC).isoformat(),
+                'last_error': last_error
+            }).execute()
+            return response.data[0]['id']
+        except Exception as e:
+            logger.error(f"Error queueing retry for post {post_id}: {e}")
+            return None
+    
+    async def get_due_retries(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get queued retries whose backoff has elapsed, oldest first"""
+        try:
+            current_time = datetime.now(pytz.UTC).isoformat()
+            response = self.supabase.table('retry_queue').select('*').lte(
+                'next_attempt_at', current_time
+            ).order('next_attempt_at').limit(limit).execute()
+            return response.data
+        except Exception as e:
+            logger.error(f"Error getting due retries: {e}")
+            return []
+    
+    async def reschedule_retry(self, retry_id: int, attempts: int, next_attempt_at: datetime,
+                               last_error: str = None) -> bool:
+        """Push a retry back after another failed attempt"""
+        try:
+            self.supabase.table('retry_queue').update({
+                'attempts': attempts,
+                'next_attempt_at': next_attempt_at.astimezone(pytz.UTC).isoformat(),
+                'last_error': last_error
+            }).eq('id', retry_id).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error rescheduling retry {retry_id}: {e}")
+            return False
+    
+    async def delete_retry(self, retry_id: int) -> bool:
+        """Remove a retry from the queue"""
+        try:
+            self.supabase.table('retry_queue').delete().eq('id', retry_id).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting retry {retry_id}: {e}")
+            return False
+    
+    async def add_dead_letter(self, schedule_id: Optional[int], post_id: int, channel_tg_id: int, user_id: int,
+                              attempts: int, outcome: str, error: str = None) -> Optional[int]:
+        """Record a send that failed permanently or exhausted its retries"""
+        try:
+            response = self.supabase.table('dead_letters').insert({
+                'schedule_id': schedule_id,
+                'post_id': post_id,
+                'channel_tg_id': channel_tg_id,
+                'user_id': user_id,
+                'attempts': attempts,
+                'outcome': outcome,
+                'error': error
+            }).execute()
+            logger.info(f"Dead letter recorded for post {post_id} in channel {channel_tg_id}: {outcome}")
+            return response.data[0]['id']
+        except Exception as e:
+            logger.error(f"Error recording dead letter for post {post_id}: {e}")
+            return None
+    
     # Broadcasting
     async def get_broadcast_channels(self) -> List[Dict[str, Any]]:
         """Get all channels eligible for broadcasting (non-VIP, non-banned)"""
@@ -267,6 +706,62 @@ class SupabaseClient:
             logger.error(f"Error getting broadcast channels: {e}")
             return []
     
+    # Scheduler Workers
+    async def register_worker(self, worker_id: str, hostname: str, pid: int) -> bool:
+        """Insert or refresh a scheduler worker's heartbeat"""
+        try:
+            self.supabase.table('scheduler_workers').upsert({
+                'worker_id': worker_id,
+                'hostname': hostname,
+                'pid': pid,
+                'heartbeat_at': datetime.now(pytz.UTC).isoformat()
+            }, on_conflict='worker_id').execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error registering worker {worker_id}: {e}")
+            return False
+    
+    async def get_live_workers(self, since: datetime) -> Optional[List[str]]:
+        """IDs of workers that sent a heartbeat after a cutoff; None if the query failed"""
+        try:
+            response = self.supabase.table('scheduler_workers').select('worker_id').gte(
+                'heartbeat_at', since.astimezone(pytz.UTC).isoformat()
+            ).execute()
+            return [row['worker_id'] for row in response.data]
+        except Exception as e:
+            logger.error(f"Error getting live workers: {e}")
+            return None
+    
+    async def remove_worker(self, worker_id: str) -> bool:
+        """Remove a worker (clean shutdown)"""
+        try:
+            self.supabase.table('scheduler_workers').delete().eq('worker_id', worker_id).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error removing worker {worker_id}: {e}")
+            return False
+    
+    # User Settings
+    async def get_user_settings(self, user_id: int) -> Dict[str, Any]:
+        """Per-user preferences; empty when the user never changed anything"""
+        try:
+            response = self.supabase.table('user_settings').select('*').eq('user_id', user_id).execute()
+            return response.data[0] if response.data else {}
+        except Exception as e:
+            logger.error(f"Error getting settings for user {user_id}: {e}")
+            return {}
+    
+    async def update_user_settings(self, user_id: int, settings: Dict[str, Any]) -> bool:
+        """Create or update a user's preferences"""
+        try:
+            row = dict(settings, user_id=user_id, updated_at=datetime.now(pytz.UTC).isoformat())
+            self.supabase.table('user_settings').upsert(row, on_conflict='user_id').execute()
+            logger.info(f"Settings updated for user {user_id}: {settings}")
+            return True
+        except Exception as e:
+            logger.error(f"Error updating settings for user {user_id}: {e}")
+            return False
+    
     # Statistics
     async def get_statistics(self) -> Dict[str, Any]:
         """Get general statistics (admin only)"""
@@ -302,5 +797,34 @@ class SupabaseClient:
             logger.error(f"Error getting statistics: {e}")
             return {}
 
-# Global instance
-db = SupabaseClient()
\ No newline at end of file
+def create_database_client() -> SupabaseClient:
+    """Create the database client for the configured backend"""
+    if Config.DB_BACKEND == 'sqlite':
+        from sqlite_backend import SQLiteClient
+        return SupabaseClient(SQLiteClient(Config.SQLITE_PATH))
+    return SupabaseClient()
+
+class LazyDatabaseClient:
+    """Proxy that builds the database client on first use instead of at import time"""
+    def __init__(self, factory):
+        self._factory = factory
+        self._client: Optional[SupabaseClient] = None
+        # First use may happen in an executor thread (startup check) while the loop touches db too
+        self._lock = threading.Lock()
+    
+    @property
+    def is_initialized(self) -> bool:
+        return self._client is not None
+    
+    def get_client(self) -> SupabaseClient:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+    
+    def __getattr__(self, name: str):
+        return getattr(self.get_client(), name)
+
+# Global instance (constructed lazily on first attribute access)
+db = LazyDatabaseClient(create_database_client)
\ No newline at end of file
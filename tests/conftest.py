@@ -0,0 +1,65 @@
+import asyncio
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+# Tests run against the in-memory SQLite backend, never a real database or bot
+os.environ.setdefault('BOT_TOKEN', '1:test')
+os.environ.setdefault('ADMIN_USER_IDS', '1')
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = ':memory:'
+os.environ['NOTIFICATION_DIGEST_WINDOW'] = '0'
+os.environ['CATCHUP_BATCH_INTERVAL'] = '0'
+os.environ['CHANNEL_SWEEP_INTERVAL'] = '0'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import supabase_client
+from sqlite_backend import SQLiteClient
+from supabase_client import SupabaseClient
+
+class FakeBot:
+    """Records channel sends instead of calling Telegram"""
+    def __init__(self):
+        self.sent = []
+    
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id < 0:
+            self.sent.append((chat_id, text))
+        return SimpleNamespace(message_id=len(self.sent))
+
+@pytest.fixture
+def db():
+    """A fresh in-memory database behind the global db proxy"""
+    client = SupabaseClient(SQLiteClient(':memory:'))
+    previous = supabase_client.db._client
+    supabase_client.db._client = client
+    yield client
+    supabase_client.db._client = previous
+
+@pytest.fixture
+def bot():
+    return FakeBot()
+
+def run(coro):
+    """Run a test scenario on a fresh event loop"""
+    return asyncio.run(coro)
+
+async def create_schedule(db, next_run_at: datetime, channel_tg_id: int = -100, user_id: int = 7,
+                          cron_expression: str = '0 0 1 1 *') -> dict:
+    """Channel, post and one active schedule; returns the schedule row"""
+    if not await db.get_channel_by_tg_id(channel_tg_id):
+        await db.add_channel(channel_tg_id, f"channel {channel_tg_id}", user_id)
+    channel = await db.get_channel_by_tg_id(channel_tg_id)
+    post_id = await db.add_post(user_id, channel['id'], 'hello')
+    [schedule_id] = await db.add_schedules([{
+        'post_id': post_id,
+        'channel_tg_id': channel_tg_id,
+        'user_id': user_id,
+        'cron_expression': cron_expression,
+        'next_run_at': next_run_at
+    }])
+    return db.supabase.table('schedule').select('*').eq('id', schedule_id).execute().data[0]
\ No newline at end of file
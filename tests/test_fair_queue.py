@@ -0,0 +1,78 @@
+import asyncio
+
+from conftest import run
+from fair_queue import FairQueue
+
+def drain(queue: FairQueue) -> list:
+    order = []
+    while len(queue):
+        flow, _ = queue.get_nowait()
+        order.append(flow)
+    return order
+
+def test_flows_are_interleaved():
+    queue = FairQueue()
+    for i in range(4):
+        queue.put('heavy', i)
+    queue.put('light', 0)
+    
+    # A user with a backlog doesn't hold back one who queued later
+    assert drain(queue) == ['heavy', 'light', 'heavy', 'heavy', 'heavy']
+
+def test_items_of_a_flow_keep_their_order():
+    queue = FairQueue()
+    for i in range(3):
+        queue.put('user', i)
+    
+    assert [queue.get_nowait()[1] for _ in range(3)] == [0, 1, 2]
+
+def test_weight_sets_the_share():
+    queue = FairQueue()
+    for i in range(6):
+        queue.put('vip', i, weight=2.0)
+        queue.put('regular', i)
+    
+    first = drain(queue)[:6]
+    assert first.count('vip') == 4
+    assert first.count('regular') == 2
+
+def test_cost_counts_against_the_flow():
+    queue = FairQueue()
+    queue.put('catch_up', 'five runs', cost=5)
+    for i in range(3):
+        queue.put('single', i)
+    
+    assert drain(queue) == ['single', 'single', 'single', 'catch_up']
+
+def test_idle_flow_does_not_bank_credit():
+    queue = FairQueue()
+    for i in range(3):
+        queue.put('busy', i)
+    drain(queue)
+    
+    # 'late' was idle the whole time; it starts at the current virtual time, not at zero
+    for i in range(3):
+        queue.put('late', i)
+        queue.put('busy', i)
+    assert drain(queue) == ['late', 'busy', 'late', 'busy', 'late', 'busy']
+
+def test_sizes_and_clear():
+    queue = FairQueue()
+    queue.put('a', 1)
+    queue.put('a', 2)
+    queue.put('b', 3)
+    assert queue.flow_sizes() == {'a': 2, 'b': 1}
+    
+    assert sorted(queue.clear()) == [1, 2, 3]
+    assert len(queue) == 0 and queue.flow_sizes() == {}
+
+def test_get_waits_for_an_item():
+    async def scenario():
+        queue = FairQueue()
+        waiter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        queue.put('user', 'item')
+        return await asyncio.wait_for(waiter, timeout=1)
+    
+    assert run(scenario()) == ('user', 'item')
\ No newline at end of file
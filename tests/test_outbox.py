@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytz
+
+from config import Config
+from conftest import create_schedule, run
+from scheduler import PostScheduler
+
+def test_claim_is_created_once_per_planned_run(db):
+    async def scenario():
+        schedule = await create_schedule(db, datetime.now(pytz.UTC))
+        first, created = await db.claim_schedule_run(schedule)
+        again, created_again = await db.claim_schedule_run(schedule)
+        return first, created, again, created_again
+    
+    first, created, again, created_again = run(scenario())
+    assert created and not created_again
+    assert again['id'] == first['id']
+    assert again['status'] == 'pending'
+
+def test_fresh_claim_of_another_worker_is_left_alone(db, bot):
+    async def scenario():
+        schedule = await create_schedule(db, datetime.now(pytz.UTC))
+        await db.claim_schedule_run(schedule)
+        return await PostScheduler(SimpleNamespace(bot=bot)).claim_run(schedule)
+    
+    assert run(scenario()) is None
+
+def test_stale_claim_is_taken_over_once(db, bot):
+    async def scenario():
+        schedule = await create_schedule(db, datetime.now(pytz.UTC))
+        run_row, _ = await db.claim_schedule_run(schedule)
+        stale = (datetime.now(pytz.UTC) - timedelta(seconds=Config.OUTBOX_LEASE_SECONDS + 60)).isoformat()
+        db.supabase.table('schedule_runs').update({'claimed_at': stale}).eq('id', run_row['id']).execute()
+        
+        taken = await PostScheduler(SimpleNamespace(bot=bot)).claim_run(schedule)
+        # A second worker holding the same stale snapshot loses the race
+        lost_race = await db.take_over_schedule_run({**run_row, 'claimed_at': stale})
+        return run_row, stale, taken, lost_race, await db.get_schedule_run(run_row['id'])
+    
+    run_row, stale, taken, lost_race, current = run(scenario())
+    assert taken is not None and taken['id'] == run_row['id']
+    assert current['claimed_at'] != stale
+    assert not lost_race
+
+def test_run_interrupted_while_sending_is_not_resent(db, bot):
+    async def scenario():
+        schedule = await create_schedule(db, datetime.now(pytz.UTC) - timedelta(seconds=5))
+        run_row, _ = await db.claim_schedule_run(schedule)
+        await db.update_schedule_run(run_row['id'], 'sending')
+        
+        await PostScheduler(SimpleNamespace(bot=bot)).process_schedule(schedule)
+        after = db.supabase.table('schedule').select('*').eq('id', schedule['id']).execute().data[0]
+        return schedule, await db.get_schedule_run(run_row['id']), after
+    
+    schedule, run_row, after = run(scenario())
+    assert bot.sent == []
+    assert run_row['status'] == 'unknown'
+    assert after['next_run_at'] != schedule['next_run_at']
+
+def test_pending_run_is_sent_and_marked(db, bot):
+    async def scenario():
+        schedule = await create_schedule(db, datetime.now(pytz.UTC) - timedelta(seconds=5))
+        await PostScheduler(SimpleNamespace(bot=bot)).process_schedule(schedule)
+        return db.supabase.table('schedule_runs').select('*').execute().data
+    
+    runs = run(scenario())
+    assert bot.sent == [(-100, 'hello')]
+    assert [row['status'] for row in runs] == ['sent']
+
+def test_run_that_finds_the_channel_lost_is_left_for_resume(db, bot):
+    from telegram.error import Forbidden
+    from channel_monitor import channel_monitor
+    
+    async def send_message(chat_id, text, **kwargs):
+        raise Forbidden("Forbidden: bot was kicked from the channel chat")
+    
+    async def scenario():
+        schedule = await create_schedule(db, datetime.now(pytz.UTC) - timedelta(seconds=5))
+        bot.send_message = send_message
+        await PostScheduler(SimpleNamespace(bot=bot)).process_schedule(schedule)
+        after = db.supabase.table('schedule').select('*').eq('id', schedule['id']).execute().data[0]
+        runs = db.supabase.table('schedule_runs').select('*').execute().data
+        dead_letters = db.supabase.table('dead_letters').select('*').execute().data
+        return schedule, after, runs, dead_letters
+    
+    try:
+        schedule, after, runs, dead_letters = run(scenario())
+    finally:
+        channel_monitor.access.clear()
+    assert after['paused'] and after['next_run_at'] == schedule['next_run_at']
+    assert runs == []
+    assert dead_letters == []
+
+def test_channel_resumed_by_another_process_overrides_the_lost_cache(db, bot):
+    from channel_monitor import channel_monitor
+    
+    async def scenario():
+        schedule = await create_schedule(db, datetime.now(pytz.UTC) - timedelta(seconds=5))
+        # This worker saw the channel lost, then another process resumed its schedules
+        channel_monitor.mark_lost(schedule['channel_tg_id'])
+        await PostScheduler(SimpleNamespace(bot=bot)).process_schedule(schedule)
+        after = db.supabase.table('schedule').select('*').eq('id', schedule['id']).execute().data[0]
+        return schedule, after
+    
+    try:
+        schedule, after = run(scenario())
+        assert not channel_monitor.is_lost(schedule['channel_tg_id'])
+    finally:
+        channel_monitor.access.clear()
+    assert len(bot.sent) == 1
+    assert not after['paused'] and after['is_active']
\ No newline at end of file
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytz
+
+from conftest import create_schedule, run
+from schedule_events import schedule_events, ScheduleEvent, ScheduleIndex, OP_DELETE, OP_UPSERT
+from scheduler import PostScheduler
+
+NOW = datetime(2026, 1, 1, 12, 0, tzinfo=pytz.UTC)
+
+def row(schedule_id: int, minutes: int, **fields) -> dict:
+    return {
+        'id': schedule_id, 'post_id': schedule_id, 'channel_tg_id': -100, 'user_id': 7,
+        'is_active': True, 'next_run_at': (NOW + timedelta(minutes=minutes)).isoformat(), **fields
+    }
+
+def ids(schedules: list) -> list:
+    return sorted(schedule['id'] for schedule in schedules)
+
+def test_due_returns_schedules_up_to_the_horizon():
+    index = ScheduleIndex()
+    index.load([row(1, 5), row(2, -1), row(3, 30)])
+    
+    assert ids(index.due(NOW)) == [2]
+    assert ids(index.due(NOW + timedelta(minutes=10))) == [1, 2]
+    # due() doesn't consume: the same schedules are due until they are rescheduled
+    assert ids(index.due(NOW + timedelta(minutes=10))) == [1, 2]
+    assert index.next_due_at() == NOW - timedelta(minutes=1)
+
+def test_rescheduled_entry_invalidates_the_old_heap_position():
+    index = ScheduleIndex()
+    index.load([row(1, 0), row(2, 10)])
+    
+    # Partial update: only the new time, merged into the indexed row
+    index.upsert({'id': 1, 'next_run_at': (NOW + timedelta(minutes=20)).isoformat()})
+    
+    assert ids(index.due(NOW + timedelta(minutes=15))) == [2]
+    assert index.next_due_at() == NOW + timedelta(minutes=10)
+    assert index.schedules[1]['post_id'] == 1
+
+def test_inactive_or_removed_schedules_are_never_due():
+    index = ScheduleIndex()
+    index.load([row(1, 0), row(2, 0), row(3, 0, post_id=9), row(4, 0, post_id=9)])
+    
+    assert index.upsert({'id': 1, 'is_active': False}) is None
+    assert index.remove({'id': 2}) == [2]
+    assert index.remove({'id': 2}) == []
+    # Cascades arrive as a filter, e.g. every schedule of a deleted post
+    assert sorted(index.remove({'post_id': 9})) == [3, 4]
+    
+    assert index.due(NOW) == []
+    assert index.next_due_at() is None
+    assert len(index) == 0
+
+def test_heap_is_compacted_after_many_updates():
+    index = ScheduleIndex()
+    index.load([row(1, 0)])
+    for minutes in range(2000):
+        index.upsert({'id': 1, 'next_run_at': (NOW + timedelta(minutes=minutes)).isoformat()})
+    
+    assert len(index._heap) <= 2 * len(index.schedules) + 1024
+    assert ids(index.due(NOW + timedelta(minutes=1999))) == [1]
+
+def test_database_writes_reach_the_scheduler_index(db, bot):
+    async def scenario():
+        scheduler = PostScheduler(SimpleNamespace(bot=bot))
+        schedule_events.subscribe(scheduler.on_schedule_event)
+        try:
+            await scheduler.load_index()
+            schedule = await create_schedule(db, datetime.now(pytz.UTC) + timedelta(hours=1))
+            indexed = schedule['id'] in scheduler.index.schedules
+            await db.deactivate_schedules([schedule['id']])
+            return indexed, schedule['id'] in scheduler.index.schedules
+        finally:
+            schedule_events.unsubscribe(scheduler.on_schedule_event)
+    
+    assert run(scenario()) == (True, False)
+
+def test_deleting_a_schedule_cancels_its_waiting_run(bot):
+    async def scenario():
+        scheduler = PostScheduler(SimpleNamespace(bot=bot))
+        scheduler.is_running = True
+        scheduler.index_loaded = True
+        scheduler.on_schedule_event(ScheduleEvent(OP_UPSERT, row(1, 0)))
+        scheduler.on_schedule_event(ScheduleEvent(OP_UPSERT, row(2, 0)))
+        
+        # Both wait out their jitter; then the user deletes one and pauses the other
+        scheduler.dispatch_later(scheduler.index.schedules[1], datetime.now(pytz.UTC) + timedelta(minutes=1))
+        scheduler.dispatch_later(scheduler.index.schedules[2], datetime.now(pytz.UTC) + timedelta(minutes=1))
+        timers = dict(scheduler.timer_tasks)
+        scheduler.on_schedule_event(ScheduleEvent(OP_DELETE, {'id': 1}))
+        scheduler.on_schedule_event(ScheduleEvent(OP_UPSERT, {'id': 2, 'is_active': False}))
+        await asyncio.sleep(0)
+        return timers, scheduler
+    
+    timers, scheduler = run(scenario())
+    assert all(task.cancelled() for task in timers.values())
+    assert scheduler.pending_ids == set()
+    assert scheduler.timer_tasks == {}
+
+def test_queued_run_of_a_removed_schedule_is_skipped(db, bot):
+    async def scenario():
+        scheduler = PostScheduler(SimpleNamespace(bot=bot))
+        schedule = await create_schedule(db, datetime.now(pytz.UTC) - timedelta(seconds=5))
+        await scheduler.load_index()
+        scheduler.index.remove({'id': schedule['id']})
+        await scheduler.process_schedule(schedule)
+        return db.supabase.table('schedule_runs').select('*').execute().data
+    
+    assert run(scenario()) == []
+    assert bot.sent == []
\ No newline at end of file
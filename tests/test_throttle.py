@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+from telegram.ext import ApplicationHandlerStop
+
+import throttle
+from config import Config
+from conftest import run
+from throttle import TokenBucket, UserThrottle
+
+class FakeCallbackQuery:
+    def __init__(self):
+        self.answers = []
+    
+    async def answer(self, text=None, **kwargs):
+        self.answers.append(text)
+
+class FakeMessage:
+    def __init__(self, media_group_id=None):
+        self.media_group_id = media_group_id
+        self.replies = []
+    
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+def callback_update(user_id: int, query: FakeCallbackQuery):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), callback_query=query, message=None)
+
+def message_update(user_id: int, message: FakeMessage):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), callback_query=None, message=message)
+
+def passes(user_throttle: UserThrottle, update) -> bool:
+    try:
+        run(user_throttle.check_update(update, None))
+        return True
+    except ApplicationHandlerStop:
+        return False
+
+def test_bucket_allows_a_burst_then_refills_at_the_rate():
+    bucket = TokenBucket(rate=2.0, burst=3)
+    start = bucket.updated
+    
+    assert [bucket.take(start) for _ in range(4)] == [True, True, True, False]
+    # Half a second at 2/s buys exactly one more
+    assert bucket.take(start + 0.5)
+    assert not bucket.take(start + 0.5)
+    # Refill is capped at the burst size
+    assert [bucket.take(start + 100) for _ in range(4)] == [True, True, True, False]
+
+def test_full_buckets_are_pruned(monkeypatch):
+    monkeypatch.setattr(Config, 'THROTTLE_MAX_TRACKED_USERS', 2)
+    clock = [1000.0]
+    monkeypatch.setattr(throttle.time, 'monotonic', lambda: clock[0])
+    user_throttle = UserThrottle(rate=1.0, burst=2)
+    
+    user_throttle.allow(1)
+    user_throttle.allow(2)
+    clock[0] += 0.5
+    user_throttle.allow(2)
+    # User 1 has refilled by now, user 2 (two tokens spent) has not
+    clock[0] += 0.6
+    user_throttle.allow(3)
+    
+    assert sorted(user_throttle.buckets) == [2, 3]
+
+def test_excess_button_presses_get_a_toast_and_stop():
+    user_throttle = UserThrottle(rate=0.001, burst=2)
+    query = FakeCallbackQuery()
+    
+    assert [passes(user_throttle, callback_update(5, query)) for _ in range(4)] == [True, True, False, False]
+    # Every dropped press is answered so the button stops spinning
+    assert len(query.answers) == 2
+
+def test_text_flood_is_warned_once():
+    user_throttle = UserThrottle(rate=0.001, burst=1)
+    message = FakeMessage()
+    
+    assert [passes(user_throttle, message_update(6, message)) for _ in range(4)] == [True, False, False, False]
+    assert len(message.replies) == 1
+
+def test_admins_and_other_updates_are_not_throttled():
+    user_throttle = UserThrottle(rate=0.001, burst=1)
+    admin = Config.ADMIN_USER_IDS[0]
+    
+    assert all(passes(user_throttle, callback_update(admin, FakeCallbackQuery())) for _ in range(5))
+    other = SimpleNamespace(effective_user=SimpleNamespace(id=8), callback_query=None, message=None)
+    assert all(passes(user_throttle, other) for _ in range(5))
+
+def test_album_counts_once_and_is_kept_or_dropped_whole():
+    user_throttle = UserThrottle(rate=0.001, burst=2)
+    
+    assert all(passes(user_throttle, message_update(9, FakeMessage('album-1'))) for _ in range(10))
+    assert passes(user_throttle, message_update(9, FakeMessage()))
+    # The bucket is empty now: the whole next album is dropped, not just its first item
+    assert not any(passes(user_throttle, message_update(9, FakeMessage('album-2'))) for _ in range(5))
+
+def test_disabled_throttle_lets_everything_through():
+    user_throttle = UserThrottle(rate=0, burst=0)
+    
+    assert all(passes(user_throttle, message_update(10, FakeMessage())) for _ in range(50))
\ No newline at end of file
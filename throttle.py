@@ -0,0 +1,111 @@
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from config import Config
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Allows `burst` events at once, refilled at `rate` per second"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated', 'warned')
+    
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        # Whether the user was already told to slow down during the current flood
+        self.warned = False
+    
+    def take(self, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.warned = False
+            return True
+        return False
+    
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+class UserThrottle:
+    """Per-user anti-flood in front of every handler: excess messages and button presses are dropped"""
+    def __init__(self, rate: float = None, burst: float = None):
+        self.rate = Config.THROTTLE_RATE if rate is None else rate
+        self.burst = Config.THROTTLE_BURST if burst is None else burst
+        self.buckets: Dict[int, TokenBucket] = {}
+        # Last album seen per user and whether it was let through: its items arrive as a burst
+        # but count as one message, and an album is kept or dropped as a whole
+        self.last_media_group: Dict[int, Tuple[str, bool]] = {}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 and self.burst > 0
+    
+    def allow(self, user_id: int) -> bool:
+        """Take a token from the user's bucket"""
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            if len(self.buckets) >= Config.THROTTLE_MAX_TRACKED_USERS:
+                self.prune()
+            bucket = self.buckets[user_id] = TokenBucket(self.rate, self.burst)
+        return bucket.take()
+    
+    def prune(self):
+        """Forget users whose bucket has refilled, they are indistinguishable from new ones"""
+        now = time.monotonic()
+        idle = [user_id for user_id, bucket in self.buckets.items() if bucket.is_full(now)]
+        for user_id in idle:
+            del self.buckets[user_id]
+            self.last_media_group.pop(user_id, None)
+    
+    async def check_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handler group -1: stops the update before the real handlers when its user is flooding"""
+        if not self.enabled:
+            return
+        
+        user = update.effective_user
+        kind = 'callback' if update.callback_query else 'message' if update.message else None
+        if kind is None or user is None or user.id in Config.ADMIN_USER_IDS:
+            return
+        
+        media_group_id: Optional[str] = update.message.media_group_id if update.message else None
+        if media_group_id:
+            last_group, allowed = self.last_media_group.get(user.id, (None, False))
+            if last_group == media_group_id:
+                if allowed:
+                    return
+                raise ApplicationHandlerStop
+        
+        allowed = self.allow(user.id)
+        if media_group_id:
+            self.last_media_group[user.id] = (media_group_id, allowed)
+        if allowed:
+            return
+        
+        metrics.inc('updates_throttled_total', kind=kind)
+        bucket = self.buckets[user.id]
+        try:
+            if kind == 'callback':
+                # Answering is required anyway to stop the button spinner, and costs no database work
+                await update.callback_query.answer("⏳ الرجاء التمهل قليلاً...")
+            elif not bucket.warned:
+                await update.message.reply_text("⏳ أنت ترسل الرسائل بسرعة كبيرة، يرجى الانتظار قليلاً ثم المحاولة مجدداً.")
+        except TelegramError as e:
+            logger.debug(f"Could not tell user {user.id} to slow down: {e}")
+        
+        if not bucket.warned:
+            logger.info(f"Throttling user {user.id} ({kind})")
+            bucket.warned = True
+        raise ApplicationHandlerStop
+
+# Global instance
+user_throttle = UserThrottle()
\ No newline at end of file
@@ -1,7 +1,9 @@
 import logging
+from functools import partial
 from telegram import Update, Message
 from telegram.ext import ContextTypes
 from telegram.error import TelegramError, BadRequest, Forbidden
+from metrics import metrics
 
 # Import modules after basic imports to avoid circular imports
 logger = logging.getLogger(__name__)
@@ -9,6 +11,8 @@ logger = logging.getLogger(__name__)
 class UserHandlers:
     def __init__(self):
         self.user_states = {}  # Store user conversation states
+        self.fanout_targets = {}  # user_id -> (post_id, channel ids) picked for multi-channel scheduling
+        self.queue_pools = {}  # user_id -> (channel_id, ordered post ids) for a rotating queue schedule
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command - simplified without decorators for now"""
@@ -56,6 +60,8 @@ class UserHandlers:
                 await self.add_channel_start(update, context)
             elif message_text == "📁 قنواتي ومنشوراتي":
                 await self.show_my_channels(update, context)
+            elif message_text == "🔔 إعدادات الإشعارات":
+                await self.show_notification_settings(update, context)
             elif message_text == "❌ إلغاء":
                 await self.cancel_current_action(update, context)
             else:
@@ -115,6 +121,23 @@ class UserHandlers:
             logger.error(f"Error in show_my_channels for user {update.effective_user.id}: {e}", exc_info=True)
             await update.message.reply_text(f"❌ حدث خطأ في جلب القنوات: {str(e)[:100]}")
     
+    async def show_notification_settings(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show the user's notification preferences"""
+        try:
+            from keyboards import Keyboards
+            from helpers import format_notification_settings
+            from notifications import notification_digest
+            
+            mute_success = await notification_digest.is_success_muted(update.effective_user.id)
+            await update.message.reply_text(
+                format_notification_settings(mute_success),
+                reply_markup=Keyboards.notification_settings(mute_success)
+            )
+        
+        except Exception as e:
+            logger.error(f"Error in show_notification_settings for user {update.effective_user.id}: {e}", exc_info=True)
+            await update.message.reply_text(f"❌ حدث خطأ في جلب الإعدادات: {str(e)[:100]}")
+    
     def _is_forwarded_message(self, message: Message) -> bool:
         """Safely check if message is forwarded using multiple methods"""
         try:
@@ -366,6 +389,27 @@ class UserHandlers:
             )
             self.user_states.pop(update.effective_user.id, None)
     
+    async def handle_my_chat_member(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Pause or resume a channel's schedules as soon as the bot is demoted, removed or re-added"""
+        try:
+            from supabase_client import db
+            from channel_monitor import channel_monitor, member_can_post, ChannelAccess
+            
+            change = update.my_chat_member
+            channel = await db.get_channel_by_tg_id(change.chat.id)
+            if not channel:
+                # Not one of ours (yet): adding it goes through the forwarded message flow
+                return
+            
+            member = change.new_chat_member
+            logger.info(f"Bot status in channel {change.chat.id} changed: {change.old_chat_member.status} -> {member.status}")
+            access = ChannelAccess(member_can_post(member), member.status, change.date)
+            outcome = await channel_monitor.apply(channel, access)
+            metrics.inc('channel_member_updates_total', outcome=outcome)
+        
+        except Exception as e:
+            logger.error(f"Error handling my_chat_member update: {e}", exc_info=True)
+    
     async def handle_state_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle messages based on user state"""
         try:
@@ -443,6 +487,12 @@ class UserHandlers:
                 self.user_states.pop(user_id, None)
                 return
             
+            # Albums arrive as one message per item: collect them, then save a single post
+            if update.message.media_group_id:
+                from media_groups import media_group_buffer
+                media_group_buffer.add(update, context, partial(self.save_album, channel_id=channel_id))
+                return
+            
             # Get message content
             post_content = update.message.text or update.message.caption
             media_file_id = None
@@ -461,7 +511,10 @@ class UserHandlers:
             logger.info(f"Creating post for user {user_id}, channel {channel_id}, content length: {len(post_content or '')}, media: {media_type}")
             
             # Save post to database
-            post_id = await db.add_post(user_id, channel_id, post_content, media_file_id, media_type)
+            post_id = await db.add_post(
+                user_id, channel_id, post_content, media_file_id, media_type,
+                source_chat_id=update.message.chat_id, source_message_ids=[update.message.message_id]
+            )
             
             if post_id:
                 logger.info(f"Successfully created post {post_id} for user {user_id}")
@@ -487,6 +540,55 @@ class UserHandlers:
             )
             self.user_states.pop(update.effective_user.id, None)
     
+    async def save_album(self, update: Update, context: ContextTypes.DEFAULT_TYPE, messages: list,
+                         channel_id: int = None, post_id: int = None):
+        """Create a post from the buffered items of an album, or replace a post's media with it when editing"""
+        from keyboards import Keyboards
+        from supabase_client import db
+        from media_groups import album_item, MAX_ALBUM_ITEMS
+        
+        user_id = update.effective_user.id
+        expected_state = f"editing_post_{post_id}" if post_id else f"creating_post_{channel_id}"
+        if self.user_states.get(user_id) != expected_state:
+            # Cancelled while the album was still arriving
+            return
+        
+        items = [item for item in map(album_item, messages) if item][:MAX_ALBUM_ITEMS]
+        if not items:
+            await update.message.reply_text(
+                "❌ لا يمكن حفظ هذا الألبوم، يدعم البوت الصور والفيديو والملفات والصوتيات فقط.\n\n"
+                "أرسل المحتوى مرة أخرى أو اضغط 'إلغاء'."
+            )
+            return
+        caption = next((message.caption for message in messages if message.caption), None)
+        
+        logger.info(f"Saving album of {len(items)} items for user {user_id} (post {post_id}, channel {channel_id})")
+        if post_id:
+            success = await db.update_post(post_id, user_id, caption, items[0]['file_id'], 'album', media_items=items)
+        else:
+            success = await db.add_post(
+                user_id, channel_id, caption, items[0]['file_id'], 'album', media_items=items,
+                source_chat_id=update.message.chat_id,
+                source_message_ids=[message.message_id for message in messages][:MAX_ALBUM_ITEMS]
+            )
+        
+        if success:
+            skipped = len(messages) - len(items)
+            await update.message.reply_text(
+                f"✅ تم حفظ الألبوم ({len(items)} عناصر) بنجاح!"
+                + (f"\n⚠️ تم تجاهل {skipped} عناصر غير مدعومة أو زائدة عن {MAX_ALBUM_ITEMS}." if skipped else "")
+                + ("" if post_id else "\n\nيمكنك الآن جدولته من 'إعدادات الجدولة'."),
+                reply_markup=Keyboards.back_to_main()
+            )
+        else:
+            await update.message.reply_text(
+                "❌ حدث خطأ في قاعدة البيانات أثناء حفظ الألبوم.\n\n"
+                "يرجى المحاولة لاحقاً أو التواصل مع المطور.",
+                reply_markup=Keyboards.back_to_main()
+            )
+        
+        self.user_states.pop(user_id, None)
+    
     async def handle_post_editing(self, update: Update, context: ContextTypes.DEFAULT_TYPE, state: str):
         """Handle post editing process"""
         try:
@@ -507,6 +609,11 @@ class UserHandlers:
                 self.user_states.pop(user_id, None)
                 return
             
+            if update.message.media_group_id:
+                from media_groups import media_group_buffer
+                media_group_buffer.add(update, context, partial(self.save_album, post_id=post_id))
+                return
+            
             # Get new content
             new_content = update.message.text or update.message.caption
             new_media_file_id = None
@@ -697,8 +804,8 @@ class UserHandlers:
                     self.user_states.pop(user_id, None)
                     return
                 
-                channel = await db.get_channel_by_id(post['channel_id'])
-                if not channel:
+                channels = await self.get_schedule_channels(user_id, post)
+                if not channels:
                     await update.message.reply_text(
                         f"❌ لم يتم العثور على القناة المرتبطة بالمنشور.\n\n"
                         "قد تكون القناة محذوفة من البوت."
@@ -706,7 +813,7 @@ class UserHandlers:
                     self.user_states.pop(user_id, None)
                     return
                 
-                logger.info(f"Found post {post_id} in channel {channel['channel_name']}")
+                logger.info(f"Found post {post_id}, scheduling it in {len(channels)} channel(s)")
             except Exception as db_error:
                 logger.error(f"Database error when getting post/channel info: {db_error}")
                 await update.message.reply_text(
@@ -717,18 +824,22 @@ class UserHandlers:
             
             # Save schedule
             try:
-                schedule_id = await db.add_schedule(
-                    post_id, channel['channel_tg_id'], user_id, cron_expr, next_run
-                )
+                pool = self.get_queue_pool(user_id, post_id)
+                schedule_ids = await db.add_schedules([
+                    {'post_id': post_id, 'channel_tg_id': channel['channel_tg_id'], 'user_id': user_id,
+                     'cron_expression': cron_expr, 'next_run_at': next_run, 'post_ids': pool}
+                    for channel in channels
+                ])
                 
-                if schedule_id:
-                    logger.info(f"Successfully created schedule {schedule_id} for post {post_id}")
-                    from helpers import format_datetime_arabic
+                if schedule_ids:
+                    logger.info(f"Successfully created schedules {schedule_ids} for post {post_id}")
+                    from helpers import format_datetime_arabic, format_channel_list, format_queue_line
                     next_run_formatted = format_datetime_arabic(next_run)
                     
                     await update.message.reply_text(
                         f"✅ تمت جدولة المنشور بنجاح!\n\n"
-                        f"📺 القناة: {channel['channel_name']}\n"
+                        f"{format_channel_list(channels)}\n"
+                        f"{format_queue_line(pool)}"
                         f"⏰ الموعد القادم: {next_run_formatted}\n"
                         f"🔧 تعبير الجدولة: {cron_expr}",
                         reply_markup=Keyboards.main_menu()
@@ -749,6 +860,8 @@ class UserHandlers:
                 )
             
             self.user_states.pop(user_id, None)
+            self.fanout_targets.pop(user_id, None)
+            self.queue_pools.pop(user_id, None)
             
         except Exception as e:
             logger.error(f"Error in handle_time_input for user {update.effective_user.id}: {e}", exc_info=True)
@@ -758,30 +871,114 @@ class UserHandlers:
             )
             self.user_states.pop(update.effective_user.id, None)
     
+    async def get_schedule_channels(self, user_id: int, post: dict) -> list:
+        """Channels to schedule a post in: those picked for multi-channel scheduling, else the post's own"""
+        from supabase_client import db
+        
+        post_id, channel_ids = self.fanout_targets.get(user_id, (None, None))
+        if post_id == post['id'] and channel_ids:
+            channels = await db.get_user_channels(user_id)
+            return [channel for channel in channels if channel['id'] in channel_ids]
+        
+        channel = await db.get_channel_by_id(post['channel_id'])
+        return [channel] if channel else []
+    
+    def get_queue_pool(self, user_id: int, post_id: int):
+        """Ordered post IDs when the user is scheduling a rotating queue that starts with this post"""
+        _, pool = self.queue_pools.get(user_id, (None, None))
+        return list(pool) if pool and pool[0] == post_id else None
+    
     async def handle_once_scheduling(self, update: Update, context: ContextTypes.DEFAULT_TYPE, 
                                    post_id: int, datetime_text: str):
         """Handle one-time scheduling"""
-        from keyboards import Keyboards
-        
-        logger.info(f"One-time scheduling requested for post {post_id} with input: {datetime_text}")
+        try:
+            from helpers import parse_datetime_input, create_once_schedule, format_datetime_arabic, format_channel_list
+            from keyboards import Keyboards
+            from supabase_client import db
+            
+            user_id = update.effective_user.id
+            
+            logger.info(f"One-time scheduling requested for post {post_id} with input: {datetime_text}")
+            
+            # Expect "DD/MM/YYYY HH:MM"
+            parts = datetime_text.split()
+            target = parse_datetime_input(parts[0], parts[1]) if len(parts) == 2 else None
+            if not target:
+                await update.message.reply_text(
+                    f"❌ صيغة التاريخ والوقت غير صحيحة: '{datetime_text}'\n\n"
+                    "يرجى استخدام صيغة DD/MM/YYYY HH:MM مثل:\n"
+                    " 25/12/2025 14:30\n"
+                    " 01/01/2026 09:00",
+                    reply_markup=Keyboards.cancel_action()
+                )
+                return
+            
+            run_at = create_once_schedule(target)
+            if not run_at:
+                await update.message.reply_text(
+                    "❌ هذا الموعد في الماضي.\n\n"
+                    "يرجى إدخال تاريخ ووقت في المستقبل.",
+                    reply_markup=Keyboards.cancel_action()
+                )
+                return
+            
+            post = await db.get_post_by_id(post_id)
+            if not post or post['user_id'] != user_id:
+                await update.message.reply_text(
+                    f"❌ لم يتم العثور على المنشور (ID: {post_id}).",
+                    reply_markup=Keyboards.main_menu()
+                )
+                self.user_states.pop(user_id, None)
+                return
+            
+            channels = await self.get_schedule_channels(user_id, post)
+            if not channels:
+                await update.message.reply_text(
+                    "❌ لم يتم العثور على القناة المرتبطة بالمنشور.",
+                    reply_markup=Keyboards.main_menu()
+                )
+                self.user_states.pop(user_id, None)
+                return
+            
+            schedule_ids = await db.add_schedules([
+                {'post_id': post_id, 'channel_tg_id': channel['channel_tg_id'], 'user_id': user_id,
+                 'next_run_at': run_at, 'kind': 'once'}
+                for channel in channels
+            ])
+            
+            if schedule_ids:
+                logger.info(f"Created one-time schedules {schedule_ids} for post {post_id}")
+                await update.message.reply_text(
+                    f"✅ تمت جدولة المنشور بنجاح!\n\n"
+                    f"{format_channel_list(channels)}\n"
+                    f"⏰ موعد النشر: {format_datetime_arabic(run_at)}\n"
+                    f"🔂 لمرة واحدة فقط",
+                    reply_markup=Keyboards.main_menu()
+                )
+            else:
+                await update.message.reply_text(
+                    "❌ حدث خطأ في قاعدة البيانات أثناء حفظ الجدولة.\n\n"
+                    "يرجى المحاولة لاحقاً أو التواصل مع المطور.",
+                    reply_markup=Keyboards.main_menu()
+                )
+            
+            self.user_states.pop(user_id, None)
+            self.fanout_targets.pop(user_id, None)
+            self.queue_pools.pop(user_id, None)
         
-        await update.message.reply_text(
-            "⚠️ الجدولة لمرة واحدة قيد التطوير حالياً.\n\n"
-            "الميزات المتاحة:\n"
-            " الجدولة اليومية\n"
-            " الجدولة كل يومين\n"
-            " الجدولة الأسبوعية\n"
-            " الجدولة المخصصة (Cron)\n\n"
-            "يرجى استخدام إحدى هذه الميزات حالياً.",
-            reply_markup=Keyboards.main_menu()
-        )
-        self.user_states.pop(update.effective_user.id, None)
+        except Exception as e:
+            logger.error(f"Error in handle_once_scheduling for user {update.effective_user.id}: {e}", exc_info=True)
+            await update.message.reply_text(
+                f"❌ حدث خطأ في معالجة الجدولة: {str(e)[:100]}",
+                reply_markup=Keyboards.main_menu()
+            )
+            self.user_states.pop(update.effective_user.id, None)
     
     async def handle_custom_cron(self, update: Update, context: ContextTypes.DEFAULT_TYPE, 
                                post_id: int, cron_text: str):
         """Handle custom cron expression"""
         try:
-            from helpers import validate_cron_expression, get_next_occurrence, format_datetime_arabic
+            from helpers import validate_cron_expression, get_next_occurrence, format_datetime_arabic, format_channel_list, format_queue_line
             from keyboards import Keyboards
             from supabase_client import db
             
@@ -837,8 +1034,8 @@ class UserHandlers:
                     self.user_states.pop(user_id, None)
                     return
                 
-                channel = await db.get_channel_by_id(post['channel_id'])
-                if not channel:
+                channels = await self.get_schedule_channels(user_id, post)
+                if not channels:
                     await update.message.reply_text(
                         "❌ لم يتم العثور على القناة المرتبطة بالمنشور."
                     )
@@ -854,17 +1051,21 @@ class UserHandlers:
             
             # Save schedule
             try:
-                schedule_id = await db.add_schedule(
-                    post_id, channel['channel_tg_id'], user_id, cron_text, next_run
-                )
+                pool = self.get_queue_pool(user_id, post_id)
+                schedule_ids = await db.add_schedules([
+                    {'post_id': post_id, 'channel_tg_id': channel['channel_tg_id'], 'user_id': user_id,
+                     'cron_expression': cron_text, 'next_run_at': next_run, 'post_ids': pool}
+                    for channel in channels
+                ])
                 
-                if schedule_id:
-                    logger.info(f"Successfully created custom cron schedule {schedule_id}")
+                if schedule_ids:
+                    logger.info(f"Successfully created custom cron schedules {schedule_ids}")
                     next_run_formatted = format_datetime_arabic(next_run)
                     
                     await update.message.reply_text(
                         f"✅ تمت جدولة المنشور بنجاح!\n\n"
-                        f"📺 القناة: {channel['channel_name']}\n"
+                        f"{format_channel_list(channels)}\n"
+                        f"{format_queue_line(pool)}"
                         f"🔧 Cron: `{cron_text}`\n"
                         f"⏰ الموعد القادم: {next_run_formatted}",
                         reply_markup=Keyboards.main_menu(),
@@ -884,6 +1085,8 @@ class UserHandlers:
                 )
             
             self.user_states.pop(user_id, None)
+            self.fanout_targets.pop(user_id, None)
+            self.queue_pools.pop(user_id, None)
             
         except Exception as e:
             logger.error(f"Error in handle_custom_cron for user {update.effective_user.id}: {e}", exc_info=True)
@@ -902,6 +1105,8 @@ class UserHandlers:
             previous_state = self.user_states.get(user_id)
             
             self.user_states.pop(user_id, None)
+            self.fanout_targets.pop(user_id, None)
+            self.queue_pools.pop(user_id, None)
             
             logger.info(f"User {user_id} cancelled action. Previous state: {previous_state}")
             
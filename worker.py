@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Scheduler worker
+Runs the post scheduler without handling updates; several workers split the channels between them
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import signal
+import sys
+
+from telegram.ext import Application
+
+from config import Config, setup_logging
+from scheduler import PostScheduler
+from sharding import ShardCoordinator
+from http_pools import build_telegram_requests
+from execution_log import execution_log
+from notifications import notification_digest
+from schedule_events import schedule_events, build_change_feed
+from performance import install_event_loop_policy
+
+logger = setup_logging()
+
+class SchedulerWorker:
+    def __init__(self):
+        self.app = None
+        self.scheduler = None
+        self.coordinator = None
+        self.shutdown_event = asyncio.Event()
+    
+    async def run(self):
+        """Join the worker ring and send for the channels of this worker's shard until stopped"""
+        Config.validate()
+        
+        send_request, updates_request = build_telegram_requests()
+        self.app = (
+            Application.builder()
+            .token(Config.BOT_TOKEN)
+            .request(send_request)
+            .get_updates_request(updates_request)
+            .build()
+        )
+        await self.app.initialize()
+        
+        self.scheduler = PostScheduler(self.app)
+        self.coordinator = ShardCoordinator(on_rebalance=self.scheduler.on_rebalance)
+        self.scheduler.shard = self.coordinator
+        
+        try:
+            await self.coordinator.start()
+            
+            feed = build_change_feed()
+            if feed:
+                try:
+                    await schedule_events.connect(feed)
+                except Exception as e:
+                    logger.error(f"Could not subscribe to schedule changes: {e}")
+            
+            execution_log.start()
+            scheduler_task = asyncio.create_task(self.scheduler.start_scheduler())
+            logger.info(f"Scheduler worker {self.coordinator.worker_id} started")
+            
+            await self.shutdown_event.wait()
+            await self.scheduler.stop_scheduler(Config.SHUTDOWN_DRAIN_TIMEOUT)
+            await scheduler_task
+        finally:
+            await self.cleanup()
+    
+    async def cleanup(self):
+        """Leave the ring, flush buffered writers and close the bot's HTTP pools"""
+        if self.coordinator:
+            await self.coordinator.stop()
+        await schedule_events.disconnect()
+        await notification_digest.flush_all()
+        await execution_log.stop()
+        if self.app:
+            await self.app.shutdown()
+        logger.info("Scheduler worker stopped")
+    
+    def request_shutdown(self, signum: int = None):
+        logger.info(f"Received signal {signum}, stopping worker...")
+        self.shutdown_event.set()
+    
+    def setup_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.request_shutdown, signum)
+            except NotImplementedError:
+                signal.signal(signum, lambda s, f: loop.call_soon_threadsafe(self.request_shutdown, s))
+
+async def main():
+    worker = SchedulerWorker()
+    worker.setup_signal_handlers()
+    await worker.run()
+
+def run_process():
+    """Entry point of one worker process"""
+    install_event_loop_policy()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run scheduler workers (set SCHEDULER_MODE=off on the bot)")
+    parser.add_argument('--processes', type=int, default=1, help="worker processes to start on this host")
+    args = parser.parse_args()
+    
+    if args.processes <= 1:
+        run_process()
+        sys.exit(0)
+    
+    # Each process is an independent worker: it registers itself and owns its share of the ring
+    processes = [multiprocessing.Process(target=run_process, name=f"scheduler-worker-{i}") for i in range(args.processes)]
+    for process in processes:
+        process.start()
+    
+    # Children receive the terminal's signals themselves and drain on their own
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda s, f: [p.terminate() for p in processes if p.is_alive()])
+    for process in processes:
+        process.join()
\ No newline at end of file